@@ -0,0 +1,136 @@
+"""Write-behind log of submitted answers.
+
+Request threads hand answer events to a bounded in-process queue and return
+immediately; a single background writer drains the queue and inserts events
+into ``answer_events`` with one executemany per group commit. A batch is
+flushed once it reaches ``ANSWER_LOG_BATCH_SIZE`` events or
+``ANSWER_LOG_FLUSH_INTERVAL`` seconds after its first event, whichever comes
+first.
+
+Durability trade-off: events are only in memory until their batch commits.
+A crash or SIGKILL loses at most the queued events plus one flush interval
+of answers; a normal interpreter exit drains the queue first. When the
+writer falls behind and the queue is full, ``record`` blocks the request for
+up to ``ANSWER_LOG_PUT_TIMEOUT`` seconds and then drops the event, counting
+it in ``dropped``. Game state (XP, levels) never depends on this log.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+from database import db, AnswerEvent
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class AnswerLog:
+    def __init__(self, app=None):
+        self._queue = None
+        self._engine = None
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ANSWER_LOG_ENABLED', True)
+        app.config.setdefault('ANSWER_LOG_FLUSH_INTERVAL', 1.0)
+        app.config.setdefault('ANSWER_LOG_BATCH_SIZE', 500)
+        app.config.setdefault('ANSWER_LOG_QUEUE_SIZE', 10000)
+        app.config.setdefault('ANSWER_LOG_PUT_TIMEOUT', 0.05)
+
+        self.enabled = app.config['ANSWER_LOG_ENABLED']
+        self.flush_interval = app.config['ANSWER_LOG_FLUSH_INTERVAL']
+        self.batch_size = app.config['ANSWER_LOG_BATCH_SIZE']
+        self.put_timeout = app.config['ANSWER_LOG_PUT_TIMEOUT']
+        self._queue = queue.Queue(maxsize=app.config['ANSWER_LOG_QUEUE_SIZE'])
+        with app.app_context():
+            self._engine = db.engine
+        atexit.register(self.close)
+
+    def record(self, user_id, section, level, question, answer, expected, is_correct, latency_ms=None, tier=None):
+        """Queue one answer event for the background writer."""
+        if not self.enabled:
+            return
+        self._ensure_worker()
+        event = {
+            'user_id': user_id,
+            'section': section,
+            'level': level,
+            'tier': tier,
+            'question': question,
+            'answer': str(answer),
+            'expected': str(expected),
+            'is_correct': is_correct,
+            'latency_ms': latency_ms,
+            'created_at': datetime.now(timezone.utc).replace(tzinfo=None),
+        }
+        try:
+            self._queue.put(event, timeout=self.put_timeout)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout=10):
+        """Flush everything queued so far and stop the writer."""
+        if self._worker is None or not self._worker.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._worker.join(timeout)
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize() if self._queue else 0,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+        }
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._write_loop, name='answer-log-writer', daemon=True)
+                self._worker.start()
+
+    def _write_loop(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+
+    def _flush(self, batch):
+        try:
+            with self._engine.begin() as conn:
+                conn.execute(AnswerEvent.__table__.insert(), batch)
+            self.written += len(batch)
+        except Exception:
+            self.failed += len(batch)
+            logger.exception('Failed to write %d answer events', len(batch))
+
+
+answer_log = AnswerLog()
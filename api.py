@@ -0,0 +1,262 @@
+"""Versioned JSON API for headless clients (``/api/v1``).
+
+Covers the whole game loop without HTML: sectors, skills, starting a run,
+re-fetching its problems, answering, upgrading and the leaderboards. Auth
+is the same session cookie as the site (``POST /api/v1/login``); requests
+without it get a 401 instead of a redirect.
+
+Responses are JSON, encoded with ``orjson`` when installed, or msgpack when
+the client sends ``Accept: application/msgpack`` and the optional
+``msgpack`` package is installed. Request bodies may be either as well.
+Problems are sent as ``[question, options]`` pairs and per-user dashboards
+carry an ETag so unchanged state costs a 304.
+"""
+import json
+from functools import wraps
+
+from flask import Blueprint, request, make_response
+from flask_login import login_user, current_user
+
+from database import (
+    db, generate_run, get_exp_reward, users_by_exp, section_ranking,
+    find_user_by_login, SECTION_CONFIG, SESSION_LIVES
+)
+from game import (
+    SECTIONS_DISPLAY, GameError, session_user_id, sectors_data, skills_data,
+    start_run, submit_answer, upgrade_sector, page_limit
+)
+from password_hashing import HashingOverloaded, password_hasher
+from render_cache import user_state_version
+from run_token import InvalidRunToken, load_run_token
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+# Leaderboards are the same for everyone, so shared caches may keep them briefly.
+LEADERBOARD_MAX_AGE = 5
+
+api = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+
+def _wants_msgpack():
+    if msgpack is None:
+        return False
+    best = request.accept_mimetypes.best_match(('application/json',) + MSGPACK_MIMETYPES)
+    return best in MSGPACK_MIMETYPES
+
+
+def _dumps_json(payload):
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+
+def respond(payload, status=200):
+    """Encode payload as msgpack or JSON, whichever the client accepts."""
+    if _wants_msgpack():
+        response = make_response(msgpack.packb(payload), status)
+        response.mimetype = 'application/msgpack'
+    else:
+        response = make_response(_dumps_json(payload), status)
+        response.mimetype = 'application/json'
+    response.vary.add('Accept')
+    return response
+
+
+def error(message, status=400):
+    return respond({'error': message}, status)
+
+
+def request_data():
+    """Decoded request body (msgpack or JSON); an empty dict when absent or malformed."""
+    if request.mimetype in MSGPACK_MIMETYPES and msgpack is not None:
+        try:
+            data = msgpack.unpackb(request.get_data())
+        except ValueError:
+            data = None
+    else:
+        data = request.get_json(silent=True)
+    return data if isinstance(data, dict) else {}
+
+
+def respond_cached(payload_fn, tag):
+    """Respond with a per-user ETag, answering 304 when the client is current."""
+    etag = f"{tag}-{user_state_version(current_user)}"
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = respond(payload_fn())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def api_login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return error('Authentication required', 401)
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def compact_problems(problems):
+    return [[p['question'], p['options']] for p in problems]
+
+
+@api.route('/login', methods=['POST'])
+def login():
+    data = request_data()
+    user = find_user_by_login(str(data.get('login') or ''))
+    try:
+        if user is None or not user.check_password(data.get('password') or ''):
+            return error('Invalid username/email or password', 401)
+        if password_hasher.needs_rehash(user.password_hash):
+            user.set_password(data['password'])
+            db.session.commit()
+    except HashingOverloaded:
+        return error('Too many sign-ins right now, please try again in a moment', 503)
+    login_user(user)
+    return respond({'id': user.id, 'username': user.username, 'exp': user.exp})
+
+
+@api.route('/sectors')
+@api_login_required
+def sectors():
+    def payload():
+        return {
+            'exp': current_user.exp,
+            'sectors': [
+                {
+                    'key': s['key'], 'name': s['name'], 'available': s['available'],
+                    'level': s['level'], 'difficulty': s['difficulty'], 'range': s['range'],
+                    'upgrade_cost': s['upgrade_cost'], 'exp_per_problem': s['exp_per_problem'],
+                    'solved': s['total_solved'], 'exp_earned': s['total_exp']
+                }
+                for s in sectors_data(current_user)
+            ]
+        }
+    return respond_cached(payload, 'sectors')
+
+
+@api.route('/skills')
+@api_login_required
+def skills():
+    def payload():
+        skills_list, total_problems, total_exp_earned = skills_data(current_user)
+        return {
+            'exp': current_user.exp,
+            'solved': total_problems,
+            'exp_earned': total_exp_earned,
+            'skills': [
+                {'key': s['key'], 'level': s['level'], 'difficulty': s['difficulty'],
+                 'solved': s['total_solved'], 'exp_earned': s['total_exp']}
+                for s in skills_list
+            ]
+        }
+    return respond_cached(payload, 'skills')
+
+
+@api.route('/runs', methods=['POST'])
+@api_login_required
+def create_run():
+    """Start a run. Body: ``{"section", "level"?}``."""
+    data = request_data()
+    section = data.get('section')
+    level = data.get('level')
+    if not isinstance(section, str):
+        return error('Invalid sector!')
+    if level is not None and not isinstance(level, int):
+        return error('Invalid level!')
+
+    try:
+        token, problems, level = start_run(current_user, section, level)
+    except GameError as e:
+        return error(e.message, e.status)
+
+    return respond({
+        'token': token,
+        'section': section,
+        'level': level,
+        'exp_reward': get_exp_reward(section, level),
+        'lives': SESSION_LIVES,
+        'problems': compact_problems(problems)
+    }, 201)
+
+
+@api.route('/runs/problems')
+def run_problems():
+    """Re-send a run's problems, e.g. after the client restarts. ``?token=``."""
+    user_id = session_user_id()
+    if user_id is None:
+        return error('Authentication required', 401)
+    try:
+        run = load_run_token(request.args.get('token'), user_id, consume=False)
+    except InvalidRunToken as e:
+        return error(str(e))
+    if run['section'] not in SECTIONS_DISPLAY:
+        return error('Invalid run token')
+
+    return respond({
+        'section': run['section'],
+        'level': run['level'],
+        'attempt': run['attempt'],
+        'solved': run['solved'],
+        'lives': run['lives'],
+        'problems': compact_problems(generate_run(run['section'], run['level'], run['seed'], run['tier']))
+    })
+
+
+@api.route('/runs/answer', methods=['POST'])
+def answer():
+    """Answer the current problem. Body: ``{"token", "answer", "latency_ms"?}``."""
+    user_id = session_user_id()
+    if user_id is None:
+        return error('Authentication required', 401)
+
+    data = request_data()
+    try:
+        result = submit_answer(user_id, data.get('token'), data.get('answer'), data.get('latency_ms'))
+    except GameError as e:
+        return error(e.message, e.status)
+    return respond(result)
+
+
+@api.route('/upgrade/<section>', methods=['POST'])
+@api_login_required
+def upgrade(section):
+    try:
+        return respond(upgrade_sector(current_user.id, section))
+    except GameError as e:
+        return error(e.message, e.status)
+
+
+@api.route('/leaderboard')
+@api.route('/leaderboard/<section>')
+def leaderboard(section=None):
+    """Ranked ``[username, exp]`` pairs, or ``[username, level, exp, solved]`` per section."""
+    after = request.args.get('after')
+    try:
+        if section is None:
+            users, next_cursor = users_by_exp(after, page_limit())
+            entries = [[u.username, u.exp] for u in users]
+        elif section in SECTION_CONFIG:
+            rows, next_cursor = section_ranking(section, after, page_limit())
+            entries = [[username, p.level, p.total_exp_earned, p.total_problems_solved] for p, username in rows]
+        else:
+            return error('Invalid sector')
+    except ValueError:
+        return error('Invalid cursor')
+
+    response = respond({'entries': entries, 'next': next_cursor})
+    response.cache_control.public = True
+    response.cache_control.max_age = LEADERBOARD_MAX_AGE
+    return response
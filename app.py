@@ -1,27 +1,97 @@
+"""Application factory.
+
+Importing this module only loads Flask and the config; everything else is
+imported inside ``create_app`` so CLI tools and tests pay only for what they
+use. Nothing touches the database at import time: create the schema with
+
+    flask --app app init-db
+
+and apply later schema changes with ``flask --app app migrate``. Run the
+development server with ``python app.py`` or ``flask --app app run``; WSGI
+servers take the factory, e.g. ``gunicorn 'app:create_app()'``.
+"""
+import click
 from flask import Flask
-from flask_login import LoginManager
-from database import db, User
+from flask.cli import with_appcontext
+
+from config import get_config
+
+
+def create_app(config=None, web=True):
+    """Build an app from a config class or profile name (default $MATHLY_CONFIG).
+
+    With web=False only the database is set up: no routes, background
+    workers or asset build, for scripts that just need the models.
+    """
+    if config is None or isinstance(config, str):
+        config = get_config(config)
+    app = Flask(__name__)
+    app.config.from_object(config)
+
+    from database import db, install_sqlite_pragmas
+    db.init_app(app)
+    with app.app_context():
+        install_sqlite_pragmas(db.engine, app.config['SQLITE_PRAGMAS'])
+    from migrations import migrate_command
+    from export import export_users_command
+    from synthetic import seed_users_command
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(recalibrate_skills_command)
+    app.cli.add_command(migrate_command)
+    app.cli.add_command(export_users_command)
+    app.cli.add_command(seed_users_command)
+    if not web:
+        return app
+
+    from answer_log import answer_log
+    from query_stats import query_stats
+    from metrics import metrics
+    from identity_cache import identity_cache
+    from password_hashing import password_hasher
+    from render_cache import render_cache
+    from assets import assets
+    from routes import main, login_manager
+    from api import api
 
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///game.db' 
-import os
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', os.urandom(24))
+    answer_log.init_app(app)
+    query_stats.init_app(app)
+    metrics.init_app(app)
+    identity_cache.init_app(app)
+    password_hasher.init_app(app)
+    render_cache.init_app(app)
+    assets.init_app(app)
+    login_manager.init_app(app)
 
-db.init_app(app)
+    app.register_blueprint(main)
+    app.register_blueprint(api)
+    return app
 
-login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
 
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
+@click.command('init-db')
+@click.option('--drop', is_flag=True, help='Drop every table first (destroys all data).')
+@with_appcontext
+def init_db_command(drop):
+    """Create missing tables and apply pending migrations."""
+    from flask import current_app
+    from database import db
+    from migrations import migration_metadata, pacing_options, run_migrations
+    if drop:
+        db.drop_all()
+        migration_metadata.drop_all(db.engine)
+    run_migrations(echo=click.echo, **pacing_options(current_app.config))
+    click.echo('Database initialized.')
 
-with app.app_context():
-    db.create_all()
 
+@click.command('recalibrate-skills')
+@click.option('--users-per-chunk', type=int, default=5000, show_default=True)
+@with_appcontext
+def recalibrate_skills_command(users_per_chunk):
+    """Recompute every skill rating from the answer history."""
+    from database import db
+    from skill import recalibrate
+    sequences, events = recalibrate(db.engine, users_per_chunk, echo=click.echo)
+    click.echo(f"Recalibrated {sequences} ratings from {events} answers.")
 
-from routes import *
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
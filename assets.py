@@ -0,0 +1,129 @@
+"""Fingerprinted, precompressed static assets.
+
+Page stylesheets and scripts live in ``static/`` (``css/``, ``js/`` and
+``tactical.css``). The build step copies each one to
+``static/build/<name>.<content hash><ext>`` next to gzip and, when the
+optional ``brotli`` package is installed, brotli variants, and records the
+mapping in ``static/build/manifest.json``. Templates reference assets with
+``asset_url('css/play.css')``; the hashed URLs are served from ``/assets/``
+with a one-year immutable Cache-Control and the best encoding the client
+accepts.
+
+Build ahead of deployment with ``python assets.py``; with
+``ASSETS_BUILD_ON_STARTUP`` (the default) the app builds on boot instead.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import tempfile
+
+from flask import request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+BUILD_DIR = os.path.join(STATIC_DIR, 'build')
+SOURCE_DIRS = ('css', 'js')
+SOURCE_FILES = ('tactical.css',)
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def _sources():
+    for name in SOURCE_FILES:
+        yield name
+    for folder in SOURCE_DIRS:
+        for name in sorted(os.listdir(os.path.join(STATIC_DIR, folder))):
+            yield f"{folder}/{name}"
+
+
+def _write_atomic(path, data):
+    # Several workers may build at once; never expose a half-written file.
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def build_assets():
+    """Fingerprint and precompress every asset. Returns the manifest."""
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    manifest = {}
+    for source in _sources():
+        with open(os.path.join(STATIC_DIR, source), 'rb') as f:
+            data = f.read()
+        stem, ext = os.path.splitext(source.replace('/', '-'))
+        name = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+        path = os.path.join(BUILD_DIR, name)
+        if not os.path.exists(path):
+            _write_atomic(path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                _write_atomic(path + '.br', brotli.compress(data, quality=11))
+            _write_atomic(path, data)
+        manifest[source] = name
+
+    _write_atomic(os.path.join(BUILD_DIR, 'manifest.json'), json.dumps(manifest, indent=2).encode('utf-8'))
+    return manifest
+
+
+def load_manifest():
+    try:
+        with open(os.path.join(BUILD_DIR, 'manifest.json')) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def manifest_digest(manifest):
+    """Short digest of a manifest; changes whenever any asset's content does."""
+    return hashlib.sha1(json.dumps(manifest, sort_keys=True).encode('utf-8')).hexdigest()[:8]
+
+
+class Assets:
+    def __init__(self, app=None):
+        self.manifest = {}
+        self.digest = manifest_digest(self.manifest)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ASSETS_BUILD_ON_STARTUP', True)
+        self.manifest = build_assets() if app.config['ASSETS_BUILD_ON_STARTUP'] else load_manifest()
+        self.digest = manifest_digest(self.manifest)
+        app.add_url_rule('/assets/<path:filename>', 'assets', serve_asset)
+        app.jinja_env.globals['asset_url'] = self.url
+
+    def url(self, source):
+        """URL of the fingerprinted build of source, or the plain static file if unbuilt."""
+        name = self.manifest.get(source)
+        if name is None:
+            return url_for('static', filename=source)
+        return url_for('assets', filename=name)
+
+
+def serve_asset(filename):
+    mimetype = mimetypes.guess_type(filename)[0]
+    accepted = request.accept_encodings
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if accepted[encoding] and os.path.exists(os.path.join(BUILD_DIR, filename + suffix)):
+            response = send_from_directory(BUILD_DIR, filename + suffix, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+            response.content_encoding = encoding
+            break
+    else:
+        response = send_from_directory(BUILD_DIR, filename, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+    response.cache_control.immutable = True
+    response.cache_control.public = True
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+assets = Assets()
+
+
+if __name__ == '__main__':
+    for source, name in build_assets().items():
+        print(f"{source} -> build/{name}")
@@ -0,0 +1,94 @@
+"""Bulk admin endpoint throughput benchmark.
+
+Seeds a throwaway database with N users, then applies the same EXP and level
+changes to every user twice: once through the per-user /admin/modify_exp and
+/admin/set_level endpoints and once through a single /admin/bulk/* request.
+
+    python -m benchmarks.admin_bulk --users 2000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+_workdir = tempfile.mkdtemp(prefix='mathly-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_workdir, 'bench.db')}"
+
+from app import create_app  # noqa: E402
+from database import db, User  # noqa: E402
+
+app = create_app()
+
+
+def seed(n):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        admin = User(username='admin', email='admin@example.invalid', is_admin=True, password_hash='x')
+        db.session.add(admin)
+        db.session.add_all(
+            User(username=f"user{i}", email=f"user{i}@example.invalid", password_hash='x', exp=0)
+            for i in range(n)
+        )
+        db.session.commit()
+        return admin.id, [u.id for u in User.query.filter_by(is_admin=False)]
+
+
+def admin_client(admin_id):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(admin_id)
+        sess['_fresh'] = True
+    return client
+
+
+def timed(label, n, fn):
+    start = time.perf_counter()
+    response = fn()
+    assert response is None or response.status_code == 200, response.get_json()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34}{elapsed:>9.3f}s{n / elapsed:>12.0f} ops/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=2000)
+    args = parser.parse_args()
+
+    admin_id, user_ids = seed(args.users)
+    client = admin_client(admin_id)
+    n = len(user_ids)
+
+    def per_user_exp():
+        for uid in user_ids:
+            client.post('/admin/modify_exp', json={'user_id': uid, 'action': 'add', 'amount': 10})
+
+    def bulk_exp():
+        return client.post('/admin/bulk/modify_exp', json={
+            'operations': [{'user_id': uid, 'action': 'add', 'amount': 10} for uid in user_ids]
+        })
+
+    def per_user_level():
+        for uid in user_ids:
+            client.post('/admin/set_level', json={'user_id': uid, 'section': 'addition', 'level': 3})
+
+    def bulk_level():
+        return client.post('/admin/bulk/set_level', json={
+            'operations': [{'user_id': uid, 'section': 'addition', 'level': 4} for uid in user_ids]
+        })
+
+    def filtered_exp():
+        return client.post('/admin/bulk/modify_exp', json={'filter': {'min_exp': 1}, 'action': 'set', 'amount': 0})
+
+    timed('modify_exp, one request per user', n, per_user_exp)
+    timed('bulk/modify_exp, one request', n, bulk_exp)
+    timed('set_level, one request per user', n, per_user_level)
+    timed('bulk/set_level, one request', n, bulk_level)
+    timed('bulk/modify_exp by filter', n, filtered_exp)
+
+    with app.app_context():
+        assert db.session.query(db.func.sum(User.exp)).scalar() == 0
+
+
+if __name__ == '__main__':
+    main()
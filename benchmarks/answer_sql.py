@@ -0,0 +1,91 @@
+"""Check that mid-run answers never touch the database.
+
+Plays runs through /check_answer and /api/v1/runs/answer on a throwaway
+database, counting the SQL statements each answer request issues (the
+answer log's background writer is not counted). Every answer before a
+run's last must issue none; exits non-zero otherwise.
+
+    python -m benchmarks.answer_sql --runs 20
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+
+_workdir = tempfile.mkdtemp(prefix='mathly-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_workdir, 'bench.db')}"
+
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app  # noqa: E402
+from database import db, User, SECTION_CONFIG, generate_run  # noqa: E402
+from run_token import load_run_token  # noqa: E402
+
+app = create_app()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--miss-rate', type=float, default=0.2)
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        user = User(username='answer-sql', email='answer-sql@example.invalid', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+        engine = db.engine
+
+    request_thread = threading.get_ident()
+    statements = []
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == request_thread:
+            statements.append(statement)
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+
+    rng = random.Random(0)
+    sections = list(SECTION_CONFIG)
+    mid_run = mid_run_sql = final = final_sql = 0
+    for i in range(args.runs):
+        section = sections[i % len(sections)]
+        path = '/check_answer' if i % 2 else '/api/v1/runs/answer'
+        token = client.post('/api/v1/runs', json={'section': section}).get_json()['token']
+        with app.test_request_context():
+            run = load_run_token(token, user_id, consume=False)
+        for problem in generate_run(section, run['level'], run['seed'], run['tier']):
+            correct = problem['correct']
+            if rng.random() < args.miss_rate:
+                answer = next(option for option in problem['options'] if option != correct)
+            else:
+                answer = correct
+            del statements[:]
+            result = client.post(path, json={'token': token, 'answer': str(answer)}).get_json()
+            token = result['token']
+            if token is None:
+                final += 1
+                final_sql += len(statements)
+                break
+            mid_run += 1
+            mid_run_sql += len(statements)
+            if statements:
+                print(f"{path} {section}: mid-run answer issued {len(statements)} statements:")
+                for statement in statements:
+                    print(f"    {statement}")
+
+    print(f"mid-run answers: {mid_run}, statements: {mid_run_sql}")
+    print(f"final answers:   {final}, statements: {final_sql} ({final_sql / max(final, 1):.1f} per run)")
+    print('no SQL on mid-run answers' if not mid_run_sql else 'MID-RUN ANSWERS HIT THE DATABASE')
+    raise SystemExit(0 if not mid_run_sql else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""HTML routes vs the /api/v1 JSON API.
+
+Requests each dashboard, run start and answer both ways for a throwaway
+user and reports median and p95 latency plus response size (raw and
+gzipped). When the optional ``msgpack`` package is installed the API is
+also measured with ``Accept: application/msgpack``. Answer timings include
+starting the run that issues the token.
+
+    python -m benchmarks.api_vs_html --requests 300
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+import statistics
+import tempfile
+import time
+
+_workdir = tempfile.mkdtemp(prefix='mathly-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_workdir, 'bench.db')}"
+
+from app import create_app  # noqa: E402
+from database import db, User, set_sector_level  # noqa: E402
+from api import msgpack  # noqa: E402
+
+app = create_app()
+
+TOKEN_RE = re.compile(rb'let runToken = (.*?);')
+
+
+def html_start(client):
+    response = client.get('/play/addition')
+    return response, json.loads(TOKEN_RE.search(response.data).group(1))
+
+
+def api_start(client, headers):
+    response = client.post('/api/v1/runs', json={'section': 'addition'}, headers=headers)
+    if msgpack is not None and response.mimetype == 'application/msgpack':
+        return response, msgpack.unpackb(response.data)['token']
+    return response, response.json['token']
+
+
+def scenarios(headers):
+    """(name, html request, api request); each request returns the response to measure."""
+    return [
+        ('sectors', lambda c: c.get('/play'), lambda c: c.get('/api/v1/sectors', headers=headers)),
+        ('skills', lambda c: c.get('/skills'), lambda c: c.get('/api/v1/skills', headers=headers)),
+        ('start run', lambda c: html_start(c)[0], lambda c: api_start(c, headers)[0]),
+        ('answer',
+         lambda c: c.post('/check_answer', json={'token': html_start(c)[1], 'answer': -1}),
+         lambda c: c.post('/api/v1/runs/answer', json={'token': api_start(c, headers)[1], 'answer': -1},
+                          headers=headers)),
+        ('leaderboard', lambda c: c.get('/leaderboard'), lambda c: c.get('/api/v1/leaderboard', headers=headers)),
+    ]
+
+
+def measure(client, request, n):
+    """Median/p95 latency in ms and raw/gzipped size of the measured response."""
+    timings = []
+    for _ in range(n):
+        start = time.perf_counter()
+        response = request(client)
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code < 400, response.status_code
+    body = response.get_data()
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1], len(body), len(gzip.compress(body))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=300)
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(username='bench', email='bench@example.invalid', password_hash='x', exp=500)
+        db.session.add(user)
+        db.session.add_all(
+            User(username=f"user{i}", email=f"user{i}@example.invalid", password_hash='x', exp=i)
+            for i in range(100)
+        )
+        db.session.commit()
+        set_sector_level(user.id, 'addition', 5)
+        db.session.commit()
+        user_id = user.id
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+
+    encodings = [('json', {})]
+    if msgpack is not None:
+        encodings.append(('msgpack', {'Accept': 'application/msgpack'}))
+
+    print(f"{'scenario':<13}{'route':<9}{'p50 ms':>9}{'p95 ms':>9}{'bytes':>9}{'gzip':>8}")
+    for encoding, headers in encodings:
+        for name, html_request, api_request in scenarios(headers):
+            rows = [('api' if encoding == 'json' else 'msgpack', api_request)]
+            if encoding == 'json':
+                rows.insert(0, ('html', html_request))
+            for route, request in rows:
+                p50, p95, size, gzipped = measure(client, request, args.requests)
+                print(f"{name:<13}{route:<9}{p50:>9.2f}{p95:>9.2f}{size:>9}{gzipped:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Database profile write-throughput benchmark.
+
+Runs the same mixed workload against a fresh database for each config
+profile: writer threads commit small transactions shaped like a completed run
+(XP increment plus an answer event) while reader threads run leaderboard-style
+reads. Reports committed writes/s, reads/s and "database is locked" errors.
+
+SQLite profiles run on a temporary file. Every table is dropped and
+recreated first, so the server profile never runs against the app's
+DATABASE_URL: it needs a dedicated database given with --server-url (or
+BENCH_DATABASE_URL) and is skipped without one.
+
+    python -m benchmarks.db_profiles --seconds 5 --writers 8 --readers 4
+    python -m benchmarks.db_profiles --profiles server --server-url postgresql://bench@localhost/mathly_bench
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from config import PROFILES, ServerConfig
+from database import db, install_sqlite_pragmas
+
+USERS = 1000
+
+
+def is_server(profile):
+    return issubclass(profile, ServerConfig)
+
+
+def make_engine(profile, workdir, server_url):
+    url = server_url if is_server(profile) else f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    engine = create_engine(url, **profile.SQLALCHEMY_ENGINE_OPTIONS)
+    install_sqlite_pragmas(engine, profile.SQLITE_PRAGMAS)
+    return engine
+
+
+def prepare(engine):
+    db.metadata.drop_all(engine)
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO users (id, username, email, password_hash, exp, level, is_admin) "
+                 "VALUES (:id, :name, :email, 'x', 0, 1, false)"),
+            [{'id': i, 'name': f"user{i}", 'email': f"user{i}@example.invalid"} for i in range(1, USERS + 1)]
+        )
+
+
+def run_workload(engine, seconds, writers, readers):
+    stop = threading.Event()
+    counts = {'writes': 0, 'reads': 0, 'locked': 0}
+    lock = threading.Lock()
+
+    def bump(key):
+        with lock:
+            counts[key] += 1
+
+    def writer(worker):
+        i = 0
+        while not stop.is_set():
+            user_id = (worker * 7919 + i) % USERS + 1
+            i += 1
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text("UPDATE users SET exp = exp + 5 WHERE id = :id"), {'id': user_id})
+                    conn.execute(
+                        text("INSERT INTO answer_events (user_id, section, level, question, answer, "
+                             "expected, is_correct, created_at) VALUES (:id, 'addition', 1, '1 + 1', '2', '2', true, :ts)"),
+                        {'id': user_id, 'ts': datetime.now(timezone.utc).replace(tzinfo=None)}
+                    )
+                bump('writes')
+            except OperationalError:
+                bump('locked')
+
+    def reader():
+        while not stop.is_set():
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text("SELECT id, exp FROM users ORDER BY exp DESC LIMIT 20")).all()
+                bump('reads')
+            except OperationalError:
+                bump('locked')
+
+    threads = [threading.Thread(target=writer, args=(w,)) for w in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--profiles', nargs='*', choices=list(PROFILES), default=None)
+    parser.add_argument('--server-url', default=os.environ.get('BENCH_DATABASE_URL'),
+                        help='Throwaway server database for the server profile; all its tables are dropped.')
+    args = parser.parse_args()
+
+    if args.server_url and args.server_url == os.environ.get('DATABASE_URL'):
+        parser.error('--server-url is the app\'s DATABASE_URL; use a dedicated benchmark database')
+    names = args.profiles or [n for n, p in PROFILES.items() if args.server_url or not is_server(p)]
+    if not args.server_url and any(is_server(PROFILES[n]) for n in names):
+        parser.error('the server profile needs --server-url or BENCH_DATABASE_URL')
+
+    print(f"{'profile':<14}{'writes/s':>12}{'reads/s':>12}{'locked':>10}")
+    for name in names:
+        with tempfile.TemporaryDirectory() as workdir:
+            engine = make_engine(PROFILES[name], workdir, args.server_url)
+            prepare(engine)
+            counts = run_workload(engine, args.seconds, args.writers, args.readers)
+            engine.dispose()
+        print(f"{name:<14}{counts['writes'] / args.seconds:>12.0f}"
+              f"{counts['reads'] / args.seconds:>12.0f}{counts['locked']:>10}")
+
+
+if __name__ == '__main__':
+    main()
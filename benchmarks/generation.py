@@ -0,0 +1,50 @@
+"""Problem generation microbenchmark.
+
+Times generate_problem for every section at each level and reports the p99
+and worst-case latency per section, plus the slowest level seen.
+
+    python -m benchmarks.generation --levels 50 --samples 2000
+"""
+import argparse
+import time
+
+from database import SECTION_CONFIG, generate_problem
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return sorted_values[index]
+
+
+def bench_level(section, level, samples):
+    timings = []
+    clock = time.perf_counter_ns
+    for _ in range(samples):
+        start = clock()
+        generate_problem(section, level)
+        timings.append(clock() - start)
+    timings.sort()
+    return percentile(timings, 50), percentile(timings, 99), timings[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--levels', type=int, default=50)
+    parser.add_argument('--samples', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'section':<16}{'p50 us':>10}{'p99 us':>10}{'max us':>10}  worst level")
+    for section in SECTION_CONFIG:
+        p50s, p99s, worst, worst_level = [], [], 0, 1
+        for level in range(1, args.levels + 1):
+            p50, p99, slowest = bench_level(section, level, args.samples)
+            p50s.append(p50)
+            p99s.append(p99)
+            if slowest > worst:
+                worst, worst_level = slowest, level
+        print(f"{section:<16}{max(p50s) / 1000:>10.2f}{max(p99s) / 1000:>10.2f}"
+              f"{worst / 1000:>10.2f}  {worst_level}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Generator sanity check over every section, level and tier.
+
+For each (section, level, tier) draws problems from many seeds and checks that every answer is non-negative, that there are four
+distinct options including the answer, and that the answer survives the
+section's parse_answer unchanged. Prints the first violations and exits
+non-zero if there are any.
+
+    python -m benchmarks.generator_check --levels 20 --seeds 100
+"""
+import argparse
+import random
+from decimal import Decimal
+from fractions import Fraction
+
+from database import SECTION_CONFIG, SKILL_TIERS, generate_session, generator_for
+
+
+def value(answer):
+    """Numeric value of an answer in any section's canonical form."""
+    if isinstance(answer, str):
+        return Fraction(answer) if '/' in answer else Decimal(answer)
+    return answer
+
+
+def problems_of(section, level, tier, seeds, n):
+    for seed in range(seeds):
+        yield from generate_session(section, level, n, random.Random(seed), tier)
+
+
+def check(problem, parse_answer):
+    correct, options = problem['correct'], problem['options']
+    if value(correct) < 0:
+        return 'negative answer'
+    if any(value(option) < 0 for option in options):
+        return 'negative option'
+    if len(options) != 4 or len(set(options)) != 4:
+        return 'options not four distinct values'
+    if correct not in options:
+        return 'answer missing from options'
+    if parse_answer(str(correct)) != correct:
+        return 'answer does not round-trip through parse_answer'
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--levels', type=int, default=20)
+    parser.add_argument('--seeds', type=int, default=100)
+    parser.add_argument('--problems', type=int, default=20, help='Problems per seed.')
+    args = parser.parse_args()
+
+    checked = failures = 0
+    for section in SECTION_CONFIG:
+        parse_answer = generator_for(section).parse_answer
+        for level in range(1, args.levels + 1):
+            for tier in [None] + list(range(SKILL_TIERS)):
+                for problem in problems_of(section, level, tier, args.seeds, args.problems):
+                    checked += 1
+                    problem_error = check(problem, parse_answer)
+                    if problem_error:
+                        failures += 1
+                        if failures <= 20:
+                            print(f"{section} level {level} tier {tier}: {problem_error}: "
+                                  f"{problem['question']} = {problem['correct']} {problem['options']}")
+
+    print(f"{checked} problems checked, {failures} failures")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Per-generator throughput benchmark.
+
+Generates whole runs (batch) and single problems (scalar) with every
+registered generator at each level and reports problems per second. Each
+generator is compared with addition at the same level; any level where it
+is more than --max-ratio times slower is flagged and the exit status is 1.
+
+    python -m benchmarks.generator_throughput --levels 50 --max-ratio 3
+"""
+import argparse
+import random
+import sys
+import time
+
+from database import RUN_LENGTH, get_difficulty_params
+from generators import GENERATORS
+
+
+def throughput(generator, level, mode, duration):
+    """Problems generated per second at level, best of three rounds."""
+    bounds = get_difficulty_params(level)
+    rng = random.Random(level)
+    n = RUN_LENGTH if mode == 'batch' else 1
+    # Calibrate the round size so clock reads stay out of the measurement.
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            generator.batch(level, bounds, n, rng) if n > 1 else generator.generate(level, bounds, rng)
+        elapsed = time.perf_counter() - start
+        if elapsed >= duration / 3:
+            break
+        calls *= 2
+
+    best = elapsed
+    for _ in range(2):
+        start = time.perf_counter()
+        for _ in range(calls):
+            generator.batch(level, bounds, n, rng) if n > 1 else generator.generate(level, bounds, rng)
+        best = min(best, time.perf_counter() - start)
+    return calls * n / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--levels', type=int, default=50)
+    parser.add_argument('--step', type=int, default=7, help='benchmark every step-th level (plus the last)')
+    parser.add_argument('--duration', type=float, default=0.05, help='seconds per measurement round')
+    parser.add_argument('--max-ratio', type=float, default=3.0,
+                        help='flag generators this many times slower than addition')
+    args = parser.parse_args()
+
+    levels = sorted(set(range(1, args.levels + 1, args.step)) | {args.levels})
+    failures = []
+    for mode in ('batch', 'scalar'):
+        print(f"\n{mode} ({RUN_LENGTH if mode == 'batch' else 1} problems per call)")
+        print(f"{'operation':<10}{'min/s':>12}{'median/s':>12}{'worst ratio':>13}  at level")
+        baseline = {level: throughput(GENERATORS['+'], level, mode, args.duration) for level in levels}
+        for operation, generator in GENERATORS.items():
+            rates = [throughput(generator, level, mode, args.duration) for level in levels]
+            ratios = [baseline[level] / rate for level, rate in zip(levels, rates)]
+            worst = max(range(len(levels)), key=ratios.__getitem__)
+            flag = ''
+            if ratios[worst] > args.max_ratio:
+                flag = '  SLOW'
+                failures.append((mode, operation, levels[worst], ratios[worst]))
+            print(f"{operation:<10}{min(rates):>12,.0f}{sorted(rates)[len(rates) // 2]:>12,.0f}"
+                  f"{ratios[worst]:>12.2f}x  {levels[worst]}{flag}")
+
+    if failures:
+        for mode, operation, level, ratio in failures:
+            print(f"{operation} ({mode}) is {ratio:.2f}x slower than addition at level {level}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,363 @@
+"""End-to-end load test of the play loop.
+
+Simulates many concurrent players, each scripting a real journey:
+register -> /play -> (/play/<section> -> 7x /check_answer) per run ->
+/upgrade/<section>. An admin journey lists /admin alongside them. Players
+answer from the run's seed (as the game client would know the right
+option) and miss a configurable share of problems.
+
+Reports throughput and p50/p95/p99 latency per route. Against the Flask
+test client (the default) it also reports SQL statements and SQL time per
+request, time spent in write statements (where SQLite waits for the write
+lock under busy_timeout) and "database is locked" failures. With
+``--base-url`` the same journeys run over HTTP against a local server; SQL
+numbers are then not available.
+
+    python -m benchmarks.load_test --players 200 --concurrency 16 --output results.json
+    python -m benchmarks.load_test --base-url http://localhost:5000 --players 50
+    python -m benchmarks.load_test --compare results.json
+
+``--output`` saves the report (with the git commit) as JSON; ``--compare``
+prints the p95 and SQL-per-request deltas against a saved report.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+
+TOKEN_RE = re.compile(rb'let runToken = (.*?);')
+SECTIONS = ('addition', 'subtraction', 'multiplication', 'division')
+WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class SQLCounter:
+    """Counts statements, SQL time and write time per request on the calling thread."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self.lock_errors = 0
+
+    def install(self, engine):
+        from sqlalchemy import event
+        event.listen(engine, 'before_cursor_execute', self._before)
+        event.listen(engine, 'after_cursor_execute', self._after)
+        event.listen(engine, 'handle_error', self._error)
+
+    def start(self):
+        self._local.stats = {'statements': 0, 'sql_ms': 0.0, 'write_ms': 0.0}
+
+    def stop(self):
+        return self._local.__dict__.pop('stats', None)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        context._load_test_start = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        stats = getattr(self._local, 'stats', None)
+        if stats is None:
+            return
+        elapsed = (time.perf_counter() - context._load_test_start) * 1000
+        stats['statements'] += 1
+        stats['sql_ms'] += elapsed
+        if statement.lstrip().upper().startswith(WRITE_PREFIXES):
+            stats['write_ms'] += elapsed
+
+    def _error(self, context):
+        if 'locked' in str(context.original_exception):
+            self.lock_errors += 1
+
+
+class Recorder:
+    def __init__(self, sql=None):
+        self.sql = sql
+        self.routes = defaultdict(lambda: {'latencies': [], 'errors': 0, 'statements': 0,
+                                           'sql_ms': 0.0, 'write_ms': 0.0})
+        self._lock = threading.Lock()
+
+    def call(self, route, fn, ok=(200,)):
+        """Time fn() as one request of route; returns (status, body)."""
+        if self.sql:
+            self.sql.start()
+        start = time.perf_counter()
+        status, body = fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        sql = self.sql.stop() if self.sql else None
+        with self._lock:
+            entry = self.routes[route]
+            entry['latencies'].append(elapsed)
+            if status not in ok:
+                entry['errors'] += 1
+            if sql:
+                entry['statements'] += sql['statements']
+                entry['sql_ms'] += sql['sql_ms']
+                entry['write_ms'] += sql['write_ms']
+        return status, body
+
+    def report(self, wall_s):
+        routes = {}
+        total = 0
+        for route, entry in sorted(self.routes.items()):
+            latencies = sorted(entry['latencies'])
+            n = len(latencies)
+            total += n
+            routes[route] = {
+                'requests': n,
+                'errors': entry['errors'],
+                'p50_ms': round(percentile(latencies, 50), 3),
+                'p95_ms': round(percentile(latencies, 95), 3),
+                'p99_ms': round(percentile(latencies, 99), 3),
+                'mean_ms': round(sum(latencies) / n, 3),
+            }
+            if self.sql:
+                routes[route].update(
+                    sql_per_request=round(entry['statements'] / n, 2),
+                    sql_ms_per_request=round(entry['sql_ms'] / n, 3),
+                    write_ms_per_request=round(entry['write_ms'] / n, 3),
+                )
+        return {
+            'wall_s': round(wall_s, 3),
+            'requests': total,
+            'throughput_rps': round(total / wall_s, 1),
+            'lock_errors': self.sql.lock_errors if self.sql else None,
+            'routes': routes,
+        }
+
+
+class TestClient:
+    """Journey client on the in-process Flask test client."""
+
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def login_as(self, user_id):
+        with self._client.session_transaction() as sess:
+            sess['_user_id'] = str(user_id)
+            sess['_fresh'] = True
+
+    def get(self, path):
+        response = self._client.get(path)
+        return response.status_code, response.data
+
+    def post_form(self, path, data):
+        response = self._client.post(path, data=data)
+        return response.status_code, response.data
+
+    def post_json(self, path, data=None):
+        response = self._client.post(path, json=data)
+        return response.status_code, response.data
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HTTPClient:
+    """Journey client speaking HTTP to a running server, with its own cookie jar."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self._opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(CookieJar()), _NoRedirect)
+
+    def _send(self, path, data=None, content_type=None):
+        request = urllib.request.Request(self.base_url + path, data=data)
+        if content_type:
+            request.add_header('Content-Type', content_type)
+        try:
+            with self._opener.open(request) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def get(self, path):
+        return self._send(path)
+
+    def post_form(self, path, data):
+        return self._send(path, urllib.parse.urlencode(data).encode(), 'application/x-www-form-urlencoded')
+
+    def post_json(self, path, data=None):
+        return self._send(path, json.dumps(data or {}).encode(), 'application/json')
+
+
+def run_answers(token):
+    """Answers for the run a token belongs to, regenerated from its seed."""
+    from database import run_solutions
+    from run_token import _FIELDS
+    state = dict(zip(_FIELDS, token.split('.')[0].split(':')))
+    return [correct for _, correct in run_solutions(
+        state['section'], int(state['level']), int(state['seed']), int(state['tier']))]
+
+
+def player_journey(client, recorder, rng, name, runs, miss_rate):
+    recorder.call('POST /register', lambda: client.post_form('/register', {
+        'username': name, 'email': f"{name}@example.invalid", 'password': 'load-test'}), ok=(302,))
+    recorder.call('GET /play', lambda: client.get('/play'))
+
+    section = rng.choice(SECTIONS)
+    for _ in range(runs):
+        status, body = recorder.call('GET /play/<section>', lambda: client.get(f'/play/{section}'))
+        match = TOKEN_RE.search(body) if status == 200 else None
+        if match is None:
+            return
+        token = json.loads(match.group(1))
+        answers = iter(run_answers(token))
+        while token:
+            correct = next(answers)
+            answer = correct + 1 if rng.random() < miss_rate else correct
+            status, body = recorder.call('POST /check_answer', lambda: client.post_json(
+                '/check_answer', {'answer': answer, 'token': token, 'latency_ms': rng.randint(800, 6000)}))
+            if status != 200:
+                return
+            token = json.loads(body)['token']
+
+    # Too little XP is an expected 400 for players who missed a lot.
+    recorder.call('POST /upgrade/<section>', lambda: client.post_json(f'/upgrade/{section}'), ok=(200, 400))
+
+
+def admin_journey(client, recorder, pages):
+    for _ in range(pages):
+        recorder.call('GET /admin', lambda: client.get('/admin'))
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report):
+    print(f"{report['requests']} requests in {report['wall_s']:.2f}s "
+          f"({report['throughput_rps']:.1f} req/s)")
+    if report['lock_errors'] is not None:
+        print(f"database locked errors: {report['lock_errors']}")
+    sql_header = f"{'sql/req':>9}{'sql ms':>8}{'write ms':>9}" if report['lock_errors'] is not None else ''
+    print(f"{'route':<24}{'n':>7}{'err':>5}{'p50':>9}{'p95':>9}{'p99':>9}{sql_header}")
+    for route, r in report['routes'].items():
+        sql = (f"{r['sql_per_request']:>9.2f}{r['sql_ms_per_request']:>8.2f}{r['write_ms_per_request']:>9.2f}"
+               if 'sql_per_request' in r else '')
+        print(f"{route:<24}{r['requests']:>7}{r['errors']:>5}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}{sql}")
+
+
+def print_comparison(report, baseline):
+    print(f"\nvs {baseline.get('commit') or 'baseline'}: "
+          f"throughput {baseline['throughput_rps']:.1f} -> {report['throughput_rps']:.1f} req/s")
+    for route, r in report['routes'].items():
+        old = baseline['routes'].get(route)
+        if old is None:
+            continue
+        line = f"{route:<24}p95 {old['p95_ms']:>8.2f} -> {r['p95_ms']:>8.2f} ms"
+        if 'sql_per_request' in r and 'sql_per_request' in old:
+            line += f"   sql/req {old['sql_per_request']:>6.2f} -> {r['sql_per_request']:>6.2f}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--players', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--runs', type=int, default=4, help='runs per player before the upgrade')
+    parser.add_argument('--miss-rate', type=float, default=0.1)
+    parser.add_argument('--admin-pages', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--config', help='config profile for the in-process app (default $MATHLY_CONFIG)')
+    parser.add_argument('--hash-method', default='pbkdf2:sha256:1000',
+                        help="password KDF for registrations; 'default' keeps the configured one")
+    parser.add_argument('--base-url', help='run against a local server instead of the test client')
+    parser.add_argument('--admin', help='USER:PASSWORD of an admin account on --base-url')
+    parser.add_argument('--output', help='save the report as JSON')
+    parser.add_argument('--compare', help='JSON report to compare against')
+    args = parser.parse_args()
+
+    sql = None
+    if args.base_url:
+        make_client = lambda: HTTPClient(args.base_url)  # noqa: E731
+        admin_client = None
+        if args.admin:
+            admin_client = make_client()
+            username, _, password = args.admin.partition(':')
+            admin_client.post_form('/login', {'username': username, 'password': password})
+    else:
+        if args.config:
+            os.environ['MATHLY_CONFIG'] = args.config
+        os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(
+            tempfile.mkdtemp(prefix='mathly-bench-'), 'bench.db'))
+        from app import create_app
+        app = create_app()
+        from database import db, User
+        from password_hashing import password_hasher
+        if args.hash_method != 'default':
+            password_hasher.method = args.hash_method
+
+        with app.app_context():
+            db.create_all()
+            admin = User(username=f"admin-{args.seed}-{time.time_ns()}", email='admin@example.invalid',
+                         is_admin=True, password_hash='x')
+            db.session.add(admin)
+            db.session.commit()
+            admin_id = admin.id
+            sql = SQLCounter()
+            sql.install(db.engine)
+
+        make_client = lambda: TestClient(app)  # noqa: E731
+        admin_client = make_client()
+        admin_client.login_as(admin_id)
+
+    recorder = Recorder(sql)
+    prefix = f"lt{args.seed}-{time.time_ns() % 10**9}"
+
+    def journey(i):
+        rng = random.Random(args.seed * 1_000_003 + i)
+        player_journey(make_client(), recorder, rng, f"{prefix}-{i}", args.runs, args.miss_rate)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        futures = [pool.submit(journey, i) for i in range(args.players)]
+        if admin_client is not None:
+            futures.append(pool.submit(admin_journey, admin_client, recorder, args.admin_pages))
+        for future in futures:
+            future.result()
+    report = recorder.report(time.perf_counter() - start)
+    report.update(
+        commit=git_commit(),
+        target=args.base_url or 'test-client',
+        config=args.config or os.environ.get('MATHLY_CONFIG', 'dev'),
+        players=args.players,
+        concurrency=args.concurrency,
+        runs=args.runs,
+        seed=args.seed,
+    )
+
+    print_report(report)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(report, json.load(f))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nsaved {args.output}")
+
+
+if __name__ == '__main__':
+    main()
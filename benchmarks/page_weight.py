@@ -0,0 +1,60 @@
+"""Per-page transfer size.
+
+Renders each main page for a throwaway admin user and adds up the bytes a
+browser downloads: the HTML plus every local stylesheet and script it links,
+fetched with ``Accept-Encoding: br, gzip``. "First view" counts everything;
+"repeat view" assumes fingerprinted /assets/ files are served from the
+browser cache and only re-downloads the HTML and uncacheable assets.
+
+    python -m benchmarks.page_weight
+"""
+import os
+import re
+import tempfile
+
+_workdir = tempfile.mkdtemp(prefix='mathly-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_workdir, 'bench.db')}"
+
+from app import create_app  # noqa: E402
+from database import db, User  # noqa: E402
+
+app = create_app()
+
+PAGES = ['/', '/login', '/play', '/skills', '/play/addition', '/admin']
+ASSET_RE = re.compile(r'''(?:href|src)="(/(?:static|assets)/[^"]+)"''')
+
+
+def main():
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        admin = User(username='admin', email='admin@example.invalid', is_admin=True, password_hash='x')
+        db.session.add(admin)
+        db.session.commit()
+        admin_id = admin.id
+
+    client = app.test_client()
+    headers = {'Accept-Encoding': 'br, gzip'}
+
+    print(f"{'page':<16}{'html':>10}{'assets':>10}{'first view':>12}{'repeat view':>13}")
+    for page in PAGES:
+        if page != '/login':
+            with client.session_transaction() as sess:
+                sess['_user_id'] = str(admin_id)
+                sess['_fresh'] = True
+        else:
+            with client.session_transaction() as sess:
+                sess.clear()
+        html = client.get(page, headers=headers).get_data()
+        assets = cached = 0
+        for url in sorted(set(ASSET_RE.findall(html.decode('utf-8')))):
+            response = client.get(url, headers=headers)
+            size = len(response.get_data())
+            assets += size
+            if 'immutable' in response.headers.get('Cache-Control', ''):
+                cached += size
+        print(f"{page:<16}{len(html):>10}{assets:>10}{len(html) + assets:>12}{len(html) + assets - cached:>13}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Skill rating cost: per-answer update vs a whole answer request, and replay throughput.
+
+Times update_rating + choose_tier per call, then plays runs through the JSON
+API in-process on a throwaway database and reports what share of a /api/v1/runs/answer request the
+update accounts for. Finally replays synthetic answer histories with the
+vectorized recompute and with the per-answer loop.
+
+    python -m benchmarks.skill_update --answers 2000 --histories 20000
+"""
+import argparse
+import os
+import random
+import secrets
+import tempfile
+import time
+
+_workdir = tempfile.mkdtemp(prefix='mathly-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_workdir, 'bench.db')}"
+
+from app import create_app  # noqa: E402
+from database import db, User, SKILL_TIERS, run_solutions  # noqa: E402
+from run_token import load_run_token  # noqa: E402
+import skill  # noqa: E402
+
+app = create_app()
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return sorted_values[index]
+
+
+def bench_update(samples):
+    rng = random.Random(0)
+    cases = [(rng.randint(800, 3000), rng.randint(0, 500), rng.randint(1, 30),
+              rng.randrange(SKILL_TIERS), rng.random() < 0.75) for _ in range(samples)]
+    timings = []
+    clock = time.perf_counter_ns
+    for rating, rated, level, tier, correct in cases:
+        start = clock()
+        rating, rated = skill.update_rating(rating, rated, level, tier, correct)
+        skill.choose_tier(rating, level)
+        timings.append(clock() - start)
+    timings.sort()
+    return percentile(timings, 50), percentile(timings, 99)
+
+
+def bench_requests(answers, miss_rate):
+    rng = random.Random(0)
+    name = f"skill-{secrets.token_hex(4)}"
+    with app.app_context():
+        db.create_all()
+        user = User(username=name, email=f"{name}@example.invalid")
+        user.set_password(secrets.token_hex(8))
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+
+    timings = []
+    while len(timings) < answers:
+        token = client.post('/api/v1/runs', json={'section': 'addition'}).get_json()['token']
+        with app.test_request_context():
+            run = load_run_token(token, user_id, consume=False)
+        solutions = run_solutions(run['section'], run['level'], run['seed'], run['tier'])
+        attempt = 0
+        while token and len(timings) < answers:
+            answer = -1 if rng.random() < miss_rate else solutions[attempt][1]
+            start = time.perf_counter_ns()
+            token = client.post('/api/v1/runs/answer', json={'token': token, 'answer': answer}).get_json()['token']
+            timings.append(time.perf_counter_ns() - start)
+            attempt += 1
+
+    timings.sort()
+    return percentile(timings, 50), percentile(timings, 99)
+
+
+def bench_replay(histories, mean_answers):
+    rng = random.Random(0)
+    groups, levels, tiers, correct = [], [], [], []
+    for group in range(histories):
+        for _ in range(1 + int(rng.expovariate(1 / mean_answers))):
+            groups.append(group)
+            levels.append(rng.randint(1, 20))
+            tiers.append(rng.randrange(SKILL_TIERS))
+            correct.append(rng.random() < 0.75)
+
+    try:
+        import numpy  # noqa: F401
+        replays = (('vectorized', skill.replay), ('loop', skill._replay_loop))
+    except ImportError:
+        replays = (('loop', skill._replay_loop),)
+
+    results = {}
+    for label, fn in replays:
+        start = time.perf_counter()
+        results[label] = fn(groups, levels, tiers, correct)
+        elapsed = time.perf_counter() - start
+        print(f"replay {label:<11}{len(groups):>10} answers {elapsed:>8.2f}s "
+              f"({len(groups) / elapsed:>12,.0f} answers/s)")
+    if len(results) == 2:
+        print('vectorized replay matches the loop' if results['vectorized'] == results['loop']
+              else 'REPLAY MISMATCH')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--samples', type=int, default=200000)
+    parser.add_argument('--answers', type=int, default=2000)
+    parser.add_argument('--miss-rate', type=float, default=0.2)
+    parser.add_argument('--histories', type=int, default=20000)
+    parser.add_argument('--mean-answers', type=int, default=50)
+    args = parser.parse_args()
+
+    update_p50, update_p99 = bench_update(args.samples)
+    print(f"update_rating + choose_tier: p50 {update_p50 / 1000:.2f} us, p99 {update_p99 / 1000:.2f} us")
+    request_p50, request_p99 = bench_requests(args.answers, args.miss_rate)
+    print(f"POST /api/v1/runs/answer:    p50 {request_p50 / 1000:.0f} us, p99 {request_p99 / 1000:.0f} us")
+    print(f"rating update share of a median answer request: {100 * update_p50 / request_p50:.2f}%")
+    bench_replay(args.histories, args.mean_answers)
+
+
+if __name__ == '__main__':
+    main()
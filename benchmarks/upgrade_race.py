@@ -0,0 +1,74 @@
+"""Concurrent upgrade stress check.
+
+Fires many parallel /upgrade/<section> requests for a single throwaway user
+and verifies the XP ledger afterwards: the XP spent must equal the summed
+cost of every level gained, and the balance must never go negative. Runs
+on a throwaway database built by the migration runner.
+
+    python -m benchmarks.upgrade_race --requests 300 --threads 32
+"""
+import argparse
+import os
+import secrets
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_workdir = tempfile.mkdtemp(prefix='mathly-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_workdir, 'bench.db')}"
+
+from app import create_app  # noqa: E402
+from database import db, User, UserSectorProgress, get_upgrade_cost  # noqa: E402
+from migrations import run_migrations  # noqa: E402
+
+app = create_app()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--section', default='addition')
+    parser.add_argument('--exp', type=int, default=5000)
+    args = parser.parse_args()
+
+    name = f"race-{secrets.token_hex(4)}"
+    with app.app_context():
+        run_migrations(echo=lambda message: None)
+        user = User(username=name, email=f"{name}@example.invalid", exp=args.exp)
+        user.set_password(secrets.token_hex(8))
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    def upgrade(_):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(user_id)
+            sess['_fresh'] = True
+        return client.post(f'/upgrade/{args.section}').status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as pool:
+        statuses = list(pool.map(upgrade, range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        progress = UserSectorProgress.query.filter_by(user_id=user_id, section=args.section).first()
+        level = progress.level if progress else 1
+        spent = sum(get_upgrade_cost(lvl) for lvl in range(1, level))
+        consistent = user.exp >= 0 and args.exp - spent == user.exp
+
+        handled = statuses.count(200) + statuses.count(400) + statuses.count(409)
+        print(f"requests: {args.requests} in {elapsed:.2f}s "
+              f"({statuses.count(200)} ok, {statuses.count(400)} refused, "
+              f"{statuses.count(409)} contended, {len(statuses) - handled} errors)")
+        print(f"level 1 -> {level}, spent {spent}, remaining {user.exp}")
+        print('ledger consistent' if consistent else 'LEDGER MISMATCH')
+
+    raise SystemExit(0 if consistent else 1)
+
+
+if __name__ == '__main__':
+    main()
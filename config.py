@@ -0,0 +1,92 @@
+import os
+
+
+class Config:
+    """Settings shared by every profile. Select a profile with MATHLY_CONFIG."""
+    SECRET_KEY = os.environ.get('SECRET_KEY', os.urandom(24))
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///game.db')
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    # PRAGMA name -> value, run on every new SQLite connection.
+    SQLITE_PRAGMAS = {}
+    # Seconds a loaded user is reused by the user loader; 0 disables caching.
+    IDENTITY_CACHE_TTL = 0
+    # Werkzeug KDF spec; hashes made with other parameters are upgraded at login.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_WORKERS = 4
+    PASSWORD_HASH_MAX_QUEUE = 64
+    # Per-request SQL counts/timing (Server-Timing), slow-query and N+1 logging.
+    SQL_INSTRUMENTATION = os.environ.get('SQL_INSTRUMENTATION') == '1'
+    SQL_SLOW_QUERY_MS = 100
+    SQL_N_PLUS_ONE_THRESHOLD = 5
+    # Bound parameters in slow-query logs may hold credentials; local debugging only.
+    SQL_LOG_PARAMETERS = os.environ.get('SQL_LOG_PARAMETERS') == '1'
+    # Shared directory for aggregating metrics across worker processes.
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    # Bearer token that lets a scraper read /metrics without an admin session.
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    # Online migrations: rows per first chunk, target milliseconds per chunk and
+    # the largest share of wall time a backfill may spend holding locks.
+    MIGRATION_CHUNK_SIZE = 1000
+    MIGRATION_CHUNK_MS = 50
+    MIGRATION_DUTY_CYCLE = 0.5
+
+
+class DevConfig(Config):
+    """Local development: SQLite with driver defaults."""
+
+
+class SQLiteProdConfig(Config):
+    """Single-host production on SQLite.
+
+    WAL lets readers run alongside the single writer, synchronous=NORMAL
+    fsyncs at checkpoints instead of every commit (a power loss can roll back
+    the last transactions but never corrupts the file), and busy_timeout
+    makes writers queue for the lock instead of failing with "database is
+    locked". SQLite has no statement timeout; busy_timeout bounds lock waits.
+    """
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'cache_size': -64000,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+        'foreign_keys': 'ON',
+    }
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': 10,
+        'max_overflow': 20,
+        'pool_timeout': 10,
+        'connect_args': {'timeout': 5},
+    }
+    IDENTITY_CACHE_TTL = 5
+
+
+class ServerConfig(Config):
+    """Client/server RDBMS (PostgreSQL) behind a connection pool."""
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgresql://mathly@localhost/mathly')
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': 20,
+        'max_overflow': 10,
+        'pool_timeout': 10,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+        'connect_args': {'options': '-c statement_timeout=5000 -c lock_timeout=2000'},
+    }
+    IDENTITY_CACHE_TTL = 5
+
+
+PROFILES = {
+    'dev': DevConfig,
+    'sqlite-prod': SQLiteProdConfig,
+    'server': ServerConfig,
+}
+
+
+def get_config(name=None):
+    """Return the config class for name, defaulting to $MATHLY_CONFIG or 'dev'."""
+    name = name or os.environ.get('MATHLY_CONFIG', 'dev')
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown config profile {name!r}; expected one of {', '.join(PROFILES)}")
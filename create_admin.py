@@ -1,17 +1,11 @@
-from sqlalchemy import text
-from app import app
+from app import create_app
 from database import db, User
+from migrations import run_migrations
 
 def create_admin():
-    with app.app_context():
-        # Add is_admin column if it doesn't exist (migration)
-        try:
-            with db.engine.connect() as conn:
-                conn.execute(text('ALTER TABLE users ADD COLUMN is_admin BOOLEAN DEFAULT 0'))
-                conn.commit()
-            print("Added is_admin column to users table")
-        except Exception:
-            pass  # Column already exists
+    with create_app(web=False).app_context():
+        # Brings older databases up to date, including the is_admin column.
+        run_migrations()
 
         # Check if admin already exists
         admin = User.query.filter_by(email='admin@gmail.com').first()
@@ -1,8 +1,14 @@
 import random
 import math
+from datetime import datetime, timezone
+from functools import lru_cache
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import bindparam, case, event, func, literal, or_, select, true, tuple_, update
+from sqlalchemy.orm import attribute_keyed_dict, joinedload
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from password_hashing import password_hasher
+from metrics import metrics
+from generators import get_generator
 
 db = SQLAlchemy()
 
@@ -19,6 +25,12 @@ SECTION_CONFIG = {
 
 BASE_UPGRADE_COST = 50
 
+# A run is SESSION_PROBLEMS correct answers before SESSION_LIVES mistakes.
+SESSION_PROBLEMS = 7
+SESSION_LIVES = 3
+# Problems a run can consume: every correct answer plus all but the last life.
+RUN_LENGTH = SESSION_PROBLEMS + SESSION_LIVES - 1
+
 
 def get_difficulty_params(level):
     """Get min/max numbers based on level. Scales infinitely."""
@@ -37,6 +49,20 @@ def get_difficulty_params(level):
     return min_num, max_num
 
 
+# Operand bands within a level, from easiest (0) to hardest; see get_tier_bounds.
+SKILL_TIERS = 5
+
+
+def get_tier_bounds(level, tier=None):
+    """Operand range for a tier of level: a window half the level's range wide,
+    sliding from its bottom (tier 0) to its top. None is the whole range."""
+    min_num, max_num = get_difficulty_params(level)
+    if tier is None:
+        return min_num, max_num
+    span, steps = max_num - min_num, 2 * (SKILL_TIERS - 1)
+    return min_num + span * tier // steps, max_num - span * (SKILL_TIERS - 1 - tier) // steps
+
+
 def get_exp_reward(section, level):
     """Get XP reward for a correct answer at given level. +1 per level."""
     base = SECTION_CONFIG.get(section, {}).get('base_exp', 5)
@@ -64,60 +90,48 @@ def get_difficulty_name(level):
         return f'Master {level - 10}'
 
 
-def generate_problem(section, level):
-    """Generate a random math problem for a section at a given level."""
+def generator_for(section):
+    """The registered generator for a section's operation."""
     config = SECTION_CONFIG.get(section, SECTION_CONFIG['addition'])
-    op = config['operation']
-    min_num, max_num = get_difficulty_params(level)
-    exp_reward = get_exp_reward(section, level)
+    return get_generator(config['operation'])
 
-    a = random.randint(min_num, max_num)
-    b = random.randint(min_num, max_num)
-
-    if op == '+':
-        correct = a + b
-        question = f"{a} + {b}"
-    elif op == '-':
-        if a < b:
-            a, b = b, a
-        correct = a - b
-        question = f"{a} - {b}"
-    elif op == '*':
-        if level <= 4:
-            a = random.randint(1, min(12, max_num))
-            b = random.randint(1, min(12, max_num))
-        correct = a * b
-        question = f"{a} x {b}"
-    elif op == '/':
-        b = random.randint(max(1, min_num), min(12, max_num))
-        correct = random.randint(1, max(1, max_num // b))
-        a = correct * b
-        question = f"{a} / {b}"
-    else:
-        correct = a + b
-        question = f"{a} + {b}"
-
-    wrong_answers = set()
-    spread = max(5, level * 2)
-    while len(wrong_answers) < 3:
-        offset = random.randint(-spread, spread)
-        if offset == 0:
-            offset = random.choice([-1, 1])
-        wrong = correct + offset
-        if wrong != correct and wrong >= 0:
-            wrong_answers.add(wrong)
-
-    options = list(wrong_answers) + [correct]
-    random.shuffle(options)
-
-    return {
+
+def generate_session(section, level, n, rng=random, tier=None):
+    """Generate n problems for a section/level run in a single pass.
+
+    The section's generator draws operands for the whole run together, then
+    builds answers, question strings and distractors column by column, so a
+    full run costs one call instead of one per page load. ``tier`` narrows
+    the operands to one band of the level (see get_tier_bounds).
+    """
+    exp_reward = get_exp_reward(section, level)
+    batch = generator_for(section).batch(level, get_tier_bounds(level, tier), n, rng)
+    problems = [{
         'question': question,
         'correct': correct,
         'options': options,
         'section': section,
         'level': level,
         'exp_reward': exp_reward
-    }
+    } for question, correct, options in batch]
+    metrics.inc('mathly_problems_generated_total', n, section=section)
+    return problems
+
+
+def generate_run(section, level, seed, tier=None):
+    """Generate the reproducible problem list for a run seed."""
+    return generate_session(section, level, RUN_LENGTH, random.Random(seed), tier)
+
+
+@lru_cache(maxsize=4096)
+def run_solutions(section, level, seed, tier=None):
+    """(question, correct) pairs for a run seed, cached for repeat checks in one process."""
+    return tuple((p['question'], p['correct']) for p in generate_run(section, level, seed, tier))
+
+
+def generate_problem(section, level):
+    """Generate a random math problem for a section at a given level."""
+    return generate_session(section, level, 1)[0]
 
 
 class Unit(db.Model):
@@ -156,20 +170,34 @@ class User(db.Model, UserMixin):
     level = db.Column(db.Integer, default=1)
     is_admin = db.Column(db.Boolean, default=False)
 
-    sector_progress = db.relationship('UserSectorProgress', backref='user', lazy=True)
+    __table_args__ = (
+        # Backs the XP leaderboard and keyset pagination on (exp, id).
+        db.Index('ix_users_exp_id', 'exp', 'id'),
+        # Case-insensitive login lookups; also stops case-variant duplicates.
+        db.Index('uq_users_username_lower', func.lower(username), unique=True),
+        db.Index('uq_users_email_lower', func.lower(email), unique=True),
+    )
+
+    # Keyed by section name.
+    sector_progress = db.relationship(
+        'UserSectorProgress', backref='user', lazy=True,
+        collection_class=attribute_keyed_dict('section')
+    )
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+
+    def get_sector_progress(self, section):
+        """Get user's progress row for a specific sector, or None."""
+        return self.sector_progress.get(section)
 
     def get_sector_level(self, section):
         """Get user's level in a specific sector."""
-        for p in self.sector_progress:
-            if p.section == section:
-                return p.level
-        return 1
+        progress = self.get_sector_progress(section)
+        return progress.level if progress else 1
 
 
 class UserSectorProgress(db.Model):
@@ -180,38 +208,455 @@ class UserSectorProgress(db.Model):
     level = db.Column(db.Integer, default=1)
     total_problems_solved = db.Column(db.Integer, default=0)
     total_exp_earned = db.Column(db.Integer, default=0)
+    # Elo skill estimate (see skill.py); NULL until the first rated answer.
+    rating = db.Column(db.Integer)
+    rated_answers = db.Column(db.Integer, default=0)
 
-    __table_args__ = (db.UniqueConstraint('user_id', 'section', name='_user_section_uc'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'section', name='_user_section_uc'),
+        # Backs per-section rankings and keyset pagination on (level, total_exp_earned, user_id).
+        db.Index('ix_progress_section_rank', 'section', 'level', 'total_exp_earned', 'user_id'),
+    )
 
 
-# Keep old models for migration compatibility but they won't be used
-class ProblemCategory(db.Model):
-    __tablename__ = 'problem_categories'
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    section = db.Column(db.String(50), nullable=False, default='addition')
-    level_order = db.Column(db.Integer, default=1)
-    operation = db.Column(db.String(10), nullable=False)
-    difficulty = db.Column(db.String(50), default='beginner')
-    exp_reward = db.Column(db.Integer, default=10)
-    min_num = db.Column(db.Integer, default=1)
-    max_num = db.Column(db.Integer, default=10)
-    cost = db.Column(db.Integer, default=0)
-    unlocked_by_default = db.Column(db.Boolean, default=True)
-    problems_required = db.Column(db.Integer, default=5)
-
-
-class UserLevelProgress(db.Model):
-    __tablename__ = 'user_level_progress'
+class AnswerEvent(db.Model):
+    """Append-only history of submitted answers, written by answer_log."""
+    __tablename__ = 'answer_events'
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    category_id = db.Column(db.Integer, db.ForeignKey('problem_categories.id'), nullable=False)
-    problems_completed = db.Column(db.Integer, default=0)
-    is_completed = db.Column(db.Boolean, default=False)
-
-
-class UserUnlock(db.Model):
-    __tablename__ = 'user_unlocks'
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    category_id = db.Column(db.Integer, db.ForeignKey('problem_categories.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    section = db.Column(db.String(50), nullable=False)
+    level = db.Column(db.Integer, nullable=False)
+    # Operand band of the run; NULL for the level's whole range.
+    tier = db.Column(db.SmallInteger)
+    question = db.Column(db.String(64), nullable=False)
+    answer = db.Column(db.String(32), nullable=False)
+    expected = db.Column(db.String(32), nullable=False)
+    is_correct = db.Column(db.Boolean, nullable=False)
+    latency_ms = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+
+class CompletedRun(db.Model):
+    """Runs whose outcome has been banked, one row per run seed.
+
+    The primary key makes finishing a run idempotent across workers and
+    restarts: a replayed final-answer token cannot bank the run twice.
+    """
+    __tablename__ = 'completed_runs'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    seed = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    completed_at = db.Column(db.DateTime, nullable=False)
+
+
+def load_user_with_progress(user_id):
+    """Load a user and all their sector progress in a single query."""
+    return db.session.execute(
+        select(User)
+        .options(joinedload(User.sector_progress))
+        .where(User.id == user_id)
+    ).unique().scalar_one_or_none()
+
+
+EXP_ACTIONS = ('add', 'deduct', 'set')
+
+
+def _exp_expression(action, amount):
+    """New value of users.exp for an admin EXP action.
+
+    Deductions stop at zero; 'set' amounts must already be non-negative.
+    """
+    if action == 'add':
+        return User.exp + amount
+    if action == 'deduct':
+        return case((User.exp - amount < 0, 0), else_=User.exp - amount)
+    return amount
+
+
+def bulk_modify_exp(operations):
+    """Apply validated (user_id, action, amount) operations in order (no commit).
+
+    Consecutive operations with the same action run as one executemany
+    UPDATE, so a list of any length costs a handful of statements. Returns
+    the set of user ids that exist.
+    """
+    user_ids = _existing_user_ids({op['user_id'] for op in operations})
+    operations = [op for op in operations if op['user_id'] in user_ids]
+
+    start = 0
+    while start < len(operations):
+        action = operations[start]['action']
+        end = start
+        while end < len(operations) and operations[end]['action'] == action:
+            end += 1
+        stmt = (
+            update(User.__table__)
+            .where(User.__table__.c.id == bindparam('b_user_id'))
+            .values(exp=_exp_expression(action, bindparam('b_amount')))
+        )
+        db.session.execute(stmt, [
+            {'b_user_id': op['user_id'], 'b_amount': op['amount']}
+            for op in operations[start:end]
+        ])
+        start = end
+    return user_ids
+
+
+def bulk_set_levels(operations):
+    """Upsert validated (user_id, section, level) operations (no commit).
+
+    When a (user, section) pair repeats, the last operation wins: one
+    upsert may not touch the same row twice on PostgreSQL. Returns the set
+    of user ids that exist.
+    """
+    user_ids = _existing_user_ids({op['user_id'] for op in operations})
+    levels = {(op['user_id'], op['section']): op['level'] for op in operations if op['user_id'] in user_ids}
+    rows = [
+        {'user_id': user_id, 'section': section, 'level': level,
+         'total_problems_solved': 0, 'total_exp_earned': 0}
+        for (user_id, section), level in levels.items()
+    ]
+    if rows:
+        stmt = _upsert(UserSectorProgress)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'section'],
+            set_={'level': stmt.excluded.level}
+        )
+        db.session.execute(stmt, rows)
+    return user_ids
+
+
+def _user_filter(min_exp=None, max_exp=None, is_admin=None):
+    """WHERE clause over users for bulk operations; bounds are inclusive."""
+    clauses = [true()]
+    if min_exp is not None:
+        clauses.append(User.exp >= min_exp)
+    if max_exp is not None:
+        clauses.append(User.exp <= max_exp)
+    if is_admin is not None:
+        clauses.append(User.is_admin == is_admin)
+    return clauses
+
+
+def modify_exp_where(action, amount, **filters):
+    """Apply one EXP action to every user matching filters (no commit). Returns the row count."""
+    result = db.session.execute(
+        update(User.__table__)
+        .where(*_user_filter(**filters))
+        .values(exp=_exp_expression(action, amount))
+    )
+    return result.rowcount
+
+
+def set_level_where(section, level, **filters):
+    """Set section level for every user matching filters (no commit). Returns the row count."""
+    select_users = select(
+        User.id, literal(section), literal(level), literal(0), literal(0)
+    ).where(*_user_filter(**filters))
+    stmt = _upsert(UserSectorProgress).from_select(
+        ['user_id', 'section', 'level', 'total_problems_solved', 'total_exp_earned'],
+        select_users
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'section'],
+        set_={'level': stmt.excluded.level}
+    )
+    return db.session.execute(stmt).rowcount
+
+
+def _existing_user_ids(user_ids, chunk_size=500):
+    found = set()
+    user_ids = list(user_ids)
+    for i in range(0, len(user_ids), chunk_size):
+        found.update(db.session.execute(
+            select(User.id).where(User.id.in_(user_ids[i:i + chunk_size]))
+        ).scalars())
+    return found
+
+
+def user_exp_by_id(user_ids, chunk_size=500):
+    """Map user id -> current exp for the given ids."""
+    exp = {}
+    user_ids = list(user_ids)
+    for i in range(0, len(user_ids), chunk_size):
+        exp.update(db.session.execute(
+            select(User.id, User.exp).where(User.id.in_(user_ids[i:i + chunk_size]))
+        ).all())
+    return exp
+
+
+def encode_cursor(*values):
+    """Opaque keyset pagination cursor for the last row of a page."""
+    return '.'.join(str(v) for v in values)
+
+
+def decode_cursor(cursor, size):
+    """Parse a cursor from encode_cursor; raises ValueError if malformed."""
+    values = tuple(int(v) for v in cursor.split('.'))
+    if len(values) != size:
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def find_user_by_login(login):
+    """Find a user by username or email, case-insensitively, in one query.
+
+    If the input is one user's username and another's email, the username
+    match wins; then an exact-case match, then the oldest account.
+    """
+    login = login.strip()
+    key = login.lower()
+    username_match = func.lower(User.username) == key
+    exact_match = or_(User.username == login, User.email == login)
+    return db.session.execute(
+        select(User)
+        .where(or_(username_match, func.lower(User.email) == key))
+        .order_by(case((username_match, 0), else_=1), case((exact_match, 0), else_=1), User.id)
+        .limit(1)
+    ).scalar_one_or_none()
+
+
+def users_by_exp(after=None, limit=50):
+    """One page of users ordered by XP (highest first) using keyset pagination.
+
+    ``after`` is the cursor returned with the previous page. Returns the
+    users and the cursor for the next page (None on the last page).
+    """
+    query = select(User).order_by(User.exp.desc(), User.id.desc()).limit(limit + 1)
+    if after:
+        query = query.where(tuple_(User.exp, User.id) < decode_cursor(after, 2))
+    users = db.session.execute(query).scalars().all()
+    if len(users) <= limit:
+        return users, None
+    users = users[:limit]
+    return users, encode_cursor(users[-1].exp, users[-1].id)
+
+
+def section_ranking(section, after=None, limit=50):
+    """One page of (progress, username) rows ranking players in a section.
+
+    Players are ordered by level, then XP earned in the section.
+    """
+    rank_key = (UserSectorProgress.level, UserSectorProgress.total_exp_earned, UserSectorProgress.user_id)
+    query = (
+        select(UserSectorProgress, User.username)
+        .join(User, User.id == UserSectorProgress.user_id)
+        .where(UserSectorProgress.section == section)
+        .order_by(*(col.desc() for col in rank_key))
+        .limit(limit + 1)
+    )
+    if after:
+        query = query.where(tuple_(*rank_key) < decode_cursor(after, 3))
+    rows = db.session.execute(query).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1][0]
+    return rows, encode_cursor(last.level, last.total_exp_earned, last.user_id)
+
+
+def search_users(prefix, limit=50):
+    """Users whose username or email starts with prefix, case-insensitively.
+
+    Expressed as range scans (prefix <= lower(col) < prefix + U+FFFF) over
+    the lower() login indexes rather than LIKE, so both indexes are used on
+    any backend.
+    """
+    prefix = prefix.lower()
+    upper = prefix + '\uffff'
+    username, email = func.lower(User.username), func.lower(User.email)
+    query = (
+        select(User)
+        .where(or_(
+            (username >= prefix) & (username < upper),
+            (email >= prefix) & (email < upper),
+        ))
+        .order_by(username)
+        .limit(limit)
+    )
+    return db.session.execute(query).scalars().all()
+
+
+def install_sqlite_pragmas(engine, pragmas):
+    """Run the given PRAGMAs on every new DBAPI connection of a SQLite engine."""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+def _upsert(model):
+    """INSERT for model that supports ON CONFLICT on SQLite and PostgreSQL."""
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+
+def ensure_sector_progress(user_id, section):
+    """Create the user's progress row for section if it is missing (no commit)."""
+    stmt = _upsert(UserSectorProgress).values(
+        user_id=user_id,
+        section=section,
+        level=1,
+        total_problems_solved=0,
+        total_exp_earned=0
+    ).on_conflict_do_nothing(index_elements=['user_id', 'section'])
+    db.session.execute(stmt)
+
+
+def set_sector_level(user_id, section, level):
+    """Set the user's level in section, creating the progress row if needed (no commit)."""
+    stmt = _upsert(UserSectorProgress).values(
+        user_id=user_id,
+        section=section,
+        level=level,
+        total_problems_solved=0,
+        total_exp_earned=0
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'section'],
+        set_={'level': stmt.excluded.level}
+    )
+    db.session.execute(stmt)
+
+
+def _claim_run(user_id, seed):
+    """Mark the run finished in the current transaction; False if it already was."""
+    stmt = _upsert(CompletedRun).values(
+        user_id=user_id,
+        seed=seed,
+        completed_at=datetime.now(timezone.utc).replace(tzinfo=None)
+    ).on_conflict_do_nothing(index_elements=['user_id', 'seed'])
+    return db.session.execute(stmt).rowcount == 1
+
+
+def award_run(user_id, seed, section, exp, solved, rating=None, rated_answers=0):
+    """Bank a completed run's XP and solve count and commit.
+
+    Both counters are incremented in the database, so concurrent runs from
+    the same user cannot overwrite each other. A rating, when given, is
+    stored along with them. The run's seed is recorded in the same
+    transaction, so each run is banked at most once. Returns the user's new
+    XP total and the sector's new solved count, or None if the run was
+    already banked.
+    """
+    if not _claim_run(user_id, seed):
+        db.session.rollback()
+        return None
+
+    stmt = _upsert(UserSectorProgress).values(
+        user_id=user_id,
+        section=section,
+        level=1,
+        total_problems_solved=solved,
+        total_exp_earned=exp,
+        rating=rating,
+        rated_answers=rated_answers
+    )
+    set_ = {
+        'total_problems_solved': UserSectorProgress.total_problems_solved + stmt.excluded.total_problems_solved,
+        'total_exp_earned': UserSectorProgress.total_exp_earned + stmt.excluded.total_exp_earned,
+    }
+    if rating is not None:
+        set_.update(rating=stmt.excluded.rating, rated_answers=stmt.excluded.rated_answers)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'section'], set_=set_
+    ).returning(UserSectorProgress.total_problems_solved)
+    total_solved = db.session.execute(stmt).scalar_one()
+
+    user_exp = db.session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(exp=User.exp + exp)
+        .returning(User.exp)
+        .execution_options(synchronize_session=False)
+    ).scalar_one()
+
+    db.session.commit()
+    return user_exp, total_solved
+
+
+def upsert_ratings(connection, ratings):
+    """Store (user_id, section, rating, rated_answers) tuples on connection,
+    creating missing progress rows (no commit)."""
+    stmt = _upsert(UserSectorProgress)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'section'],
+        set_={'rating': stmt.excluded.rating, 'rated_answers': stmt.excluded.rated_answers}
+    )
+    connection.execute(stmt, [
+        {'user_id': user_id, 'section': section, 'level': 1, 'total_problems_solved': 0,
+         'total_exp_earned': 0, 'rating': rating, 'rated_answers': rated_answers}
+        for user_id, section, rating, rated_answers in ratings
+    ])
+
+
+def close_failed_run(user_id, seed, section, rating, rated_answers):
+    """Store a failed run's skill rating and commit; False if the run was already closed."""
+    if not _claim_run(user_id, seed):
+        db.session.rollback()
+        return False
+    upsert_ratings(db.session, [(user_id, section, rating, rated_answers)])
+    db.session.commit()
+    return True
+
+
+class UpgradeContention(Exception):
+    """Raised when concurrent upgrades keep beating purchase_upgrade to the same level."""
+
+
+def purchase_upgrade(user_id, section, retries=3):
+    """Spend XP to raise the user's level in section by one and commit.
+
+    The XP debit only applies while the user can afford it
+    (``exp >= cost``) and the level bump only applies if the level is still
+    the one the cost was computed from, so double clicks or parallel tabs can
+    neither overspend nor skip a level. Returns (new_level, remaining_exp),
+    or None if the user cannot afford the upgrade. Raises UpgradeContention
+    when other upgrades of the sector win every one of the retries.
+    """
+    for _ in range(retries):
+        ensure_sector_progress(user_id, section)
+        level = db.session.execute(
+            select(UserSectorProgress.level)
+            .where(UserSectorProgress.user_id == user_id, UserSectorProgress.section == section)
+        ).scalar_one()
+        cost = get_upgrade_cost(level)
+
+        remaining_exp = db.session.execute(
+            update(User)
+            .where(User.id == user_id, User.exp >= cost)
+            .values(exp=User.exp - cost)
+            .returning(User.exp)
+            .execution_options(synchronize_session=False)
+        ).scalar_one_or_none()
+        if remaining_exp is None:
+            db.session.rollback()
+            return None
+
+        new_level = db.session.execute(
+            update(UserSectorProgress)
+            .where(
+                UserSectorProgress.user_id == user_id,
+                UserSectorProgress.section == section,
+                UserSectorProgress.level == level
+            )
+            .values(level=UserSectorProgress.level + 1)
+            .returning(UserSectorProgress.level)
+            .execution_options(synchronize_session=False)
+        ).scalar_one_or_none()
+        if new_level is None:
+            # Another request upgraded this sector first; undo the debit and retry.
+            db.session.rollback()
+            continue
+
+        db.session.commit()
+        return new_level, remaining_exp
+
+    raise UpgradeContention(user_id, section)
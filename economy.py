@@ -0,0 +1,291 @@
+"""Offline XP-economy simulator for tuning reward and upgrade curves.
+
+Simulates many synthetic players at once with NumPy. Each player sticks to
+one sector and plays runs with the real rules: a run completes at
+``session_problems`` correct answers before ``session_lives`` misses, and
+only completed runs pay XP. After every run the player buys upgrades while
+their XP covers the cost. Accuracy falls with level:
+``accuracy - accuracy_decay * (level - 1)``, floored at ``accuracy_floor``,
+plus a fixed per-player skill offset drawn with ``skill_sd``.
+
+The reward and cost curves are vectorized forms of ``get_exp_reward`` and
+``get_upgrade_cost`` with their constants exposed as parameters; at the
+defaults they match the game exactly (``check_curves`` verifies this).
+
+Compare the live economy with a variant:
+
+    python economy.py --players 1000000 --runs 200 --b base_upgrade_cost=65 cost_exponent=0.6
+
+Parameter values are JSON, e.g. ``accuracy='{"division": 0.8}'`` sets a
+per-sector accuracy. Requires the optional ``numpy`` package.
+"""
+import argparse
+import json
+import math
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from database import (
+    get_exp_reward, get_upgrade_cost, BASE_UPGRADE_COST, SECTION_CONFIG,
+    SESSION_PROBLEMS, SESSION_LIVES
+)
+
+DEFAULT_PARAMS = {
+    'base_upgrade_cost': BASE_UPGRADE_COST,
+    'cost_exponent': 0.5,
+    'reward_offset': -3,
+    'session_problems': SESSION_PROBLEMS,
+    'session_lives': SESSION_LIVES,
+    'sections': ['addition', 'subtraction', 'multiplication', 'division'],
+    # Accuracy at level 1: one value for every sector or a {section: value} dict.
+    'accuracy': 0.92,
+    'accuracy_decay': 0.01,
+    'accuracy_floor': 0.4,
+    'skill_sd': 0.05,
+}
+# Levels whose time-to-reach is reported.
+TRACKED_LEVELS = (2, 3, 5, 10, 15, 20, 30)
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError('The economy simulator needs numpy: pip install numpy')
+
+
+def exp_reward(base_exp, level, params):
+    """Vectorized get_exp_reward."""
+    return np.maximum(1, base_exp + (level - 1) + params['reward_offset'])
+
+
+def upgrade_cost(level, params):
+    """Vectorized get_upgrade_cost."""
+    if params['cost_exponent'] == 0.5:
+        scale = np.sqrt(level)
+    else:
+        scale = np.power(level, params['cost_exponent'])
+    return (params['base_upgrade_cost'] * scale).astype(np.int64)
+
+
+def check_curves(max_level=500):
+    """Assert the vectorized curves equal the game's at the default parameters."""
+    _require_numpy()
+    levels = np.arange(1, max_level + 1)
+    assert upgrade_cost(levels, DEFAULT_PARAMS).tolist() == [get_upgrade_cost(lvl) for lvl in range(1, max_level + 1)]
+    for section, config in SECTION_CONFIG.items():
+        rewards = exp_reward(config['base_exp'], levels, DEFAULT_PARAMS).tolist()
+        assert rewards == [get_exp_reward(section, lvl) for lvl in range(1, max_level + 1)], section
+
+
+def simulate(params=None, players=100000, runs=200, seed=0):
+    """Simulate players for a number of runs each and return summary statistics."""
+    _require_numpy()
+    params = dict(DEFAULT_PARAMS, **(params or {}))
+    rng = np.random.default_rng(seed)
+    sections = params['sections']
+    goal, lives = params['session_problems'], params['session_lives']
+
+    section_idx = rng.integers(0, len(sections), players)
+    base_exp = np.array([SECTION_CONFIG[s]['base_exp'] for s in sections])[section_idx]
+    accuracy = params['accuracy']
+    if isinstance(accuracy, dict):
+        accuracy = [accuracy.get(s, DEFAULT_PARAMS['accuracy']) for s in sections]
+    else:
+        accuracy = [accuracy] * len(sections)
+    start_accuracy = np.array(accuracy)[section_idx] + rng.normal(0, params['skill_sd'], players)
+
+    level = np.ones(players, dtype=np.int64)
+    exp = np.zeros(players, dtype=np.int64)
+    earned = np.zeros(players, dtype=np.int64)
+    failed_runs = np.zeros(players, dtype=np.int64)
+    answers = np.zeros(players, dtype=np.int64)
+    reached_at = np.full((players, len(TRACKED_LEVELS)), -1, dtype=np.int64)
+    # Levels only ever rise by one, so each tracked level is reached once.
+    tracked_column = np.full(max(TRACKED_LEVELS) + 2, -1)
+    tracked_column[list(TRACKED_LEVELS)] = np.arange(len(TRACKED_LEVELS))
+    failures_by_level = np.zeros(1, dtype=np.int64)
+    runs_by_level = np.zeros(1, dtype=np.int64)
+    checkpoints = []
+    every = max(1, runs // 10)
+
+    # A run has goal + lives outcomes: completed after 0..lives-1 misses, or
+    # failed after 0..goal-1 hits. A player's outcome CDF and run reward
+    # depend only on their level, so they are recomputed just for players
+    # who level up. The CDF is stored outcome-major for contiguous compares.
+    outcome_answers = np.concatenate([goal + np.arange(lives), lives + np.arange(goal)])
+    cdf = _outcome_cdf(_accuracy(start_accuracy, level, params), goal, lives)
+    run_reward = goal * exp_reward(base_exp, level, params)
+
+    for step in range(runs):
+        draw = rng.random(players)
+        outcome = np.zeros(players, dtype=np.int64)
+        for row in cdf[:-1]:
+            outcome += row < draw
+        completed = outcome < lives
+        answers += outcome_answers[outcome]
+        runs_by_level = _add_by_level(runs_by_level, level, 1)
+        failures_by_level = _add_by_level(failures_by_level, level, ~completed)
+        failed_runs += ~completed
+
+        reward = np.where(completed, run_reward, 0)
+        exp += reward
+        earned += reward
+
+        # Only players who were just paid can afford an upgrade.
+        leveled = np.zeros(players, dtype=bool)
+        buyers = np.flatnonzero(completed)
+        while len(buyers):
+            cost = upgrade_cost(level[buyers], params)
+            affordable = exp[buyers] >= cost
+            buyers, cost = buyers[affordable], cost[affordable]
+            exp[buyers] -= cost
+            level[buyers] += 1
+            leveled[buyers] = True
+            columns = tracked_column[np.minimum(level[buyers], len(tracked_column) - 1)]
+            hit = columns >= 0
+            reached_at[buyers[hit], columns[hit]] = step + 1
+
+        changed = np.flatnonzero(leveled)
+        if len(changed):
+            cdf[:, changed] = _outcome_cdf(_accuracy(start_accuracy[changed], level[changed], params), goal, lives)
+            run_reward[changed] = goal * exp_reward(base_exp[changed], level[changed], params)
+
+        if (step + 1) % every == 0 or step + 1 == runs:
+            checkpoints.append({
+                'run': step + 1,
+                'mean_level': round(float(level.mean()), 2),
+                'mean_balance': round(float(exp.mean()), 1),
+                'mean_earned': round(float(earned.mean()), 1),
+            })
+
+    time_to_level = {}
+    for i, target in enumerate(TRACKED_LEVELS):
+        reached = reached_at[:, i][reached_at[:, i] >= 0]
+        time_to_level[target] = {
+            'reached': round(len(reached) / players, 4),
+            'p10': _pct(reached, 10), 'p50': _pct(reached, 50), 'p90': _pct(reached, 90),
+        }
+
+    failure_rate_by_level = {
+        int(lvl): round(float(failures_by_level[lvl] / runs_by_level[lvl]), 4)
+        for lvl in range(1, len(runs_by_level)) if runs_by_level[lvl] >= max(100, players // 1000)
+    }
+    total_earned = int(earned.sum())
+    return {
+        'players': players,
+        'runs': runs,
+        'final_level': {q: _pct(level, q) for q in (10, 50, 90, 99)},
+        'time_to_level': time_to_level,
+        'failure_rate': round(float(failed_runs.sum() / (players * runs)), 4),
+        'failure_rate_by_level': failure_rate_by_level,
+        'answers_per_run': round(float(answers.sum() / (players * runs)), 2),
+        'xp_earned_per_player': round(total_earned / players, 1),
+        'xp_unspent_share': round(float(exp.sum()) / total_earned, 4) if total_earned else 0.0,
+        'inflation': checkpoints,
+    }
+
+
+def _accuracy(start_accuracy, level, params):
+    return np.clip(start_accuracy - params['accuracy_decay'] * (level - 1), params['accuracy_floor'], 0.99)
+
+
+def _outcome_cdf(p, goal, lives):
+    """Cumulative probabilities of a run's outcomes, one column per player.
+
+    Completed after f misses: C(goal-1+f, f) p^goal q^f. Failed after h
+    hits: C(lives-1+h, h) q^lives p^h.
+    """
+    q = 1 - p
+    cdf = np.empty((lives + goal, len(p)))
+    total = np.zeros_like(p)
+    term = p ** goal
+    for f in range(lives):
+        total += math.comb(goal - 1 + f, f) * term
+        cdf[f] = total
+        term = term * q
+    term = q ** lives
+    for h in range(goal):
+        total += math.comb(lives - 1 + h, h) * term
+        cdf[lives + h] = total
+        term = term * p
+    cdf /= total
+    return cdf
+
+
+def _add_by_level(totals, level, values):
+    counts = np.bincount(level, weights=np.broadcast_to(values, level.shape).astype(np.float64))
+    if len(counts) > len(totals):
+        totals = np.pad(totals, (0, len(counts) - len(totals)))
+    totals[:len(counts)] += counts.astype(np.int64)
+    return totals
+
+
+def _pct(values, q):
+    return int(np.percentile(values, q)) if len(values) else None
+
+
+def parse_overrides(pairs):
+    params = {}
+    for pair in pairs or ():
+        key, sep, value = pair.partition('=')
+        if not sep or key not in DEFAULT_PARAMS:
+            raise SystemExit(f"Bad parameter {pair!r}; known: {', '.join(DEFAULT_PARAMS)}")
+        try:
+            params[key] = json.loads(value)
+        except ValueError:
+            params[key] = value
+    return params
+
+
+def print_comparison(a, b):
+    def row(label, left, right):
+        print(f"{label:<34}{str(left):>16}{str(right):>16}")
+
+    row('', 'A', 'B')
+    row('failure rate', a['failure_rate'], b['failure_rate'])
+    row('answers per run', a['answers_per_run'], b['answers_per_run'])
+    row('XP earned per player', a['xp_earned_per_player'], b['xp_earned_per_player'])
+    row('XP left unspent', a['xp_unspent_share'], b['xp_unspent_share'])
+    for q in a['final_level']:
+        row(f"final level p{q}", a['final_level'][q], b['final_level'][q])
+    for target in TRACKED_LEVELS:
+        ta, tb = a['time_to_level'][target], b['time_to_level'][target]
+        row(f"runs to level {target} p50 (reached)", f"{ta['p50']} ({ta['reached']:.0%})",
+            f"{tb['p50']} ({tb['reached']:.0%})")
+    for ca, cb in zip(a['inflation'], b['inflation']):
+        row(f"mean balance after {ca['run']} runs", ca['mean_balance'], cb['mean_balance'])
+    for lvl in sorted(set(a['failure_rate_by_level']) | set(b['failure_rate_by_level']))[:15]:
+        row(f"failure rate at level {lvl}", a['failure_rate_by_level'].get(lvl, '-'),
+            b['failure_rate_by_level'].get(lvl, '-'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--players', type=int, default=100000)
+    parser.add_argument('--runs', type=int, default=200, help='runs simulated per player')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--a', nargs='*', metavar='KEY=VALUE', help='overrides for parameter set A')
+    parser.add_argument('--b', nargs='*', metavar='KEY=VALUE', help='overrides for parameter set B')
+    parser.add_argument('--json', action='store_true', help='print both results as JSON')
+    args = parser.parse_args()
+
+    check_curves()
+    results = []
+    for overrides in (parse_overrides(args.a), parse_overrides(args.b)):
+        start = time.perf_counter()
+        results.append(simulate(overrides, args.players, args.runs, args.seed))
+        results[-1]['seconds'] = round(time.perf_counter() - start, 2)
+
+    if args.json:
+        print(json.dumps({'a': results[0], 'b': results[1]}, indent=2))
+    else:
+        print(f"{args.players} players x {args.runs} runs: "
+              f"A {results[0]['seconds']}s, B {results[1]['seconds']}s\n")
+        print_comparison(*results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""Streaming export of users with their per-section progress.
+
+One row per user: account fields, then ``<section>_level``, ``<section>_exp``
+and ``<section>_solved`` for every section in SECTION_CONFIG (level 1 and
+zeros where the user has never played it). Rows come from a single
+users-outer-join-progress query read through a server-side cursor
+(``stream_results`` with ``yield_per``) in user id order, are grouped per
+user as they arrive and encoded in batches, so memory stays flat however
+many users there are. Output is CSV or NDJSON, optionally gzipped on the
+fly.
+
+Served to admins at ``/admin/export/users.csv`` and
+``/admin/export/users.ndjson``, and from the command line with
+
+    flask --app app export-users --format ndjson --output users.ndjson.gz
+"""
+import csv
+import io
+import json
+import sys
+import time
+import zlib
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import select
+
+from database import db, User, UserSectorProgress, SECTION_CONFIG
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+USER_FIELDS = ('id', 'username', 'email', 'exp', 'level', 'is_admin')
+SECTION_FIELDS = ('level', 'exp', 'solved')
+# Server-side cursor fetch size, and rows encoded per yielded chunk.
+YIELD_PER = 2000
+BATCH_ROWS = 500
+
+
+def export_columns():
+    return list(USER_FIELDS) + [f"{section}_{field}" for section in SECTION_CONFIG for field in SECTION_FIELDS]
+
+
+def export_rows(connection):
+    """Yield one list per user, in export_columns() order and user id order."""
+    query = (
+        select(
+            User.id, User.username, User.email, User.exp, User.level, User.is_admin,
+            UserSectorProgress.section,
+            UserSectorProgress.level,
+            UserSectorProgress.total_exp_earned,
+            UserSectorProgress.total_problems_solved,
+        )
+        .outerjoin(UserSectorProgress, UserSectorProgress.user_id == User.id)
+        .order_by(User.id)
+    )
+    result = connection.execution_options(stream_results=True, yield_per=YIELD_PER).execute(query)
+    offsets = {section: len(USER_FIELDS) + i * len(SECTION_FIELDS) for i, section in enumerate(SECTION_CONFIG)}
+    # Sections a user never played: level 1, no XP, nothing solved.
+    defaults = [1, 0, 0] * len(SECTION_CONFIG)
+
+    row = None
+    for partition in result.partitions():
+        for user_id, username, email, exp, level, is_admin, section, s_level, s_exp, s_solved in partition:
+            if row is None or row[0] != user_id:
+                if row is not None:
+                    yield row
+                row = [user_id, username, email, exp or 0, level or 1, bool(is_admin)] + defaults
+            offset = offsets.get(section)
+            if offset is not None:
+                row[offset:offset + 3] = (s_level, s_exp, s_solved)
+    if row is not None:
+        yield row
+
+
+def encode(rows, fmt):
+    """Encode rows as fmt, yielding UTF-8 bytes every BATCH_ROWS rows."""
+    columns = export_columns()
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        write_batch = writer.writerows
+    else:
+        dumps = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False).encode
+
+        def write_batch(batch):
+            buffer.write(''.join(dumps(dict(zip(columns, row))) + '\n' for row in batch))
+
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_ROWS:
+            write_batch(batch)
+            batch.clear()
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    write_batch(batch)
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def gzipped(chunks, level=6):
+    """Gzip a stream of byte chunks on the fly."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(fmt, compress=False, engine=None):
+    """Bytes of the complete export, holding one connection until exhausted."""
+    with (engine or db.engine).connect() as connection:
+        chunks = encode(export_rows(connection), fmt)
+        if compress:
+            chunks = gzipped(chunks)
+        yield from chunks
+
+
+@click.command('export-users')
+@click.option('--format', 'fmt', type=click.Choice(list(FORMATS)), default='csv')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), help='File to write (default stdout).')
+@click.option('--gzip', 'compress', is_flag=True, help='Gzip the output (implied by an --output ending in .gz).')
+@with_appcontext
+def export_users_command(fmt, output, compress):
+    """Export every user with per-section progress as CSV or NDJSON."""
+    compress = compress or bool(output and output.endswith('.gz'))
+    out = open(output, 'wb') if output else sys.stdout.buffer
+    start = time.perf_counter()
+    written = 0
+    try:
+        for chunk in export_stream(fmt, compress):
+            out.write(chunk)
+            written += len(chunk)
+    finally:
+        if output:
+            out.close()
+    elapsed = time.perf_counter() - start
+    click.echo(f"Exported {written / 1e6:.1f} MB in {elapsed:.1f}s", err=True)
@@ -0,0 +1,287 @@
+"""Game loop shared by the HTML routes and the JSON API."""
+from functools import lru_cache
+
+from flask import request, session
+from flask_login import current_user
+
+from database import (
+    get_upgrade_cost, get_difficulty_name, get_exp_reward, get_difficulty_params,
+    run_solutions, generator_for, award_run, purchase_upgrade, close_failed_run, UpgradeContention,
+    SECTION_CONFIG, SESSION_PROBLEMS, SESSION_LIVES
+)
+from skill import DEFAULT_TIER, choose_tier, progress_rating, update_rating
+from problem_pool import problem_pool
+from answer_log import answer_log
+from identity_cache import identity_cache
+from metrics import metrics
+from run_token import InvalidRunToken, issue_run_token, load_run_token
+
+
+SECTIONS_DISPLAY = {
+    'addition': {'name': 'Addition', 'icon': '+', 'available': True},
+    'subtraction': {'name': 'Subtraction', 'icon': '-', 'available': True},
+    'multiplication': {'name': 'Multiplication', 'icon': 'x', 'available': True},
+    'division': {'name': 'Division', 'icon': '/', 'available': True},
+    'fractions': {'name': 'Fractions', 'icon': '%', 'available': True},
+    'mixed': {'name': 'Mixed Arithmetic', 'icon': '+-', 'available': True},
+    'decimals': {'name': 'Decimals', 'icon': '.', 'available': True},
+    'find_value': {'name': 'Find the Value', 'icon': '?', 'available': True},
+}
+
+LEADERBOARD_PAGE_SIZE = 25
+LEADERBOARD_MAX_LIMIT = 100
+
+
+class GameError(Exception):
+    """A request the game rules refuse; carries the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def session_user_id():
+    """Id of the logged-in user taken from the session, without loading the User row.
+
+    Falls back to Flask-Login (and so to the user loader) when the session
+    does not carry an id, e.g. when the user is restored from a remember-me
+    cookie. Returns None for anonymous requests.
+    """
+    user_id = session.get('_user_id')
+    if user_id is not None:
+        return int(user_id)
+    if current_user.is_authenticated:
+        return current_user.id
+    return None
+
+
+def page_limit():
+    """Leaderboard page size from ?limit=, clamped to 1..LEADERBOARD_MAX_LIMIT."""
+    try:
+        limit = int(request.args.get('limit', LEADERBOARD_PAGE_SIZE))
+    except ValueError:
+        limit = LEADERBOARD_PAGE_SIZE
+    return max(1, min(limit, LEADERBOARD_MAX_LIMIT))
+
+
+@lru_cache(maxsize=4096)
+def sector_card(section_key, level):
+    """Per-level sector card fields shared by every user at that level."""
+    display = SECTIONS_DISPLAY[section_key]
+    min_num, max_num = get_difficulty_params(level)
+    return {
+        'key': section_key,
+        'name': display['name'],
+        'icon': display['icon'],
+        'color': SECTION_CONFIG.get(section_key, {}).get('color', '#888'),
+        'available': display['available'],
+        'level': level,
+        'difficulty': get_difficulty_name(level),
+        'upgrade_cost': get_upgrade_cost(level),
+        'exp_per_problem': get_exp_reward(section_key, level),
+        'range': f"{min_num}-{max_num}"
+    }
+
+
+def sectors_data(user):
+    """Sector cards for the play dashboard."""
+    sectors = []
+    for section_key in SECTIONS_DISPLAY:
+        progress = user.sector_progress.get(section_key)
+        card = sector_card(section_key, progress.level if progress else 1)
+        sectors.append(dict(
+            card,
+            can_upgrade=user.exp >= card['upgrade_cost'],
+            total_solved=progress.total_problems_solved if progress else 0,
+            total_exp=progress.total_exp_earned if progress else 0
+        ))
+    return sectors
+
+
+def skills_data(user):
+    """Per-sector skill summary plus overall totals for the skills dashboard."""
+    skills = []
+    total_problems = 0
+    total_exp_earned = 0
+
+    for section_key in SECTIONS_DISPLAY:
+        progress = user.sector_progress.get(section_key)
+        card = sector_card(section_key, progress.level if progress else 1)
+        solved = progress.total_problems_solved if progress else 0
+        exp_earned = progress.total_exp_earned if progress else 0
+
+        total_problems += solved
+        total_exp_earned += exp_earned
+
+        skills.append({
+            'key': section_key,
+            'name': card['name'],
+            'icon': card['icon'],
+            'color': card['color'],
+            'level': card['level'],
+            'difficulty': card['difficulty'],
+            'total_solved': solved,
+            'total_exp': exp_earned
+        })
+
+    return skills, total_problems, total_exp_earned
+
+
+def start_run(user, section, level=None):
+    """Start a run for user and return (run token, problems, level).
+
+    ``level`` defaults to the user's unlocked level in the sector; the
+    user's skill rating picks the operand band within it. The run lives in a
+    signed token handed to the client, not in the session cookie, so answers
+    can be checked by any worker.
+    """
+    if section not in SECTION_CONFIG:
+        raise GameError('Invalid sector!')
+
+    if not SECTIONS_DISPLAY.get(section, {}).get('available', False):
+        raise GameError('This sector is not available yet!')
+
+    progress = user.get_sector_progress(section)
+    max_level = progress.level if progress else 1
+
+    if level is None:
+        level = max_level
+    elif level < 1 or level > max_level:
+        raise GameError('Invalid level!')
+
+    rating, rated = progress_rating(progress)
+    # Sections whose problems ignore tiers always play the level's middle band.
+    tier = choose_tier(rating, level) if generator_for(section).tiered else DEFAULT_TIER
+    seed, problems = problem_pool.take(section, level, tier)
+    metrics.inc('mathly_runs_total', section=section, outcome='started')
+    run_state = {
+        'user_id': user.id,
+        'seed': seed,
+        'section': section,
+        'level': level,
+        'tier': tier,
+        'attempt': 0,
+        'solved': 0,
+        'lives': SESSION_LIVES,
+        'exp': 0,
+        'user_exp': user.exp,
+        'total_solved': progress.total_problems_solved if progress else 0,
+        'rating': rating,
+        'rated': rated
+    }
+    return issue_run_token(run_state), problems, level
+
+
+def submit_answer(user_id, token, answer, latency_ms=None):
+    """Check one answer against its run token and return the outcome.
+
+    Answers before the last one are served entirely from the run token: no
+    user load and no progress lookup. The skill rating in the token is
+    updated with every answer; the database is only written when the run
+    completes or fails. The result carries the next token, or None once the
+    run is over.
+    """
+    try:
+        run = load_run_token(token, user_id)
+    except InvalidRunToken as e:
+        raise GameError(str(e))
+
+    section = run['section']
+    if section not in SECTION_CONFIG or run['lives'] <= 0 or run['solved'] >= SESSION_PROBLEMS:
+        raise GameError('No active problem')
+
+    try:
+        answer = generator_for(section).parse_answer(answer)
+    except (ValueError, TypeError):
+        raise GameError('Invalid answer')
+
+    question, expected = run_solutions(section, run['level'], run['seed'], run['tier'])[run['attempt']]
+    exp_reward = get_exp_reward(section, run['level'])
+    is_correct = answer == expected
+    run['attempt'] += 1
+    run['rating'], run['rated'] = update_rating(run['rating'], run['rated'], run['level'], run['tier'], is_correct)
+    metrics.inc('mathly_answers_total', section=section, result='correct' if is_correct else 'wrong')
+
+    answer_log.record(
+        user_id, section, run['level'], question, answer, expected, is_correct,
+        latency_ms if isinstance(latency_ms, int) else None, run['tier']
+    )
+
+    session_complete = False
+    session_failed = False
+    total_exp_awarded = 0
+    total_exp = run['user_exp']
+    total_solved = run['total_solved']
+
+    if is_correct:
+        run['exp'] += exp_reward
+        run['solved'] += 1
+
+        if run['solved'] >= SESSION_PROBLEMS:
+            session_complete = True
+            total_exp_awarded = run['exp']
+
+            awarded = award_run(user_id, run['seed'], section, total_exp_awarded, SESSION_PROBLEMS,
+                                run['rating'], run['rated'])
+            if awarded is None:
+                raise GameError('Run already finished', 409)
+            total_exp, total_solved = awarded
+            identity_cache.invalidate(user_id)
+            metrics.inc('mathly_runs_total', section=section, outcome='completed')
+            metrics.inc('mathly_xp_awarded_total', total_exp_awarded, section=section)
+    else:
+        run['lives'] -= 1
+        if run['lives'] <= 0:
+            session_failed = True
+            if not close_failed_run(user_id, run['seed'], section, run['rating'], run['rated']):
+                raise GameError('Run already finished', 409)
+            identity_cache.invalidate(user_id)
+            metrics.inc('mathly_runs_total', section=section, outcome='failed')
+
+    return {
+        'correct': is_correct,
+        'expected': expected,
+        'exp_gained': exp_reward if is_correct else 0,
+        'total_exp': total_exp,
+        'total_solved': total_solved,
+        'section': section,
+        'current_problem': min(run['solved'] + 1, SESSION_PROBLEMS),
+        'total_problems': SESSION_PROBLEMS,
+        'lives': run['lives'],
+        'session_complete': session_complete,
+        'session_failed': session_failed,
+        'total_exp_awarded': total_exp_awarded,
+        'token': None if session_complete or session_failed else issue_run_token(run)
+    }
+
+
+def upgrade_sector(user_id, section):
+    """Buy the next level in section and return the sector's new card values."""
+    if section not in SECTION_CONFIG:
+        raise GameError('Invalid sector')
+
+    try:
+        upgrade = purchase_upgrade(user_id, section)
+    except UpgradeContention:
+        raise GameError('Another upgrade is in progress, please try again', 409)
+    if upgrade is None:
+        raise GameError('Not enough EXP')
+    identity_cache.invalidate(user_id)
+
+    new_level, remaining_exp = upgrade
+    metrics.inc('mathly_upgrades_total', section=section)
+    metrics.inc('mathly_xp_spent_total', get_upgrade_cost(new_level - 1), section=section)
+    new_cost = get_upgrade_cost(new_level)
+    min_num, max_num = get_difficulty_params(new_level)
+
+    return {
+        'success': True,
+        'new_level': new_level,
+        'remaining_exp': remaining_exp,
+        'next_upgrade_cost': new_cost,
+        'can_upgrade': remaining_exp >= new_cost,
+        'difficulty': get_difficulty_name(new_level),
+        'exp_per_problem': get_exp_reward(section, new_level),
+        'range': f"{min_num}-{max_num}"
+    }
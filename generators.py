@@ -0,0 +1,401 @@
+"""Problem generators, one per section operation.
+
+``SECTION_CONFIG`` maps each section to an operation and every operation has
+a registered generator. ``batch`` draws operands for a whole run column by
+column and returns ``(question, correct, options)`` triples; ``generate`` is
+the single-problem form. Generators are pure: they take the level's operand
+bounds and an RNG, so seeded runs regenerate identically.
+
+Answers are exact. Integer sections use ints; fractions are computed with
+integer numerators/denominators and answered in lowest terms (``"p/q"``);
+decimals are computed on scaled integers and written without trailing
+zeros. No float ever decides whether an answer is right. ``parse_answer``
+brings a submitted answer into the generator's canonical form.
+
+Add an operation with ``@register('op')`` on a ``Generator`` subclass.
+"""
+import math
+import random
+import re
+from decimal import Decimal, InvalidOperation
+
+GENERATORS = {}
+# Longest submitted answer worth parsing; answer_events.answer is String(32).
+MAX_ANSWER_LENGTH = 32
+
+
+def register(operation):
+    """Class decorator registering a generator for a SECTION_CONFIG operation."""
+    def decorator(cls):
+        GENERATORS[operation] = cls()
+        return cls
+    return decorator
+
+
+def get_generator(operation):
+    """Generator for an operation; unknown operations fall back to addition."""
+    return GENERATORS.get(operation, GENERATORS['+'])
+
+
+def answer_text(answer):
+    """Submitted answer as stripped text; raises ValueError when too long to parse."""
+    text = str(answer).strip()
+    if len(text) > MAX_ANSWER_LENGTH:
+        raise ValueError(f"Answer longer than {MAX_ANSWER_LENGTH} characters")
+    return text
+
+
+def pick_int_distractors(correct, spread, rng):
+    """Pick 3 distinct non-negative wrong answers around correct.
+
+    Offsets are drawn without replacement from the valid window
+    [max(-spread, -correct), spread] minus zero using Floyd's algorithm,
+    so every call costs exactly three random draws.
+    """
+    low = max(-spread, -correct)
+    size = spread - low
+    chosen = set()
+    for j in range(size - 3, size):
+        t = rng.randint(0, j)
+        chosen.add(j if t in chosen else t)
+    # Map window indices onto offsets, skipping over zero.
+    return [correct + low + i + (low + i >= 0) for i in chosen]
+
+
+def _options(correct, traps, fill, rng):
+    """Correct answer plus three distinct wrong ones, shuffled.
+
+    traps are the likely mistakes for this problem and come first; fill()
+    supplies further candidates until there are three.
+    """
+    wrong = []
+    for candidate in traps:
+        if candidate is not None and candidate != correct and candidate not in wrong:
+            wrong.append(candidate)
+            if len(wrong) == 3:
+                break
+    if len(wrong) < 3:
+        for candidate in fill():
+            if candidate != correct and candidate not in wrong:
+                wrong.append(candidate)
+                if len(wrong) == 3:
+                    break
+    options = wrong + [correct]
+    rng.shuffle(options)
+    return options
+
+
+class Generator:
+    # Whether operands follow the bounds passed to batch, so that skill
+    # tiers (narrower bounds within a level) change the problems.
+    tiered = True
+
+    def batch(self, level, bounds, n, rng=random):
+        """n (question, correct, options) triples for level; bounds is (min_num, max_num)."""
+        raise NotImplementedError
+
+    def generate(self, level, bounds, rng=random):
+        return self.batch(level, bounds, 1, rng)[0]
+
+    def parse_answer(self, answer):
+        """Canonical form of a submitted answer; raises ValueError when malformed."""
+        return int(answer_text(answer))
+
+
+class IntegerGenerator(Generator):
+    """Whole-number answers with distractors spread around the correct one."""
+
+    def operands(self, level, bounds, n, rng):
+        """(questions, answers) for n problems."""
+        raise NotImplementedError
+
+    def batch(self, level, bounds, n, rng=random):
+        questions, answers = self.operands(level, bounds, n, rng)
+        spread = max(5, level * 2)
+        problems = []
+        for question, correct in zip(questions, answers):
+            options = pick_int_distractors(correct, spread, rng) + [correct]
+            rng.shuffle(options)
+            problems.append((question, correct, options))
+        return problems
+
+
+@register('+')
+class AdditionGenerator(IntegerGenerator):
+    def operands(self, level, bounds, n, rng):
+        low, high = bounds
+        randint = rng.randint
+        a_vals = [randint(low, high) for _ in range(n)]
+        b_vals = [randint(low, high) for _ in range(n)]
+        return [f"{a} + {b}" for a, b in zip(a_vals, b_vals)], [a + b for a, b in zip(a_vals, b_vals)]
+
+
+@register('-')
+class SubtractionGenerator(IntegerGenerator):
+    def operands(self, level, bounds, n, rng):
+        low, high = bounds
+        randint = rng.randint
+        a_vals = [randint(low, high) for _ in range(n)]
+        b_vals = [randint(low, high) for _ in range(n)]
+        pairs = [(a, b) if a >= b else (b, a) for a, b in zip(a_vals, b_vals)]
+        return [f"{a} - {b}" for a, b in pairs], [a - b for a, b in pairs]
+
+
+@register('*')
+class MultiplicationGenerator(IntegerGenerator):
+    def operands(self, level, bounds, n, rng):
+        min_num, max_num = bounds
+        # Times tables first, then the level's full range.
+        low, high = (1, min(12, max_num)) if level <= 4 else bounds
+        randint = rng.randint
+        a_vals = [randint(low, high) for _ in range(n)]
+        b_vals = [randint(low, high) for _ in range(n)]
+        return [f"{a} x {b}" for a, b in zip(a_vals, b_vals)], [a * b for a, b in zip(a_vals, b_vals)]
+
+
+@register('/')
+class DivisionGenerator(IntegerGenerator):
+    def operands(self, level, bounds, n, rng):
+        min_num, max_num = bounds
+        randint = rng.randint
+        b_max = min(12, max_num)
+        b_min = min(max(1, min_num), b_max)
+        b_vals = [randint(b_min, b_max) for _ in range(n)]
+        answers = [randint(1, max(1, max_num // b)) for b in b_vals]
+        return [f"{c * b} / {b}" for c, b in zip(answers, b_vals)], answers
+
+
+@register('mix')
+class MixedGenerator(Generator):
+    """Two-operator expressions; the classic trap is evaluating left to right."""
+
+    def batch(self, level, bounds, n, rng=random):
+        low, high = bounds
+        # Factors stay in times-table range so answers grow with the addends.
+        f_high = min(12, 2 + level)
+        templates = 2 if level <= 3 else 4 if level <= 6 else 6
+        randint = rng.randint
+        kinds = [randint(0, templates - 1) for _ in range(n)]
+        a_vals = [randint(low, high) for _ in range(n)]
+        b_vals = [randint(2, f_high) for _ in range(n)]
+        c_vals = [randint(2, f_high) for _ in range(n)]
+        spread = max(5, level * 2)
+
+        problems = []
+        for kind, a, b, c in zip(kinds, a_vals, b_vals, c_vals):
+            if kind == 0:
+                question, correct, trap = f"{a} + {b} x {c}", a + b * c, (a + b) * c
+            elif kind == 1:
+                question, correct, trap = f"{b} x {c} + {a}", b * c + a, b * (c + a)
+            elif kind == 2:
+                a = min(a, b * c)
+                question, correct, trap = f"{b} x {c} - {a}", b * c - a, b * (c - a) if c >= a else None
+            elif kind == 3:
+                # Answers are never negative, so c is at most a + b.
+                c = min(c, a + b)
+                question, correct, trap = f"{a} + {b} - {c}", a + b - c, a + b + c
+            elif kind == 4:
+                question, correct, trap = f"({a} + {b}) x {c}", (a + b) * c, a + b * c
+            else:
+                b, c = max(b, c), min(b, c)
+                question, correct, trap = f"{a} x ({b} - {c})", a * (b - c), a * b - c
+            options = _options(correct, [trap], lambda: pick_int_distractors(correct, spread, rng), rng)
+            problems.append((question, correct, options))
+        return problems
+
+
+@register('solve')
+class FindValueGenerator(Generator):
+    """Find the missing operand; the trap applies the wrong inverse operation."""
+
+    def batch(self, level, bounds, n, rng=random):
+        low, high = bounds
+        f_high = min(12, 2 + level)
+        templates = 2 if level <= 2 else 3 if level <= 4 else 4
+        randint = rng.randint
+        kinds = [randint(0, templates - 1) for _ in range(n)]
+        x_vals = [randint(low, high) for _ in range(n)]
+        b_vals = [randint(low, high) for _ in range(n)]
+        f_vals = [randint(2, f_high) for _ in range(n)]
+        spread = max(5, level * 2)
+
+        problems = []
+        for kind, x, b, f in zip(kinds, x_vals, b_vals, f_vals):
+            if kind == 0:
+                c = x + b
+                question, trap = f"? + {b} = {c}", c + b
+            elif kind == 1:
+                c = x
+                x = c + b
+                question, trap = f"? - {b} = {c}", max(0, c - b)
+            elif kind == 2:
+                c = f * x
+                question, trap = f"{f} x ? = {c}", c - f
+            else:
+                c = x
+                x = c * f
+                question, trap = f"? / {f} = {c}", c + f
+            options = _options(x, [trap], lambda: pick_int_distractors(x, spread, rng), rng)
+            problems.append((question, x, options))
+        return problems
+
+
+def format_fraction(num, den):
+    """Lowest-terms "p/q", or "p" for whole numbers."""
+    g = math.gcd(num, den)
+    num, den = num // g, den // g
+    return str(num) if den == 1 else f"{num}/{den}"
+
+
+_FRACTION_RE = re.compile(r'^\s*(\d+)\s*(?:/\s*(\d+)\s*)?$')
+
+
+@register('frac')
+class FractionGenerator(Generator):
+    """Fraction arithmetic answered in lowest terms.
+
+    Distractors are the unreduced result, the componentwise mistake
+    (adding numerators and denominators, or cross-multiplying a product)
+    and neighbouring fractions. Difficulty comes from the level alone
+    (denominators, operations, improper fractions), not from bounds.
+    """
+    tiered = False
+
+    def batch(self, level, bounds, n, rng=random):
+        max_den = min(12, 3 + level)
+        # Past level 10 numerators may exceed the denominator (improper fractions).
+        whole = 1 + level // 10
+        ops = '+' if level <= 2 else '+-' if level <= 5 else '+-x'
+        randint = rng.randint
+        op_vals = [ops[randint(0, len(ops) - 1)] for _ in range(n)]
+        b_vals = [randint(2, max_den) for _ in range(n)]
+        d_vals = [b if level <= 2 else randint(2, max_den) for b in b_vals]
+        a_vals = [randint(1, b * whole - 1) for b in b_vals]
+        c_vals = [randint(1, d * whole - 1) for d in d_vals]
+
+        problems = []
+        for op, a, b, c, d in zip(op_vals, a_vals, b_vals, c_vals, d_vals):
+            if op == '-' and a * d < c * b:
+                a, b, c, d = c, d, a, b
+            if op == 'x':
+                num, den = a * c, b * d
+                naive = format_fraction(a * d, b * c)
+            else:
+                # The working a student writes: over the common denominator.
+                den = b if b == d else b * d
+                left, right = (a, c) if b == d else (a * d, c * b)
+                num = left + right if op == '+' else left - right
+                naive = None
+                if op == '+':
+                    naive = format_fraction(a + c, b + d)
+                elif b != d and a >= c and b > d:
+                    naive = format_fraction(a - c, b - d)
+
+            correct = format_fraction(num, den)
+            unreduced = f"{num}/{den}" if num and math.gcd(num, den) > 1 and den > 1 else None
+            g = math.gcd(num, den)
+            p, q = num // g, den // g
+
+            def neighbours(p=p, q=q):
+                k = 1
+                while True:
+                    yield format_fraction(p + k, q)
+                    if p - k > 0:
+                        yield format_fraction(p - k, q)
+                    yield format_fraction(p, q + k)
+                    k += 1
+
+            options = _options(correct, [unreduced, naive], neighbours, rng)
+            problems.append((f"{a}/{b} {op} {c}/{d}", correct, options))
+        return problems
+
+    def parse_answer(self, answer):
+        match = _FRACTION_RE.match(answer_text(answer))
+        if match is None or match.group(2) == '0':
+            raise ValueError(f"Not a fraction: {answer!r}")
+        num, den = match.groups()
+        # Kept as written: an unreduced fraction is not the expected answer.
+        return str(int(num)) if den is None else f"{int(num)}/{int(den)}"
+
+
+def format_decimal(value, places):
+    """Scaled integer value / 10**places without trailing zeros."""
+    if places <= 0:
+        return str(value * 10 ** -places)
+    digits = str(value).rjust(places + 1, '0')
+    whole, frac = digits[:-places], digits[-places:].rstrip('0')
+    return f"{whole}.{frac}" if frac else whole
+
+
+@register('dec')
+class DecimalGenerator(Generator):
+    """Decimal arithmetic on scaled integers.
+
+    Distractors shift the decimal point one place either way, misalign the
+    operands (adding the digits as if both had the same number of places,
+    or forgetting to count places in a product) and miss the last digit.
+    """
+
+    def batch(self, level, bounds, n, rng=random):
+        low, high = bounds
+        max_places = 1 if level <= 4 else 2 if level <= 10 else 3
+        ops = '+' if level <= 3 else '+-' if level <= 7 else '+-x'
+        randint = rng.randint
+        op_vals = [ops[randint(0, len(ops) - 1)] for _ in range(n)]
+        pa_vals = [randint(1, max_places) for _ in range(n)]
+        pb_vals = [randint(1, max_places) for _ in range(n)]
+        a_vals = [randint(low * 10 ** pa, high * 10 ** pa) for pa in pa_vals]
+        # Products keep a small second factor: 0.2-9.9 style.
+        b_vals = [randint(2, 99) if op == 'x' else randint(low * 10 ** pb, high * 10 ** pb)
+                  for op, pb in zip(op_vals, pb_vals)]
+
+        problems = []
+        for op, a, pa, b, pb in zip(op_vals, a_vals, pa_vals, b_vals, pb_vals):
+            if op == 'x':
+                pb = 1
+                value, places = a * b, pa + pb
+                misaligned = format_decimal(value, max(pa, pb))
+            else:
+                places = max(pa, pb)
+                left, right = a * 10 ** (places - pa), b * 10 ** (places - pb)
+                if op == '-' and left < right:
+                    a, pa, b, pb, left, right = b, pb, a, pa, right, left
+                value = left + right if op == '+' else left - right
+                if pa != pb:
+                    misaligned = format_decimal(a + b if op == '+' else abs(a - b), places)
+                else:
+                    misaligned = None
+
+            correct = format_decimal(value, places)
+            traps = [format_decimal(value, places - 1), format_decimal(value, places + 1), misaligned]
+
+            def near_misses(value=value, places=places):
+                k = 1
+                while True:
+                    yield format_decimal(value + k, places)
+                    if value - k >= 0:
+                        yield format_decimal(value - k, places)
+                    k += 1
+
+            # Offer two of the three so the place-value pair is not always there.
+            del traps[randint(0, 2)]
+            options = _options(correct, traps, near_misses, rng)
+            question = f"{format_decimal(a, pa)} {op} {format_decimal(b, pb)}"
+            problems.append((question, correct, options))
+        return problems
+
+    def parse_answer(self, answer):
+        try:
+            value = Decimal(answer_text(answer))
+        except InvalidOperation:
+            raise ValueError(f"Not a decimal: {answer!r}")
+        # A short exponent can still spell a huge number ("1e999999").
+        if not value.is_finite() or abs(value.adjusted()) > MAX_ANSWER_LENGTH:
+            raise ValueError(f"Not a decimal: {answer!r}")
+        try:
+            text = format(value.normalize(), 'f')
+        except ArithmeticError:
+            raise ValueError(f"Not a decimal: {answer!r}")
+        if len(text) > MAX_ANSWER_LENGTH:
+            raise ValueError(f"Not a decimal: {answer!r}")
+        return text
@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import OrderedDict
+
+from database import db
+
+
+class IdentityCache:
+    """Short-lived, process-local cache of logged-in users for the user loader.
+
+    Cached users (and their eagerly loaded sector progress) are detached from
+    any session, so they are read-only snapshots: code that changes a user
+    must write through the database and call ``invalidate``. Other worker
+    processes see such a change once their entry's TTL expires. A TTL of 0
+    disables the cache.
+    """
+
+    def __init__(self, app=None):
+        self.ttl = 0
+        self.max_size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('IDENTITY_CACHE_TTL', 0)
+        app.config.setdefault('IDENTITY_CACHE_SIZE', 10000)
+        self.ttl = app.config['IDENTITY_CACHE_TTL']
+        self.max_size = app.config['IDENTITY_CACHE_SIZE']
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def get(self, user_id):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def put(self, user):
+        """Detach user and its progress rows from the session and cache them."""
+        if not self.enabled:
+            return
+        for progress in user.sector_progress.values():
+            db.session.expunge(progress)
+        db.session.expunge(user)
+        with self._lock:
+            self._entries[user.id] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+identity_cache = IdentityCache()
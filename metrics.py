@@ -0,0 +1,277 @@
+"""In-process application metrics in the Prometheus text format.
+
+Counters and histograms are recorded into per-thread shards, so the hot
+path is a thread-local dict update with no lock; a scrape merges the
+shards. When a thread exits its shard is folded into a retired total, so
+thread-per-request servers do not accumulate shards. Recorded metrics:
+
+- ``mathly_request_duration_seconds{endpoint,method}`` histogram and
+  ``mathly_requests_total{endpoint,status}``, from the request lifecycle
+- ``mathly_problems_generated_total{section}``
+- ``mathly_runs_total{section,outcome}`` (started, completed, failed)
+- ``mathly_answers_total{section,result}``
+- ``mathly_xp_awarded_total{section}``, ``mathly_xp_spent_total{section}``
+  and ``mathly_upgrades_total{section}``
+- ``mathly_password_hash_queue_depth``: password hashes running or waiting
+- ``mathly_active_users``: users seen in the last ``METRICS_ACTIVE_WINDOW``
+  seconds
+
+With several worker processes, set ``METRICS_DIR`` to a directory shared by
+the workers (clear it when the server starts). Each worker then writes its
+totals there every ``METRICS_FLUSH_INTERVAL`` seconds and whichever worker
+serves the scrape sums them; active users are merged by id.
+"""
+import atexit
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
+import weakref
+
+from flask import g, request, session
+
+# Upper bounds in seconds of the request duration histogram buckets.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRICS = {
+    'mathly_request_duration_seconds': ('histogram', 'Request latency by endpoint.'),
+    'mathly_requests_total': ('counter', 'Requests by endpoint and status code.'),
+    'mathly_problems_generated_total': ('counter', 'Problems generated, including pool refills and answer checks.'),
+    'mathly_runs_total': ('counter', 'Runs started, completed and failed (lives exhausted).'),
+    'mathly_answers_total': ('counter', 'Answers checked, by result.'),
+    'mathly_xp_awarded_total': ('counter', 'XP awarded for completed runs.'),
+    'mathly_xp_spent_total': ('counter', 'XP spent on sector upgrades.'),
+    'mathly_upgrades_total': ('counter', 'Sector upgrades bought.'),
+    'mathly_password_hash_queue_depth': ('gauge', 'Password hashes running or waiting on the hashing pool.'),
+}
+
+
+class Metrics:
+    def __init__(self, app=None):
+        self._local = threading.local()
+        # Live threads' shards by shard number, and the totals of exited threads.
+        self._shards = {}
+        self._retired = {}
+        self._shard_numbers = itertools.count()
+        self._shards_lock = threading.Lock()
+        # Gauge name -> callable returning its current value.
+        self._gauges = {}
+        self._active = {}
+        self.directory = None
+        self.active_window = 300
+        self._flusher = None
+        self._flusher_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_DIR', None)
+        app.config.setdefault('METRICS_FLUSH_INTERVAL', 5.0)
+        app.config.setdefault('METRICS_ACTIVE_WINDOW', 300)
+        app.config.setdefault('METRICS_TOKEN', None)
+
+        self.directory = app.config['METRICS_DIR']
+        self.flush_interval = app.config['METRICS_FLUSH_INTERVAL']
+        self.active_window = app.config['METRICS_ACTIVE_WINDOW']
+        self.token = app.config['METRICS_TOKEN']
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            atexit.register(self.flush)
+
+    def inc(self, name, amount=1, **labels):
+        """Add amount to the counter name{labels}."""
+        shard = self._shard()
+        key = (name, tuple(sorted(labels.items())))
+        shard[key] = shard.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        """Record value in the histogram name{labels}."""
+        shard = self._shard()
+        key = (name, tuple(sorted(labels.items())))
+        counts = shard.get(key)
+        if counts is None:
+            # Per-bucket counts, then the +Inf bucket, then the sum.
+            counts = shard[key] = [0] * (len(DURATION_BUCKETS) + 1) + [0.0]
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if value <= bound:
+                break
+        else:
+            i = len(DURATION_BUCKETS)
+        counts[i] += 1
+        counts[-1] += value
+
+    def gauge(self, name, read):
+        """Report read() as the gauge name at every scrape."""
+        self._gauges[name] = read
+
+    def seen(self, user_id):
+        self._active[user_id] = time.time()
+
+    def authorized(self, authorization):
+        """Whether an Authorization header carries METRICS_TOKEN (for scrapers)."""
+        return bool(self.token) and authorization == f"Bearer {self.token}"
+
+    def snapshot(self):
+        """This process's values merged across threads, plus recently active users."""
+        with self._shards_lock:
+            # Taken together so a shard retired meanwhile is counted once.
+            shards = list(self._shards.values())
+            values = {key: list(value) if isinstance(value, list) else value
+                      for key, value in self._retired.items()}
+        for shard in shards:
+            # dict.copy() is atomic under the GIL, so writers never need a lock.
+            for key, value in shard.copy().items():
+                _merge(values, key, list(value) if isinstance(value, list) else value)
+        for name, read in self._gauges.items():
+            values[(name, ())] = read()
+
+        cutoff = time.time() - self.active_window
+        active = {}
+        for uid, ts in self._active.copy().items():
+            if ts >= cutoff:
+                active[uid] = ts
+            else:
+                self._active.pop(uid, None)
+        return values, active
+
+    def flush(self):
+        """Write this worker's totals to METRICS_DIR."""
+        if not self.directory:
+            return
+        values, active = self.snapshot()
+        data = {
+            'values': [[name, labels, value] for (name, labels), value in values.items()],
+            'active': active,
+        }
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, os.path.join(self.directory, f"metrics-{os.getpid()}.json"))
+
+    def collect(self):
+        """Values and active users summed over every worker."""
+        values, active = self.snapshot()
+        if not self.directory:
+            return values, active
+
+        own = f"metrics-{os.getpid()}.json"
+        for name in os.listdir(self.directory):
+            if name == own or not name.startswith('metrics-'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for metric, labels, value in data['values']:
+                _merge(values, (metric, tuple(tuple(pair) for pair in labels)), value)
+            for uid, ts in data['active'].items():
+                active[uid] = max(ts, active.get(uid, 0))
+
+        cutoff = time.time() - self.active_window
+        return values, {uid: ts for uid, ts in active.items() if ts >= cutoff}
+
+    def render(self):
+        """Prometheus text exposition of every worker's metrics."""
+        values, active = self.collect()
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            series = sorted((labels, value) for (metric, labels), value in values.items() if metric == name)
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in series:
+                if kind == 'histogram':
+                    cumulative = 0
+                    for bound, count in zip(DURATION_BUCKETS + ('+Inf',), value):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(labels)} {value[-1]}")
+                    lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+                else:
+                    lines.append(f"{name}{_labels(labels)} {value}")
+        lines.append('# HELP mathly_active_users Users with a request in the active window.')
+        lines.append('# TYPE mathly_active_users gauge')
+        lines.append(f"mathly_active_users {len(active)}")
+        return '\n'.join(lines) + '\n'
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            number = next(self._shard_numbers)
+            with self._shards_lock:
+                self._shards[number] = shard
+            # The owner lives only in the thread's locals, so it is
+            # collected when the thread exits.
+            owner = self._local.owner = _ShardOwner()
+            weakref.finalize(owner, self._retire, number)
+        return shard
+
+    def _retire(self, number):
+        with self._shards_lock:
+            shard = self._shards.pop(number)
+            for key, value in shard.items():
+                _merge(self._retired, key, list(value) if isinstance(value, list) else value)
+
+    def _start_request(self):
+        g._metrics_start = time.perf_counter()
+        if self.directory:
+            self._ensure_flusher()
+
+    def _finish_request(self, response):
+        start = g.pop('_metrics_start', None)
+        if start is not None:
+            endpoint = request.endpoint or 'unmatched'
+            self.observe('mathly_request_duration_seconds', time.perf_counter() - start,
+                         endpoint=endpoint, method=request.method)
+            self.inc('mathly_requests_total', endpoint=endpoint, status=str(response.status_code))
+        user_id = session.get('_user_id')
+        if user_id is not None:
+            self.seen(str(user_id))
+        return response
+
+    def _ensure_flusher(self):
+        # Started lazily so it runs in the worker process, not a preforking parent.
+        if self._flusher is None or not self._flusher.is_alive():
+            with self._flusher_lock:
+                if self._flusher is None or not self._flusher.is_alive():
+                    self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+                    self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+
+class _ShardOwner:
+    """Weak-referenceable marker whose collection retires a thread's shard."""
+
+
+def _merge(values, key, value):
+    current = values.get(key)
+    if current is None:
+        values[key] = value
+    elif isinstance(current, list):
+        for i, v in enumerate(value):
+            current[i] += v
+    else:
+        values[key] = current + value
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+metrics = Metrics()
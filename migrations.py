@@ -0,0 +1,386 @@
+"""Versioned, online schema migrations.
+
+Applied versions are recorded in ``schema_migrations``; ``flask --app app
+migrate`` applies the pending ones in order (``--status`` lists them).
+Register a migration with ``@migration(version, name)`` on a function that
+takes a ``Migrator``. Every ``Migrator`` helper checks the schema before
+acting, so an interrupted migration is finished by simply running it again.
+
+Backfills and table rebuilds never lock a whole table at once. They walk
+the primary key in chunks, each chunk in its own transaction that also
+records the chunk's upper id in ``migration_checkpoints``, so a rerun
+resumes after the last committed chunk. Chunks are sized to take about
+``MIGRATION_CHUNK_MS`` and the runner then rests so that it holds locks
+at most ``MIGRATION_DUTY_CYCLE`` of the time: on SQLite a live request's
+write (e.g. the XP award at the end of a run) waits for one chunk at most.
+"""
+import time
+from datetime import datetime, timezone
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import (
+    Boolean, Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, func, inspect, select, text
+)
+from sqlalchemy.schema import CreateIndex
+
+from database import db, User, UserSectorProgress, AnswerEvent, CompletedRun
+
+MIN_CHUNK_SIZE = 100
+MAX_CHUNK_SIZE = 50000
+
+migration_metadata = MetaData()
+
+schema_migrations = Table(
+    'schema_migrations', migration_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('name', String(100), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+migration_checkpoints = Table(
+    'migration_checkpoints', migration_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('step', String(100), primary_key=True),
+    Column('position', Integer, nullable=False),
+)
+
+MIGRATIONS = []
+
+
+def migration(version, name):
+    """Register fn as migration version; versions apply in ascending order."""
+    def decorator(fn):
+        MIGRATIONS.append((version, name, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return decorator
+
+
+class Migrator:
+    """Idempotent schema helpers handed to each migration."""
+
+    def __init__(self, engine, version, chunk_size=1000, chunk_ms=50, duty_cycle=0.5, echo=print):
+        self.engine = engine
+        self.version = version
+        self.chunk_size = chunk_size
+        self.chunk_ms = chunk_ms
+        self.duty_cycle = duty_cycle
+        self.echo = echo
+
+    @property
+    def dialect(self):
+        return self.engine.dialect.name
+
+    def inspector(self):
+        # A fresh inspector each time: reflection results are cached per inspector.
+        return inspect(self.engine)
+
+    def has_table(self, table):
+        return self.inspector().has_table(table)
+
+    def has_column(self, table, column):
+        return column in {c['name'] for c in self.inspector().get_columns(table)}
+
+    def column_type(self, table, column):
+        return next(c['type'] for c in self.inspector().get_columns(table) if c['name'] == column)
+
+    def execute(self, sql, **params):
+        with self.engine.begin() as conn:
+            conn.execute(text(sql), params)
+
+    def add_column(self, table, column, ddl):
+        """ALTER TABLE table ADD COLUMN column ddl, unless it exists.
+
+        Keep ddl to a nullable column or one with a constant default: both
+        SQLite and PostgreSQL 11+ add those without rewriting the table.
+        """
+        if not self.has_column(table, column):
+            self.execute(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}')
+
+    def create_index(self, index):
+        """Create a model's index if missing; concurrently on PostgreSQL, so writes continue."""
+        ddl = CreateIndex(index, if_not_exists=True)
+        if self.dialect == 'postgresql':
+            sql = str(ddl.compile(dialect=self.engine.dialect)).replace('CREATE INDEX', 'CREATE INDEX CONCURRENTLY', 1)
+            # CONCURRENTLY cannot run inside a transaction block.
+            with self.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                conn.exec_driver_sql(sql)
+        else:
+            with self.engine.begin() as conn:
+                conn.execute(ddl)
+
+    def drop_index(self, name):
+        self.execute(f'DROP INDEX IF EXISTS {name}')
+
+    def drop_table(self, table):
+        if self.has_table(table):
+            self.execute(f'DROP TABLE {table}')
+
+    def backfill(self, table, assignments, where):
+        """UPDATE table SET assignments WHERE where, in id-ordered chunks."""
+        def update(conn, after, upper):
+            conn.execute(text(f'UPDATE {table} SET {assignments} WHERE id > :after AND id <= :upper AND ({where})'),
+                         {'after': after, 'upper': upper})
+        rows = self._chunked(f'backfill {table}', table, update)
+        self.echo(f'  backfilled {table}: {rows} rows scanned')
+
+    def rebuild_table(self, table, expressions=None):
+        """Recreate a model's table from its current definition, copying rows in chunks.
+
+        expressions maps column names to the SQL that produces them from the
+        old table (e.g. a CAST); other columns are copied as they are, and
+        columns the old table lacks are left to their defaults. Rows
+        go into ``<name>_rebuild`` chunk by chunk; one final transaction
+        copies the rows inserted meanwhile, swaps the tables and recreates
+        the indexes. Only for append-only tables such as answer_events: a
+        row updated after its chunk was copied keeps its old values.
+        """
+        name, shadow_name = table.name, f'{table.name}_rebuild'
+        existing = {c['name'] for c in self.inspector().get_columns(name)}
+        columns = [c.name for c in table.columns if c.name in existing]
+        select_list = ', '.join((expressions or {}).get(c, c) for c in columns)
+        insert = (f"INSERT INTO {shadow_name} ({', '.join(columns)}) "
+                  f"SELECT {select_list} FROM {name} WHERE id > :after")
+
+        if not self.has_table(shadow_name):
+            metadata = MetaData()
+            for fk in table.foreign_keys:
+                fk.column.table.to_metadata(metadata)
+            shadow = table.to_metadata(metadata, name=shadow_name)
+            # Indexes are created after the swap, under their real names.
+            shadow.indexes.clear()
+            shadow.create(self.engine)
+
+        def copy(conn, after, upper):
+            conn.execute(text(insert + ' AND id <= :upper'), {'after': after, 'upper': upper})
+        rows = self._chunked(f'rebuild {name}', name, copy)
+
+        with self.engine.begin() as conn:
+            conn.execute(text(insert), {'after': self._checkpoint(conn, f'rebuild {name}')})
+            conn.execute(text(f'DROP TABLE {name}'))
+            conn.execute(text(f'ALTER TABLE {shadow_name} RENAME TO {name}'))
+            for index in table.indexes:
+                index.create(conn)
+            if self.dialect == 'postgresql':
+                # The shadow table's serial sequence started from 1.
+                conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{name}', 'id'), "
+                                  f"COALESCE((SELECT MAX(id) FROM {name}), 0) + 1, false)"))
+        self.echo(f'  rebuilt {name}: {rows} rows copied')
+
+    def _checkpoint(self, conn, step):
+        position = conn.execute(
+            select(migration_checkpoints.c.position)
+            .where(migration_checkpoints.c.version == self.version, migration_checkpoints.c.step == step)
+        ).scalar()
+        return position or 0
+
+    def _save_checkpoint(self, conn, step, position):
+        updated = conn.execute(
+            migration_checkpoints.update()
+            .where(migration_checkpoints.c.version == self.version, migration_checkpoints.c.step == step)
+            .values(position=position)
+        ).rowcount
+        if not updated:
+            conn.execute(migration_checkpoints.insert().values(version=self.version, step=step, position=position))
+
+    def _chunked(self, step, table, work):
+        """Run work(conn, after, upper) over table's ids in checkpointed chunks; return rows covered."""
+        rows = 0
+        while True:
+            start = time.perf_counter()
+            with self.engine.begin() as conn:
+                after = self._checkpoint(conn, step)
+                # The id chunk_size rows on, found through the primary key index.
+                upper = conn.execute(
+                    text(f'SELECT id FROM {table} WHERE id > :after ORDER BY id LIMIT 1 OFFSET :skip'),
+                    {'after': after, 'skip': self.chunk_size - 1}
+                ).scalar()
+                if upper is None:
+                    upper = conn.execute(text(f'SELECT MAX(id) FROM {table} WHERE id > :after'),
+                                         {'after': after}).scalar()
+                    if upper is None:
+                        return rows
+                    count = conn.execute(text(f'SELECT COUNT(*) FROM {table} WHERE id > :after'),
+                                         {'after': after}).scalar()
+                else:
+                    count = self.chunk_size
+                work(conn, after, upper)
+                self._save_checkpoint(conn, step, upper)
+            rows += count
+            self._pace(time.perf_counter() - start)
+
+    def _pace(self, elapsed):
+        # Steer chunks toward chunk_ms, then rest to keep the duty cycle.
+        target = self.chunk_ms / 1000
+        if elapsed > 0:
+            scaled = int(self.chunk_size * min(2.0, target / elapsed))
+            self.chunk_size = max(MIN_CHUNK_SIZE, min(MAX_CHUNK_SIZE, scaled))
+        time.sleep(elapsed * (1 - self.duty_cycle) / self.duty_cycle)
+
+
+def applied_versions(engine):
+    migration_metadata.create_all(engine)
+    with engine.connect() as conn:
+        return {row.version: row.applied_at for row in conn.execute(select(schema_migrations))}
+
+
+def run_migrations(engine=None, echo=print, **pacing):
+    """Apply every pending migration in order; returns the versions applied."""
+    engine = engine or db.engine
+    applied = applied_versions(engine)
+    done = []
+    for version, name, fn in MIGRATIONS:
+        if version in applied:
+            continue
+        echo(f'Applying {version:04d} {name}')
+        start = time.perf_counter()
+        fn(Migrator(engine, version, echo=echo, **pacing))
+        with engine.begin() as conn:
+            conn.execute(schema_migrations.insert().values(
+                version=version, name=name, applied_at=datetime.now(timezone.utc).replace(tzinfo=None)
+            ))
+            conn.execute(migration_checkpoints.delete().where(migration_checkpoints.c.version == version))
+        echo(f'  done in {time.perf_counter() - start:.1f}s')
+        done.append(version)
+    return done
+
+
+@migration(1, 'create tables')
+def create_tables(m):
+    # Creates only missing tables; existing ones are changed by later migrations.
+    db.metadata.create_all(m.engine)
+
+
+@migration(2, 'users.is_admin')
+def add_is_admin(m):
+    m.add_column('users', 'is_admin', 'BOOLEAN DEFAULT FALSE')
+
+
+@migration(3, 'leaderboard, login and answer log indexes')
+def add_indexes(m):
+    # Only the indexes this migration introduced; later ones have their own.
+    names = ('ix_users_exp_id', 'ix_progress_section_rank', 'ix_answer_events_user_id')
+    for model in (User, UserSectorProgress, AnswerEvent):
+        for index in model.__table__.indexes:
+            if index.name in names:
+                m.create_index(index)
+    # The non-unique login indexes as they were then (migration 9 replaces them).
+    users = Table('users', MetaData(), Column('username', String), Column('email', String))
+    for column in ('username', 'email'):
+        m.create_index(Index(f'ix_users_{column}_lower', func.lower(users.c[column])))
+
+
+@migration(4, 'default NULL user counters')
+def backfill_user_defaults(m):
+    # Keyset pagination on (exp, id) skips rows whose exp is NULL.
+    m.backfill('users', 'exp = COALESCE(exp, 0), level = COALESCE(level, 1), '
+                        'is_admin = COALESCE(is_admin, FALSE)',
+               'exp IS NULL OR level IS NULL OR is_admin IS NULL')
+
+
+def _answer_events_v5():
+    """answer_events as migration 5 left it, independent of later model changes."""
+    metadata = MetaData()
+    Table('users', metadata, Column('id', Integer, primary_key=True))
+    return Table(
+        'answer_events', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('user_id', Integer, ForeignKey('users.id'), nullable=False, index=True),
+        Column('section', String(50), nullable=False),
+        Column('level', Integer, nullable=False),
+        Column('question', String(64), nullable=False),
+        Column('answer', String(32), nullable=False),
+        Column('expected', String(32), nullable=False),
+        Column('is_correct', Boolean, nullable=False),
+        Column('latency_ms', Integer),
+        Column('created_at', DateTime, nullable=False),
+    )
+
+
+@migration(5, 'answer_events answers as strings')
+def answer_events_string_answers(m):
+    if isinstance(m.column_type('answer_events', 'answer'), String):
+        return
+    m.rebuild_table(_answer_events_v5(), {
+        'answer': 'CAST(answer AS VARCHAR(32))',
+        'expected': 'CAST(expected AS VARCHAR(32))',
+    })
+
+
+@migration(6, 'drop retired level/unlock tables')
+def drop_legacy_tables(m):
+    for table in ('user_unlocks', 'user_level_progress', 'problem_categories'):
+        m.drop_table(table)
+
+
+@migration(7, 'skill ratings')
+def add_skill_ratings(m):
+    m.add_column('user_sector_progress', 'rating', 'INTEGER')
+    m.add_column('user_sector_progress', 'rated_answers', 'INTEGER DEFAULT 0')
+    m.add_column('answer_events', 'tier', 'SMALLINT')
+
+
+@migration(8, 'completed runs')
+def add_completed_runs(m):
+    CompletedRun.__table__.create(m.engine, checkfirst=True)
+
+
+@migration(9, 'unique case-insensitive usernames and emails')
+def unique_logins(m):
+    # Accounts that differ only in case: the oldest keeps the name, later
+    # ones get their id added so every login resolves to one account.
+    renames = {'username': '{value}-{id}', 'email': 'dup{id}+{value}'}
+    for column, pattern in renames.items():
+        with m.engine.begin() as conn:
+            rows = conn.execute(text(
+                f'SELECT id, {column} FROM users WHERE lower({column}) IN '
+                f'(SELECT lower({column}) FROM users GROUP BY lower({column}) HAVING COUNT(*) > 1) '
+                f'ORDER BY lower({column}), id'
+            )).all()
+            seen = set()
+            for user_id, value in rows:
+                if value.lower() not in seen:
+                    seen.add(value.lower())
+                    continue
+                renamed = pattern.format(value=value, id=user_id)
+                conn.execute(text(f'UPDATE users SET {column} = :value WHERE id = :id'),
+                             {'value': renamed, 'id': user_id})
+                m.echo(f'  renamed duplicate {column} {value!r} of user {user_id} to {renamed!r}')
+    for index in User.__table__.indexes:
+        if index.unique:
+            m.create_index(index)
+    m.drop_index('ix_users_username_lower')
+    m.drop_index('ix_users_email_lower')
+
+
+def pacing_options(config):
+    return {
+        'chunk_size': config.get('MIGRATION_CHUNK_SIZE', 1000),
+        'chunk_ms': config.get('MIGRATION_CHUNK_MS', 50),
+        'duty_cycle': config.get('MIGRATION_DUTY_CYCLE', 0.5),
+    }
+
+
+@click.command('migrate')
+@click.option('--status', is_flag=True, help='List migrations and whether they are applied.')
+@click.option('--chunk-ms', type=float, help='Target duration of one backfill/copy chunk.')
+@click.option('--duty-cycle', type=float, help='Largest share of time spent holding locks (0-1].')
+@with_appcontext
+def migrate_command(status, chunk_ms, duty_cycle):
+    """Apply pending schema migrations."""
+    if status:
+        applied = applied_versions(db.engine)
+        for version, name, _ in MIGRATIONS:
+            state = applied[version].strftime('%Y-%m-%d %H:%M') if version in applied else 'pending'
+            click.echo(f'{version:04d}  {state:<16}  {name}')
+        return
+
+    pacing = pacing_options(current_app.config)
+    if chunk_ms is not None:
+        pacing['chunk_ms'] = chunk_ms
+    if duty_cycle is not None:
+        pacing['duty_cycle'] = duty_cycle
+    if not run_migrations(echo=click.echo, **pacing):
+        click.echo('No pending migrations.')
@@ -0,0 +1,92 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+from metrics import metrics
+
+
+class HashingOverloaded(Exception):
+    """Raised when too many password hashes are already queued."""
+
+
+class PasswordHasher:
+    """Runs the password KDF on a bounded worker pool.
+
+    At most ``PASSWORD_HASH_WORKERS`` hashes run at once (hashlib's KDFs
+    release the GIL, so they run in parallel with request threads) and at
+    most ``PASSWORD_HASH_MAX_QUEUE`` may wait. Beyond that ``hash``/``verify``
+    raise HashingOverloaded so callers can shed load instead of piling up
+    blocked workers. ``PASSWORD_HASH_METHOD`` takes Werkzeug's method
+    syntax, e.g. ``scrypt:32768:8:1`` or ``pbkdf2:sha256:600000``; existing
+    hashes made with other parameters report ``needs_rehash``. Short specs
+    such as ``scrypt`` are compared with Werkzeug's defaults filled in.
+    """
+
+    def __init__(self, app=None):
+        self.method = 'scrypt:32768:8:1'
+        self.max_queue = 0
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.rejected = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', self.method)
+        app.config.setdefault('PASSWORD_HASH_WORKERS', 4)
+        app.config.setdefault('PASSWORD_HASH_MAX_QUEUE', 64)
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self.max_queue = app.config['PASSWORD_HASH_MAX_QUEUE']
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='password-hash')
+        metrics.gauge('mathly_password_hash_queue_depth', lambda: self._in_flight)
+
+    @property
+    def queue_depth(self):
+        """Hashes submitted but not yet finished (running or waiting)."""
+        return self._in_flight
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, method=self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        return full_method(pwhash.split('$', 1)[0]) != full_method(self.method)
+
+    def stats(self):
+        return {'queue_depth': self._in_flight, 'rejected': self.rejected, 'method': self.method}
+
+    def _run(self, fn, *args, **kwargs):
+        if self._executor is None:
+            # Used outside the app (scripts, shells): hash inline.
+            return fn(*args, **kwargs)
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise HashingOverloaded()
+            self._in_flight += 1
+        try:
+            return self._executor.submit(fn, *args, **kwargs).result()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+
+def full_method(method):
+    """A Werkzeug method spec with its default parameters filled in, as hashes record it."""
+    name, *args = method.split(':')
+    if name == 'scrypt' and not args:
+        args = ['32768', '8', '1']
+    elif name == 'pbkdf2':
+        if not args:
+            args = ['sha256']
+        if len(args) == 1:
+            args.append(str(DEFAULT_PBKDF2_ITERATIONS))
+    return ':'.join([name, *args])
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,115 @@
+import secrets
+import threading
+from collections import OrderedDict, deque
+
+from database import generate_run
+
+# Seeded runs kept ready per (section, level, tier).
+POOL_CAPACITY = 8
+# Refill is scheduled once a key drops below this many runs.
+POOL_LOW_WATER = 3
+# Cold (section, level, tier) keys beyond this are evicted least recently used first.
+POOL_MAX_KEYS = 1024
+
+
+class ProblemPool:
+    """Process-local pool of pre-generated runs per (section, level, tier).
+
+    Each key holds a bounded ring buffer of (seed, problems) pairs; the seed
+    lets any worker regenerate the run's answers. Taking a run never waits
+    for the refill thread: when a buffer is empty the caller generates inline
+    (counted as a miss) and a refill is queued for the background worker.
+    """
+
+    def __init__(self, capacity=POOL_CAPACITY, low_water=POOL_LOW_WATER, max_keys=POOL_MAX_KEYS):
+        self.capacity = capacity
+        self.low_water = low_water
+        self.max_keys = max_keys
+        self._buffers = OrderedDict()
+        self._pending = OrderedDict()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._worker = None
+        self.hits = 0
+        self.misses = 0
+        self.refills = 0
+        self.evictions = 0
+
+    def take(self, section, level, tier=None):
+        """Return a ready-made (seed, problems) run for section/level/tier."""
+        key = (section, level, tier)
+        with self._lock:
+            buffer = self._buffers.get(key)
+            if buffer is None:
+                buffer = self._buffers[key] = deque(maxlen=self.capacity)
+                self._evict_cold_keys()
+            else:
+                self._buffers.move_to_end(key)
+
+            if buffer:
+                run = buffer.popleft()
+                self.hits += 1
+            else:
+                run = None
+                self.misses += 1
+
+            if len(buffer) < self.low_water and key not in self._pending:
+                self._pending[key] = True
+                self._ensure_worker()
+                self._wakeup.notify()
+
+        if run is None:
+            run = _new_run(section, level, tier)
+        return run
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'refills': self.refills,
+                'evictions': self.evictions,
+                'keys': len(self._buffers),
+                'pending': len(self._pending),
+                'buffered': sum(len(b) for b in self._buffers.values()),
+            }
+
+    def _evict_cold_keys(self):
+        while len(self._buffers) > self.max_keys:
+            key, _ = self._buffers.popitem(last=False)
+            self._pending.pop(key, None)
+            self.evictions += 1
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._refill_loop, name='problem-pool-refill', daemon=True)
+            self._worker.start()
+
+    def _refill_loop(self):
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._wakeup.wait()
+                key, _ = self._pending.popitem(last=False)
+                buffer = self._buffers.get(key)
+                missing = self.capacity - len(buffer) if buffer is not None else 0
+
+            if missing <= 0:
+                continue
+
+            runs = [_new_run(*key) for _ in range(missing)]
+
+            with self._lock:
+                # The key may have been evicted while we were generating.
+                buffer = self._buffers.get(key)
+                if buffer is not None:
+                    buffer.extend(runs)
+                    self.refills += 1
+
+
+def _new_run(section, level, tier):
+    seed = secrets.randbits(48)
+    return seed, generate_run(section, level, seed, tier)
+
+
+problem_pool = ProblemPool()
@@ -0,0 +1,132 @@
+"""Opt-in per-request SQL instrumentation.
+
+With ``SQL_INSTRUMENTATION`` on, SQLAlchemy engine events count and time
+every statement a request issues. Each response gets a ``Server-Timing``
+header (``db`` with the statement count and SQL time, ``app`` with the
+whole request), visible in the browser's network panel. Statements slower
+than ``SQL_SLOW_QUERY_MS`` are logged with their query plan (``EXPLAIN
+QUERY PLAN`` on SQLite, ``EXPLAIN`` elsewhere) but without their bound
+parameters, which can hold password hashes, emails or session data, unless
+``SQL_LOG_PARAMETERS`` is set for local debugging. A statement shape
+repeated ``SQL_N_PLUS_ONE_THRESHOLD`` or more times within one request is
+logged as a likely N+1 (e.g. a lazy relationship loaded inside a loop).
+
+SQL issued outside a request, such as by the answer log writer, is ignored.
+Off by default: the event hooks add a few microseconds per statement.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from database import db
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    def __init__(self, app=None):
+        self.enabled = False
+        self.log_parameters = False
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.statements = 0
+        self.slow_queries = 0
+        self.n_plus_one = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SQL_INSTRUMENTATION', False)
+        app.config.setdefault('SQL_SLOW_QUERY_MS', 100)
+        app.config.setdefault('SQL_N_PLUS_ONE_THRESHOLD', 5)
+        app.config.setdefault('SQL_LOG_PARAMETERS', False)
+
+        self.enabled = app.config['SQL_INSTRUMENTATION']
+        self.slow_ms = app.config['SQL_SLOW_QUERY_MS']
+        self.n_plus_one_threshold = app.config['SQL_N_PLUS_ONE_THRESHOLD']
+        self.log_parameters = app.config['SQL_LOG_PARAMETERS']
+        if not self.enabled:
+            return
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'requests': self.requests,
+            'statements': self.statements,
+            'slow_queries': self.slow_queries,
+            'n_plus_one': self.n_plus_one,
+        }
+
+    def _start_request(self):
+        g._query_stats = {'count': 0, 'sql_ms': 0.0, 'shapes': Counter(), 'start': time.perf_counter()}
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            context._query_stats_start = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, '_query_stats_start', None)
+        current = g.get('_query_stats') if has_request_context() else None
+        if start is None or current is None:
+            return
+        elapsed = (time.perf_counter() - start) * 1000
+        current['count'] += 1
+        current['sql_ms'] += elapsed
+        # Statements are parameterized, so identical text means identical shape.
+        current['shapes'][statement] += 1
+
+        if elapsed >= self.slow_ms:
+            with self._lock:
+                self.slow_queries += 1
+            plan = 'n/a (executemany)' if executemany else self._explain(conn, statement, parameters)
+            shown = repr(parameters) if self.log_parameters else 'redacted (set SQL_LOG_PARAMETERS to show)'
+            logger.warning('Slow query (%.1f ms) on %s: %s\nparameters: %s\nplan:\n%s',
+                           elapsed, request.endpoint, statement, shown, plan)
+
+    def _finish_request(self, response):
+        current = g.pop('_query_stats', None)
+        if current is None:
+            return response
+
+        total_ms = (time.perf_counter() - current['start']) * 1000
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={current["sql_ms"]:.2f};desc="{current["count"]} queries", app;dur={total_ms:.2f}'
+        )
+
+        repeated = [(shape, n) for shape, n in current['shapes'].items() if n >= self.n_plus_one_threshold]
+        for shape, n in repeated:
+            logger.warning('Likely N+1 on %s: %d identical statements: %s', request.endpoint, n, shape)
+
+        with self._lock:
+            self.requests += 1
+            self.statements += current['count']
+            self.n_plus_one += len(repeated)
+        return response
+
+    def _explain(self, conn, statement, parameters):
+        """Query plan of statement, run on a separate raw cursor so no events fire."""
+        prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+        try:
+            cursor = conn.connection.cursor()
+            try:
+                cursor.execute(prefix + statement, parameters)
+                return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+            finally:
+                cursor.close()
+        except Exception as e:
+            return f"unavailable ({e})"
+
+
+query_stats = QueryStats()
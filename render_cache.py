@@ -0,0 +1,93 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import current_app, make_response, request
+
+from assets import assets
+
+
+class RenderCache:
+    """Per-user page cache with strong ETags for the dashboards.
+
+    A page's cache key and ETag come from the user's state version: a digest
+    of everything the dashboards render (XP, account level, and every
+    sector's level and counters) plus digests of the template sources and
+    of the asset manifest, since pages embed fingerprinted asset URLs.
+    Any write to that state changes the version, whichever worker made it,
+    so cached pages never need explicit invalidation. Requests whose
+    If-None-Match matches are answered 304 without rendering.
+    """
+
+    def __init__(self, app=None):
+        self.max_size = 0
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+        self._template_digests = {}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RENDER_CACHE_SIZE', 2048)
+        self.max_size = app.config['RENDER_CACHE_SIZE']
+
+    def render(self, template, user, render):
+        """Serve template for user, calling render() only on a cache miss."""
+        etag = f"{template}-{self.template_digest(template)}-{assets.digest}-{user_state_version(user)}"
+
+        if request.if_none_match.contains(etag):
+            self.not_modified += 1
+            response = make_response('', 304)
+        else:
+            with self._lock:
+                body = self._pages.get(etag)
+                if body is not None:
+                    self._pages.move_to_end(etag)
+                    self.hits += 1
+            if body is None:
+                body = render()
+                with self._lock:
+                    self.misses += 1
+                    self._pages[etag] = body
+                    while len(self._pages) > self.max_size:
+                        self._pages.popitem(last=False)
+            response = make_response(body)
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def template_digest(self, template):
+        digest = self._template_digests.get(template)
+        if digest is None:
+            env = current_app.jinja_env
+            source, _, _ = env.loader.get_source(env, template)
+            digest = hashlib.sha1(source.encode('utf-8')).hexdigest()[:8]
+            self._template_digests[template] = digest
+        return digest
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'not_modified': self.not_modified,
+            'size': len(self._pages),
+        }
+
+
+def user_state_version(user):
+    """Digest of the user state the dashboards render."""
+    state = (
+        user.id, user.username, user.level, user.exp,
+        sorted(
+            (p.section, p.level, p.total_problems_solved, p.total_exp_earned)
+            for p in user.sector_progress.values()
+        ),
+    )
+    return hashlib.sha1(repr(state).encode('utf-8')).hexdigest()[:16]
+
+
+render_cache = RenderCache()
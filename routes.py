@@ -1,13 +1,43 @@
 from functools import wraps
-from flask import render_template, request, jsonify, redirect, url_for, flash, session, abort
-from flask_login import login_user, logout_user, login_required, current_user
+from flask import Blueprint, Response, render_template, request, jsonify, redirect, url_for, flash, abort
+from flask_login import LoginManager, login_user, logout_user, login_required, current_user
+from sqlalchemy.exc import IntegrityError
 
-from app import app
 from database import (
-    db, Unit, Quiz, Option, User, UserSectorProgress,
-    generate_problem, get_upgrade_cost, get_difficulty_name,
-    get_exp_reward, get_difficulty_params, SECTION_CONFIG
+    db, Unit, Quiz, Option, User, load_user_with_progress,
+    get_difficulty_name, get_exp_reward, get_difficulty_params,
+    set_sector_level, users_by_exp, section_ranking,
+    search_users, bulk_modify_exp, bulk_set_levels, modify_exp_where,
+    set_level_where, user_exp_by_id, find_user_by_login, EXP_ACTIONS, SECTION_CONFIG
 )
+from game import (
+    SECTIONS_DISPLAY, GameError, session_user_id, sectors_data, skills_data,
+    start_run, submit_answer, upgrade_sector, page_limit
+)
+from problem_pool import problem_pool
+from answer_log import answer_log
+from query_stats import query_stats
+from metrics import metrics
+from identity_cache import identity_cache
+from password_hashing import HashingOverloaded, password_hasher
+from render_cache import render_cache
+from export import FORMATS as EXPORT_FORMATS, export_stream
+
+main = Blueprint('main', __name__)
+
+login_manager = LoginManager()
+login_manager.login_view = 'main.login'
+
+
+@login_manager.user_loader
+def load_user(user_id):
+    user_id = int(user_id)
+    user = identity_cache.get(user_id)
+    if user is None:
+        user = load_user_with_progress(user_id)
+        if user is not None:
+            identity_cache.put(user)
+    return user
 
 
 def admin_required(f):
@@ -19,19 +49,11 @@ def admin_required(f):
     return decorated_function
 
 
-SECTIONS_DISPLAY = {
-    'addition': {'name': 'Addition', 'icon': '+', 'available': True},
-    'subtraction': {'name': 'Subtraction', 'icon': '-', 'available': True},
-    'multiplication': {'name': 'Multiplication', 'icon': 'x', 'available': True},
-    'division': {'name': 'Division', 'icon': '/', 'available': True},
-    'fractions': {'name': 'Fractions', 'icon': '%', 'available': False},
-    'mixed': {'name': 'Mixed Arithmetic', 'icon': '+-', 'available': False},
-    'decimals': {'name': 'Decimals', 'icon': '.', 'available': False},
-    'find_value': {'name': 'Find the Value', 'icon': '?', 'available': False},
-}
+ADMIN_PAGE_SIZE = 50
+MAX_BULK_OPERATIONS = 50000
 
 
-@app.route('/')
+@main.route('/')
 def index():
     if current_user.is_authenticated:
         units = Unit.query.all()
@@ -39,338 +61,252 @@ def index():
     return render_template('index.html')
 
 
-@app.route('/home')
+@main.route('/home')
 def home():
     units = Unit.query.all()
     return render_template('index.html', units=units)
 
 
-@app.route('/unit/<int:unit_id>')
+@main.route('/unit/<int:unit_id>')
 def unit(unit_id):
     unit_obj = Unit.query.get_or_404(unit_id)
     return render_template('unit.html', unit=unit_obj)
 
 
-@app.route('/quiz/<int:quiz_id>')
+@main.route('/quiz/<int:quiz_id>')
 def quiz(quiz_id):
     quiz_obj = Quiz.query.get_or_404(quiz_id)
     return render_template('quiz.html', quiz=quiz_obj)
 
 
-@app.route('/login', methods=['GET', 'POST'])
+@main.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         login_input = request.form.get('username')
         password = request.form.get('password')
 
-        user = User.query.filter_by(username=login_input).first()
-        if not user:
-            user = User.query.filter_by(email=login_input).first()
+        user = find_user_by_login(login_input or '')
 
-        if user and user.check_password(password):
-            login_user(user)
-            return redirect(url_for('home'))
+        try:
+            if user and user.check_password(password):
+                if password_hasher.needs_rehash(user.password_hash):
+                    user.set_password(password)
+                    db.session.commit()
+                login_user(user)
+                return redirect(url_for('main.home'))
+        except HashingOverloaded:
+            flash('Too many sign-ins right now, please try again in a moment')
+            return render_template('login.html', mode='Login'), 503
 
         flash('Invalid username/email or password')
 
     return render_template('login.html', mode='Login')
 
 
-@app.route('/register', methods=['GET', 'POST'])
+@main.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         username = request.form.get('username')
         email = request.form.get('email')
         password = request.form.get('password')
 
-        if User.query.filter_by(username=username).first():
+        if User.query.filter(db.func.lower(User.username) == username.lower()).first():
             flash('Username already taken')
             return render_template('login.html', mode='Register')
 
-        if User.query.filter_by(email=email).first():
+        if User.query.filter(db.func.lower(User.email) == email.lower()).first():
             flash('Email already registered')
             return render_template('login.html', mode='Register')
 
         new_user = User(username=username, email=email)
-        new_user.set_password(password)
+        try:
+            new_user.set_password(password)
+        except HashingOverloaded:
+            flash('Too many sign-ups right now, please try again in a moment')
+            return render_template('login.html', mode='Register'), 503
         db.session.add(new_user)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # A case-variant of the name or email was registered meanwhile.
+            db.session.rollback()
+            flash('Username or email already taken')
+            return render_template('login.html', mode='Register')
 
         login_user(new_user)
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
 
     return render_template('login.html', mode='Register')
 
 
-@app.route('/logout')
+@main.route('/logout')
 @login_required
 def logout():
     logout_user()
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
 
-@app.route('/play')
+@main.route('/play')
 @login_required
 def play():
-    user_progress = {p.section: p for p in current_user.sector_progress}
-
-    sectors_data = []
-    for section_key, display in SECTIONS_DISPLAY.items():
-        config = SECTION_CONFIG.get(section_key, {})
-        progress = user_progress.get(section_key)
-
-        current_level = progress.level if progress else 1
-        total_solved = progress.total_problems_solved if progress else 0
-        total_exp = progress.total_exp_earned if progress else 0
-
-        upgrade_cost = get_upgrade_cost(current_level)
-        can_upgrade = current_user.exp >= upgrade_cost
-        difficulty = get_difficulty_name(current_level)
-        exp_per_problem = get_exp_reward(section_key, current_level)
-        min_num, max_num = get_difficulty_params(current_level)
-
-        sectors_data.append({
-            'key': section_key,
-            'name': display['name'],
-            'icon': display['icon'],
-            'color': config.get('color', '#888'),
-            'available': display['available'],
-            'level': current_level,
-            'difficulty': difficulty,
-            'upgrade_cost': upgrade_cost,
-            'can_upgrade': can_upgrade,
-            'exp_per_problem': exp_per_problem,
-            'total_solved': total_solved,
-            'total_exp': total_exp,
-            'range': f"{min_num}-{max_num}"
-        })
-
-    return render_template('play.html', sectors=sectors_data)
-
-
-@app.route('/play/<section>')
-@app.route('/play/<section>/<int:level>')
+    def render():
+        return render_template('play.html', sectors=sectors_data(current_user))
+
+    return render_cache.render('play.html', current_user, render)
+
+
+@main.route('/play/<section>')
+@main.route('/play/<section>/<int:level>')
 @login_required
 def play_section(section, level=None):
-    if section not in SECTION_CONFIG:
-        flash('Invalid sector!')
-        return redirect(url_for('play'))
-
-    display = SECTIONS_DISPLAY.get(section, {})
-    if not display.get('available', False):
-        flash('This sector is not available yet!')
-        return redirect(url_for('play'))
-
-    max_level = current_user.get_sector_level(section)
-
-    if level is None:
-        level = max_level
-    elif level < 1 or level > max_level:
-        flash('Invalid level!')
-        return redirect(url_for('play'))
-
-    force_new = request.args.get('new') == '1'
-    quiz_session = session.get('quiz_session')
-
-    if force_new or not quiz_session or quiz_session.get('section') != section or quiz_session.get('level') != level or quiz_session.get('completed') or quiz_session.get('lives', 0) <= 0:
-        session['quiz_session'] = {
-            'section': section,
-            'level': level,
-            'current_problem': 1,
-            'total_problems': 7,
-            'lives': 3,
-            'accumulated_exp': 0,
-            'completed': False
-        }
-
-    problem = generate_problem(section, level)
-    session['current_problem'] = problem
+    try:
+        run_token, problems, level = start_run(current_user, section, level)
+    except GameError as e:
+        flash(e.message)
+        return redirect(url_for('main.play'))
+
+    problem = dict(problems[0], exp_reward=get_exp_reward(section, level))
 
     difficulty = get_difficulty_name(level)
     min_num, max_num = get_difficulty_params(level)
 
     return render_template('problem.html',
                          problem=problem,
+                         problems=[{'question': p['question'], 'options': p['options']} for p in problems],
+                         run_token=run_token,
                          section=section,
-                         section_name=display.get('name', section.title()),
+                         section_name=SECTIONS_DISPLAY[section]['name'],
                          user_level=level,
                          difficulty=difficulty,
-                         range_display=f"{min_num}-{max_num}",
-                         quiz_session=session['quiz_session'])
+                         range_display=f"{min_num}-{max_num}")
 
 
-@app.route('/check_answer', methods=['POST'])
-@login_required
+@main.route('/check_answer', methods=['POST'])
 def check_answer():
-    data = request.get_json()
-    user_answer = data.get('answer')
-
-    problem = session.get('current_problem')
-    quiz_session = session.get('quiz_session')
-
-    if not problem:
-        return jsonify({'error': 'No active problem'}), 400
-
-    if not quiz_session:
-        return jsonify({'error': 'No active quiz session'}), 400
-
-    is_correct = int(user_answer) == problem['correct']
-    section = problem['section']
-
-    progress = UserSectorProgress.query.filter_by(
-        user_id=current_user.id,
-        section=section
-    ).first()
-
-    if not progress:
-        progress = UserSectorProgress(
-            user_id=current_user.id,
-            section=section,
-            level=1,
-            total_problems_solved=0,
-            total_exp_earned=0
-        )
-        db.session.add(progress)
-
-    session_complete = False
-    session_failed = False
-    exp_gained = 0
-    total_exp_awarded = 0
-
-    if is_correct:
-        quiz_session['accumulated_exp'] += problem['exp_reward']
-
-        if quiz_session['current_problem'] >= quiz_session['total_problems']:
-            session_complete = True
-            quiz_session['completed'] = True
-            total_exp_awarded = quiz_session['accumulated_exp']
-            current_user.exp += total_exp_awarded
-            progress.total_problems_solved += quiz_session['total_problems']
-            progress.total_exp_earned += total_exp_awarded
-            db.session.commit()
-        else:
-            quiz_session['current_problem'] += 1
-    else:
-        quiz_session['lives'] -= 1
-        if quiz_session['lives'] <= 0:
-            session_failed = True
+    user_id = session_user_id()
+    if user_id is None:
+        return login_manager.unauthorized()
 
-    session['quiz_session'] = quiz_session
-    session.pop('current_problem', None)
-
-    return jsonify({
-        'correct': is_correct,
-        'expected': problem['correct'],
-        'exp_gained': problem['exp_reward'] if is_correct else 0,
-        'total_exp': current_user.exp,
-        'total_solved': progress.total_problems_solved,
-        'section': section,
-        'current_problem': quiz_session['current_problem'],
-        'total_problems': quiz_session['total_problems'],
-        'lives': quiz_session['lives'],
-        'session_complete': session_complete,
-        'session_failed': session_failed,
-        'total_exp_awarded': total_exp_awarded
-    })
+    data = request.get_json()
+    try:
+        result = submit_answer(user_id, data.get('token'), data.get('answer'), data.get('latency_ms'))
+    except GameError as e:
+        return jsonify({'error': e.message}), e.status
+    return jsonify(result)
 
 
-@app.route('/upgrade/<section>', methods=['POST'])
+@main.route('/upgrade/<section>', methods=['POST'])
 @login_required
 def upgrade_section(section):
-    if section not in SECTION_CONFIG:
-        return jsonify({'error': 'Invalid sector'}), 400
+    try:
+        return jsonify(upgrade_sector(current_user.id, section))
+    except GameError as e:
+        return jsonify({'error': e.message}), e.status
 
-    progress = UserSectorProgress.query.filter_by(
-        user_id=current_user.id,
-        section=section
-    ).first()
-
-    if not progress:
-        progress = UserSectorProgress(
-            user_id=current_user.id,
-            section=section,
-            level=1,
-            total_problems_solved=0,
-            total_exp_earned=0
-        )
-        db.session.add(progress)
-        db.session.commit()
 
-    current_level = progress.level
-    upgrade_cost = get_upgrade_cost(current_level)
+@main.route('/skills')
+@login_required
+def skills():
+    def render():
+        skills_list, total_problems, total_exp_earned = skills_data(current_user)
+        return render_template('skills.html',
+                             skills=skills_list,
+                             total_exp=current_user.exp,
+                             total_problems=total_problems,
+                             total_exp_earned=total_exp_earned)
+
+    return render_cache.render('skills.html', current_user, render)
 
-    if current_user.exp < upgrade_cost:
-        return jsonify({'error': 'Not enough EXP'}), 400
 
-    current_user.exp -= upgrade_cost
-    progress.level += 1
-    db.session.commit()
+@main.route('/leaderboard')
+def leaderboard():
+    try:
+        users, next_cursor = users_by_exp(request.args.get('after'), page_limit())
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    return jsonify({
+        'entries': [{'username': u.username, 'exp': u.exp} for u in users],
+        'next': next_cursor
+    })
 
-    new_level = progress.level
-    new_cost = get_upgrade_cost(new_level)
-    new_difficulty = get_difficulty_name(new_level)
-    new_exp_reward = get_exp_reward(section, new_level)
-    min_num, max_num = get_difficulty_params(new_level)
 
+@main.route('/leaderboard/<section>')
+def section_leaderboard(section):
+    if section not in SECTION_CONFIG:
+        return jsonify({'error': 'Invalid sector'}), 400
+    try:
+        rows, next_cursor = section_ranking(section, request.args.get('after'), page_limit())
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
     return jsonify({
-        'success': True,
-        'new_level': new_level,
-        'remaining_exp': current_user.exp,
-        'next_upgrade_cost': new_cost,
-        'can_upgrade': current_user.exp >= new_cost,
-        'difficulty': new_difficulty,
-        'exp_per_problem': new_exp_reward,
-        'range': f"{min_num}-{max_num}"
+        'section': section,
+        'entries': [
+            {'username': username, 'level': p.level, 'total_exp': p.total_exp_earned, 'total_solved': p.total_problems_solved}
+            for p, username in rows
+        ],
+        'next': next_cursor
     })
 
 
-@app.route('/skills')
-@login_required
-def skills():
-    user_progress = {p.section: p for p in current_user.sector_progress}
-
-    skills_data = []
-    total_problems = 0
-    total_exp_earned = 0
-
-    for section_key, display in SECTIONS_DISPLAY.items():
-        config = SECTION_CONFIG.get(section_key, {})
-        progress = user_progress.get(section_key)
-
-        current_level = progress.level if progress else 1
-        solved = progress.total_problems_solved if progress else 0
-        exp_earned = progress.total_exp_earned if progress else 0
-
-        total_problems += solved
-        total_exp_earned += exp_earned
-
-        skills_data.append({
-            'key': section_key,
-            'name': display['name'],
-            'icon': display['icon'],
-            'color': config.get('color', '#888'),
-            'level': current_level,
-            'difficulty': get_difficulty_name(current_level),
-            'total_solved': solved,
-            'total_exp': exp_earned
-        })
-
-    return render_template('skills.html',
-                         skills=skills_data,
-                         total_exp=current_user.exp,
-                         total_problems=total_problems,
-                         total_exp_earned=total_exp_earned)
-
-
-@app.route('/admin')
+@main.route('/admin')
 @login_required
 @admin_required
 def admin_panel():
-    users = User.query.order_by(User.exp.desc()).all()
-    return render_template('admin.html', users=users)
+    query = request.args.get('q', '').strip()
+    next_cursor = None
+    if query:
+        users = search_users(query, ADMIN_PAGE_SIZE)
+    else:
+        try:
+            users, next_cursor = users_by_exp(request.args.get('after'), ADMIN_PAGE_SIZE)
+        except ValueError:
+            abort(400)
+    return render_template('admin.html', users=users, query=query, next_cursor=next_cursor)
 
 
-@app.route('/admin/modify_exp', methods=['POST'])
+@main.route('/admin/export/users.<fmt>')
+@login_required
+@admin_required
+def admin_export_users(fmt):
+    """Stream every user with per-section progress; gzipped when the client accepts it."""
+    if fmt not in EXPORT_FORMATS:
+        abort(404)
+    compress = bool(request.accept_encodings['gzip'])
+    response = Response(export_stream(fmt, compress, db.engine), content_type=EXPORT_FORMATS[fmt])
+    if compress:
+        response.content_encoding = 'gzip'
+    response.headers['Content-Disposition'] = f'attachment; filename="users.{fmt}"'
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-store'
+    # Keep reverse proxies from buffering the whole export.
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@main.route('/admin/stats')
+@login_required
+@admin_required
+def admin_stats():
+    return jsonify({
+        'problem_pool': problem_pool.stats(),
+        'answer_log': answer_log.stats(),
+        'identity_cache': identity_cache.stats(),
+        'password_hasher': password_hasher.stats(),
+        'render_cache': render_cache.stats(),
+        'query_stats': query_stats.stats()
+    })
+
+
+@main.route('/metrics')
+def metrics_endpoint():
+    # Scrapers authenticate with METRICS_TOKEN; people with an admin session.
+    if not metrics.authorized(request.headers.get('Authorization')):
+        if not current_user.is_authenticated or not current_user.is_admin:
+            abort(403)
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@main.route('/admin/modify_exp', methods=['POST'])
 @login_required
 @admin_required
 def admin_modify_exp():
@@ -401,6 +337,7 @@ def admin_modify_exp():
         return jsonify({'error': 'Invalid action'}), 400
 
     db.session.commit()
+    identity_cache.invalidate(user.id)
 
     return jsonify({
         'success': True,
@@ -410,7 +347,7 @@ def admin_modify_exp():
     })
 
 
-@app.route('/admin/set_level', methods=['POST'])
+@main.route('/admin/set_level', methods=['POST'])
 @login_required
 @admin_required
 def admin_set_level():
@@ -434,24 +371,9 @@ def admin_set_level():
     except (ValueError, TypeError):
         return jsonify({'error': 'Invalid level'}), 400
 
-    progress = UserSectorProgress.query.filter_by(
-        user_id=user_id,
-        section=section
-    ).first()
-
-    if not progress:
-        progress = UserSectorProgress(
-            user_id=user_id,
-            section=section,
-            level=level,
-            total_problems_solved=0,
-            total_exp_earned=0
-        )
-        db.session.add(progress)
-    else:
-        progress.level = level
-
+    set_sector_level(user_id, section, level)
     db.session.commit()
+    identity_cache.invalidate(user.id)
 
     return jsonify({
         'success': True,
@@ -459,3 +381,146 @@ def admin_set_level():
         'section': section,
         'new_level': level
     })
+
+
+def parse_bulk_filter(raw):
+    """Validate a bulk-operation user filter into keyword arguments."""
+    if not isinstance(raw, dict):
+        raise ValueError('Invalid filter')
+    filters = {}
+    for key in ('min_exp', 'max_exp'):
+        if raw.get(key) is not None:
+            filters[key] = int(raw[key])
+    if raw.get('is_admin') is not None:
+        filters['is_admin'] = bool(raw['is_admin'])
+    return filters
+
+
+@main.route('/admin/bulk/modify_exp', methods=['POST'])
+@login_required
+@admin_required
+def admin_bulk_modify_exp():
+    """Apply EXP changes to many users in one transaction.
+
+    Body is either ``{"operations": [{"user_id", "action", "amount"}, ...]}``
+    or ``{"filter": {"min_exp", "max_exp", "is_admin"}, "action", "amount"}``.
+    """
+    data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+
+    if 'filter' in data:
+        try:
+            filters = parse_bulk_filter(data['filter'])
+            amount = int(data.get('amount', 0))
+        except (ValueError, TypeError):
+            return jsonify({'error': 'Invalid filter or amount'}), 400
+        action = data.get('action')
+        if action not in EXP_ACTIONS:
+            return jsonify({'error': 'Invalid action'}), 400
+
+        matched = modify_exp_where(action, max(0, amount) if action == 'set' else amount, **filters)
+        db.session.commit()
+        identity_cache.clear()
+        return jsonify({'success': True, 'matched': matched})
+
+    operations = data.get('operations')
+    if not isinstance(operations, list) or len(operations) > MAX_BULK_OPERATIONS:
+        return jsonify({'error': 'Missing or too many operations'}), 400
+
+    results = []
+    valid = []
+    for op in operations:
+        try:
+            user_id = int(op['user_id'])
+            amount = int(op.get('amount', 0))
+        except (KeyError, ValueError, TypeError, AttributeError):
+            results.append({'user_id': op.get('user_id') if isinstance(op, dict) else None,
+                            'success': False, 'error': 'Invalid parameters'})
+            continue
+        action = op.get('action')
+        if action not in EXP_ACTIONS:
+            results.append({'user_id': user_id, 'success': False, 'error': 'Invalid action'})
+            continue
+        result = {'user_id': user_id}
+        results.append(result)
+        valid.append({'user_id': user_id, 'action': action,
+                      'amount': max(0, amount) if action == 'set' else amount, 'result': result})
+
+    existing = bulk_modify_exp(valid)
+    db.session.commit()
+
+    new_exp = user_exp_by_id(existing)
+    for op in valid:
+        if op['user_id'] in existing:
+            op['result'].update(success=True, new_exp=new_exp[op['user_id']])
+            identity_cache.invalidate(op['user_id'])
+        else:
+            op['result'].update(success=False, error='User not found')
+
+    return jsonify({'success': True, 'applied': sum(1 for r in results if r['success']), 'results': results})
+
+
+@main.route('/admin/bulk/set_level', methods=['POST'])
+@login_required
+@admin_required
+def admin_bulk_set_level():
+    """Set section levels for many users in one transaction.
+
+    Body is either ``{"operations": [{"user_id", "section", "level"}, ...]}``
+    or ``{"filter": {"min_exp", "max_exp", "is_admin"}, "section", "level"}``.
+    """
+    data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+
+    if 'filter' in data:
+        try:
+            filters = parse_bulk_filter(data['filter'])
+            level = max(1, int(data.get('level')))
+        except (ValueError, TypeError):
+            return jsonify({'error': 'Invalid filter or level'}), 400
+        section = data.get('section')
+        if section not in SECTION_CONFIG:
+            return jsonify({'error': 'Invalid section'}), 400
+
+        matched = set_level_where(section, level, **filters)
+        db.session.commit()
+        identity_cache.clear()
+        return jsonify({'success': True, 'matched': matched})
+
+    operations = data.get('operations')
+    if not isinstance(operations, list) or len(operations) > MAX_BULK_OPERATIONS:
+        return jsonify({'error': 'Missing or too many operations'}), 400
+
+    results = []
+    valid = []
+    for op in operations:
+        try:
+            user_id = int(op['user_id'])
+            level = max(1, int(op['level']))
+        except (KeyError, ValueError, TypeError, AttributeError):
+            results.append({'user_id': op.get('user_id') if isinstance(op, dict) else None,
+                            'success': False, 'error': 'Invalid parameters'})
+            continue
+        section = op.get('section')
+        if section not in SECTION_CONFIG:
+            results.append({'user_id': user_id, 'success': False, 'error': 'Invalid section'})
+            continue
+        result = {'user_id': user_id, 'section': section}
+        results.append(result)
+        valid.append({'user_id': user_id, 'section': section, 'level': level, 'result': result})
+
+    existing = bulk_set_levels(valid)
+    db.session.commit()
+
+    # Repeated (user, section) pairs end at their last operation's level.
+    final_levels = {(op['user_id'], op['section']): op['level'] for op in valid}
+    for op in valid:
+        if op['user_id'] in existing:
+            op['result'].update(success=True, new_level=final_levels[(op['user_id'], op['section'])])
+            identity_cache.invalidate(op['user_id'])
+        else:
+            op['result'].update(success=False, error='User not found')
+
+    return jsonify({'success': True, 'applied': sum(1 for r in results if r['success']), 'results': results})
@@ -0,0 +1,93 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+from itsdangerous import BadSignature, SignatureExpired, TimestampSigner
+
+# A run token stays valid this long after it was issued (each answer
+# re-issues it, so this bounds the time spent on a single problem).
+RUN_TOKEN_MAX_AGE = 30 * 60
+# Runs whose latest index is remembered by the replay guard.
+REPLAY_GUARD_SIZE = 65536
+
+# user_exp and total_solved are snapshots taken when the run starts, so
+# mid-run answers can report them without reading the database. rating and
+# rated carry the player's skill estimate, updated with every answer.
+_FIELDS = ('user_id', 'seed', 'section', 'level', 'tier', 'attempt', 'solved', 'lives', 'exp',
+           'user_exp', 'total_solved', 'rating', 'rated')
+_INT_FIELDS = frozenset(_FIELDS) - {'section'}
+
+
+class InvalidRunToken(Exception):
+    """Raised when a run token is forged, expired, replayed or not the caller's."""
+
+
+def _signer():
+    return TimestampSigner(
+        current_app.config['SECRET_KEY'],
+        salt='mathly-run',
+        digest_method=hashlib.sha256,
+    )
+
+
+def issue_run_token(state):
+    """Sign a run state dict into a compact, expiring token."""
+    payload = ':'.join(str(state[f]) for f in _FIELDS)
+    return _signer().sign(payload).decode('ascii')
+
+
+def load_run_token(token, user_id, max_age=RUN_TOKEN_MAX_AGE, consume=True):
+    """Verify a run token and return its state without touching the session.
+
+    With ``consume=False`` the token is only inspected (e.g. to re-send the
+    run's problems) and stays usable for the next answer.
+    """
+    if not isinstance(token, str):
+        raise InvalidRunToken('Missing run token')
+    try:
+        payload = _signer().unsign(token, max_age=max_age).decode('ascii')
+    except SignatureExpired:
+        raise InvalidRunToken('Run token expired')
+    except BadSignature:
+        raise InvalidRunToken('Invalid run token')
+
+    values = payload.split(':')
+    if len(values) != len(_FIELDS):
+        raise InvalidRunToken('Invalid run token')
+    state = {f: int(v) if f in _INT_FIELDS else v for f, v in zip(_FIELDS, values)}
+
+    if state['user_id'] != user_id:
+        raise InvalidRunToken('Run token belongs to another user')
+    if consume and not replay_guard.advance(state['seed'], state['attempt']):
+        raise InvalidRunToken('Run token already used')
+    return state
+
+
+class ReplayGuard:
+    """Remembers the next expected attempt index per run seed.
+
+    Each token carries a monotonic attempt index, so a token is only accepted
+    once. The guard is process-local and bounded (oldest runs are forgotten
+    first), so it only stops fast in-process replays of mid-run answers.
+    Banking a run is guarded by the database instead: ``completed_runs``
+    accepts each run seed once, on any worker and across restarts.
+    """
+
+    def __init__(self, size=REPLAY_GUARD_SIZE):
+        self.size = size
+        self._next_attempt = OrderedDict()
+        self._lock = threading.Lock()
+
+    def advance(self, seed, attempt):
+        with self._lock:
+            if attempt < self._next_attempt.get(seed, 0):
+                return False
+            self._next_attempt[seed] = attempt + 1
+            self._next_attempt.move_to_end(seed)
+            if len(self._next_attempt) > self.size:
+                self._next_attempt.popitem(last=False)
+            return True
+
+
+replay_guard = ReplayGuard()
@@ -1,8 +1,8 @@
-from app import app
+from app import create_app
 from database import db, SECTION_CONFIG
 
 def seed_db():
-    with app.app_context():
+    with create_app(web=False).app_context():
         db.drop_all()
         db.create_all()
 
@@ -0,0 +1,181 @@
+"""Per-user, per-section skill ratings that steer difficulty within a level.
+
+Each section level is split into ``SKILL_TIERS`` operand bands
+(``get_tier_bounds``). Every (level, tier) band has a fixed Elo rating on
+one ladder, ``TIER_STEP`` points per tier, so the top tiers of a level sit
+next to the bottom tiers of the next one. A player's rating predicts their
+chance of answering a band correctly:
+
+    P(correct) = 1 / (1 + 10 ** ((band_rating - rating) / 400))
+
+After each answer the rating moves by ``K * (outcome - P)``, where K starts
+at ``K_MAX`` and settles towards ``K_MIN`` as rated answers accumulate.
+A run plays the band of its level that the player should answer about
+``TARGET_ACCURACY`` of the time. The upgrade still decides which levels are
+unlocked; the rating only picks a band inside the level being played.
+Sections whose generator is not ``tiered`` (fractions) always play the
+middle band, whose rating stands for the level as a whole.
+
+The update is O(1) and needs nothing from the database: the run token
+carries the rating, ``submit_answer`` updates it per answer, and it is
+stored once when the run ends (two integers per progress row). Answers in
+runs that are abandoned mid-way do not count until ``recalibrate-skills``
+replays ``answer_events``:
+
+    flask --app app recalibrate-skills
+
+The replay walks users in id chunks and updates every (user, section)
+sequence in lockstep, one answer index at a time, as NumPy array
+operations; without NumPy it falls back to a plain loop.
+"""
+import math
+import time
+
+from sqlalchemy import func, select
+
+from database import User, AnswerEvent, SKILL_TIERS, upsert_ratings
+
+BASE_RATING = 1000
+TIER_STEP = 40
+K_MAX = 64
+K_MIN = 16
+# Rated answers after which K is halfway from K_MAX to K_MIN.
+K_HALF_LIFE = 20
+TARGET_ACCURACY = 0.75
+# Rating gap at which a band is answered correctly TARGET_ACCURACY of the time.
+TARGET_GAP = round(400 * math.log10(TARGET_ACCURACY / (1 - TARGET_ACCURACY)))
+# Events without a tier were played over the level's whole range.
+DEFAULT_TIER = SKILL_TIERS // 2
+# New players start on level 1's middle band.
+INITIAL_RATING = BASE_RATING + TIER_STEP * DEFAULT_TIER + TARGET_GAP
+RECALIBRATE_USERS_PER_CHUNK = 5000
+
+
+def band_rating(level, tier):
+    return BASE_RATING + TIER_STEP * ((level - 1) * SKILL_TIERS + tier)
+
+
+def k_factor(rated_answers):
+    return K_MIN + (K_MAX - K_MIN) * K_HALF_LIFE / (K_HALF_LIFE + rated_answers)
+
+
+def expected_score(rating, level, tier):
+    """Predicted chance that a player rated rating answers this band correctly."""
+    return 1 / (1 + 10 ** ((band_rating(level, tier) - rating) / 400))
+
+
+def update_rating(rating, rated_answers, level, tier, correct):
+    """(new rating, new count) after one answer in the given band."""
+    if tier is None:
+        tier = DEFAULT_TIER
+    delta = k_factor(rated_answers) * (correct - expected_score(rating, level, tier))
+    return round(rating + delta), rated_answers + 1
+
+
+def choose_tier(rating, level):
+    """The band of level a player rated rating should answer at TARGET_ACCURACY."""
+    step = round((rating - TARGET_GAP - BASE_RATING) / TIER_STEP) - (level - 1) * SKILL_TIERS
+    return min(SKILL_TIERS - 1, max(0, step))
+
+
+def progress_rating(progress):
+    """(rating, rated answers) from a UserSectorProgress row, or a new player's."""
+    if progress is None or progress.rating is None:
+        return INITIAL_RATING, 0
+    return progress.rating, progress.rated_answers or 0
+
+
+def replay(groups, levels, tiers, correct):
+    """Ratings and answer counts from scratch for answer sequences.
+
+    Events are ordered by group and, within a group, by time; groups are
+    numbered 0..n-1. Returns (ratings, counts), indexed by group.
+    """
+    try:
+        # Imported here so the game and CLI start without loading NumPy.
+        import numpy as np
+    except ImportError:
+        np = None
+    if np is None or not len(groups):
+        return _replay_loop(groups, levels, tiers, correct)
+
+    groups = np.asarray(groups, dtype=np.int64)
+    difficulty = BASE_RATING + TIER_STEP * (
+        (np.asarray(levels, dtype=np.float64) - 1) * SKILL_TIERS + np.asarray(tiers, dtype=np.float64)
+    )
+    outcome = np.asarray(correct, dtype=np.float64)
+
+    counts = np.bincount(groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    # Index of each event within its own sequence.
+    position = np.arange(len(groups)) - starts[groups]
+    order = np.argsort(position, kind='stable')
+    per_position = np.bincount(position)
+
+    ratings = np.full(len(counts), float(INITIAL_RATING))
+    offset = 0
+    for step, size in enumerate(per_position):
+        events = order[offset:offset + size]
+        offset += size
+        # Each group has at most one event at a given position.
+        players = groups[events]
+        current = ratings[players]
+        expected = 1 / (1 + 10 ** ((difficulty[events] - current) / 400))
+        ratings[players] = np.round(current + k_factor(step) * (outcome[events] - expected))
+    return ratings.astype(np.int64).tolist(), counts.tolist()
+
+
+def _replay_loop(groups, levels, tiers, correct):
+    ratings, counts = [], []
+    for group, level, tier, is_correct in zip(groups, levels, tiers, correct):
+        if group == len(ratings):
+            ratings.append(INITIAL_RATING)
+            counts.append(0)
+        ratings[group], counts[group] = update_rating(ratings[group], counts[group], level, tier, is_correct)
+    return ratings, counts
+
+
+def recalibrate(engine, users_per_chunk=RECALIBRATE_USERS_PER_CHUNK, echo=print):
+    """Recompute every rating from answer_events; returns (sequences, events)."""
+    events_table = AnswerEvent.__table__
+    start = time.perf_counter()
+    after = 0
+    total_sequences = total_events = 0
+    while True:
+        with engine.begin() as conn:
+            upper = conn.execute(
+                select(User.id).where(User.id > after).order_by(User.id)
+                .limit(1).offset(users_per_chunk - 1)
+            ).scalar()
+            if upper is None:
+                upper = conn.execute(select(func.max(User.id)).where(User.id > after)).scalar()
+                if upper is None:
+                    break
+            rows = conn.execute(
+                select(events_table.c.user_id, events_table.c.section, events_table.c.level,
+                       events_table.c.tier, events_table.c.is_correct)
+                .where(events_table.c.user_id > after, events_table.c.user_id <= upper)
+                .order_by(events_table.c.user_id, events_table.c.section, events_table.c.id)
+            ).all()
+
+            keys, groups, levels, tiers, correct = [], [], [], [], []
+            for user_id, section, level, tier, is_correct in rows:
+                if not keys or keys[-1] != (user_id, section):
+                    keys.append((user_id, section))
+                groups.append(len(keys) - 1)
+                levels.append(level)
+                tiers.append(DEFAULT_TIER if tier is None else tier)
+                correct.append(bool(is_correct))
+
+            if keys:
+                ratings, counts = replay(groups, levels, tiers, correct)
+                upsert_ratings(conn, [
+                    (user_id, section, rating, count)
+                    for (user_id, section), rating, count in zip(keys, ratings, counts)
+                ])
+        total_sequences += len(keys)
+        total_events += len(rows)
+        after = upper
+        echo(f"  users <= {upper}: {total_sequences} ratings from {total_events} answers "
+             f"({time.perf_counter() - start:.1f}s)")
+    return total_sequences, total_events
@@ -0,0 +1,61 @@
+function showToast(message, isError = false) {
+    const toast = document.getElementById('toast');
+    toast.textContent = message;
+    toast.classList.toggle('error', isError);
+    toast.classList.add('visible');
+    setTimeout(() => toast.classList.remove('visible'), 3000);
+}
+
+async function modifyExp(userId, action) {
+    const amountInput = document.getElementById(`exp-amount-${userId}`);
+    const amount = parseInt(amountInput.value) || 0;
+
+    try {
+        const res = await fetch('/admin/modify_exp', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ user_id: userId, amount, action })
+        });
+
+        const data = await res.json();
+
+        if (data.success) {
+            document.getElementById(`exp-${userId}`).textContent = data.new_exp;
+            showToast(`${data.username}'s EXP updated to ${data.new_exp}`);
+        } else {
+            showToast(data.error || 'Failed to update EXP', true);
+        }
+    } catch (err) {
+        showToast('Request failed', true);
+        console.error(err);
+    }
+}
+
+function toggleLevels(userId) {
+    const panel = document.getElementById(`levels-${userId}`);
+    panel.classList.toggle('visible');
+}
+
+async function setLevel(userId, section) {
+    const levelInput = document.getElementById(`level-${userId}-${section}`);
+    const level = parseInt(levelInput.value) || 1;
+
+    try {
+        const res = await fetch('/admin/set_level', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ user_id: userId, section, level })
+        });
+
+        const data = await res.json();
+
+        if (data.success) {
+            showToast(`${section} level set to ${data.new_level}`);
+        } else {
+            showToast(data.error || 'Failed to set level', true);
+        }
+    } catch (err) {
+        showToast('Request failed', true);
+        console.error(err);
+    }
+}
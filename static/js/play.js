@@ -0,0 +1,263 @@
+let audioContext = null;
+
+function getAudioContext() {
+    if (!audioContext) {
+        audioContext = new (window.AudioContext || window.webkitAudioContext)();
+    }
+    return audioContext;
+}
+
+function playUpgradeSound() {
+    const ctx = getAudioContext();
+
+    const notes = [523.25, 659.25, 783.99, 1046.50];
+    notes.forEach((freq, i) => {
+        const oscillator = ctx.createOscillator();
+        const gainNode = ctx.createGain();
+
+        oscillator.connect(gainNode);
+        gainNode.connect(ctx.destination);
+
+        oscillator.frequency.setValueAtTime(freq, ctx.currentTime + i * 0.08);
+        oscillator.type = 'sine';
+
+        gainNode.gain.setValueAtTime(0, ctx.currentTime + i * 0.08);
+        gainNode.gain.linearRampToValueAtTime(0.25, ctx.currentTime + i * 0.08 + 0.02);
+        gainNode.gain.linearRampToValueAtTime(0, ctx.currentTime + i * 0.08 + 0.3);
+
+        oscillator.start(ctx.currentTime + i * 0.08);
+        oscillator.stop(ctx.currentTime + i * 0.08 + 0.3);
+    });
+}
+
+// Base green accent: #2a5d4a = HSL(155, 37%, 27%)
+// We start here and algorithmically shift hue every 5 levels
+
+function getTierColor(level) {
+    const tier = Math.floor((level - 1) / 5);
+    // Start at green hue (155) and shift by golden angle (~137.5) for good distribution
+    const baseHue = 155;
+    const hueShift = tier * 37; // Shift hue every 5 levels
+    const hue = (baseHue + hueShift) % 360;
+    // Gradually increase saturation and lightness as levels increase
+    const saturation = Math.min(37 + tier * 3, 70);
+    const lightness = Math.min(27 + tier * 2, 45);
+    return { hue, saturation, lightness, css: `hsl(${hue}, ${saturation}%, ${lightness}%)` };
+}
+
+function getEffectType(level) {
+    if (level >= 80) return 'gold-sparkles';
+    if (level >= 60) return 'glassy';
+    if (level >= 40) return 'lightning';
+    if (level >= 20) return 'flames';
+    return null;
+}
+
+function getEffectColors(level, effectType) {
+    // Calculate which 5-level tier within the effect we're in
+    let effectStartLevel;
+    if (effectType === 'flames') effectStartLevel = 20;
+    else if (effectType === 'lightning') effectStartLevel = 40;
+    else if (effectType === 'glassy') effectStartLevel = 60;
+    else if (effectType === 'gold-sparkles') effectStartLevel = 80;
+    else return null;
+
+    const tierWithinEffect = Math.floor((level - effectStartLevel) / 5);
+
+    // Base palettes for each effect that shift algorithmically
+    let baseHue;
+    if (effectType === 'flames') {
+        // Flames: Start orange-red (15), shift through warm colors
+        baseHue = (15 + tierWithinEffect * 25) % 60; // Stay in warm range 0-60
+    } else if (effectType === 'lightning') {
+        // Lightning: Start electric blue (200), shift through cool electric colors
+        baseHue = 180 + ((tierWithinEffect * 30) % 80); // Range 180-260
+    } else if (effectType === 'glassy') {
+        // Glassy: Full spectrum, shifting through all colors
+        baseHue = (tierWithinEffect * 45) % 360;
+    } else if (effectType === 'gold-sparkles') {
+        // Gold sparkles: Start gold (45), shift through precious metal colors
+        baseHue = (45 + tierWithinEffect * 20) % 360;
+    }
+
+    // Generate 4 colors based on the base hue
+    const colors = [];
+    for (let i = 0; i < 4; i++) {
+        const hue = (baseHue + i * 15) % 360;
+        let sat, light;
+        if (effectType === 'flames') {
+            sat = 100;
+            light = 50 + i * 8;
+        } else if (effectType === 'lightning') {
+            sat = 80 + i * 5;
+            light = 55 + i * 10;
+        } else if (effectType === 'glassy') {
+            sat = 40 + i * 10;
+            light = 70 + i * 5;
+        } else if (effectType === 'gold-sparkles') {
+            sat = 85 - i * 5;
+            light = 50 + i * 10;
+        }
+        colors.push(`hsl(${hue}, ${sat}%, ${light}%)`);
+    }
+    return colors;
+}
+
+function hslToRgb(h, s, l) {
+    s /= 100;
+    l /= 100;
+    const a = s * Math.min(l, 1 - l);
+    const f = n => {
+        const k = (n + h / 30) % 12;
+        return l - a * Math.max(Math.min(k - 3, 9 - k, 1), -1);
+    };
+    return [Math.round(f(0) * 255), Math.round(f(8) * 255), Math.round(f(4) * 255)];
+}
+
+function applyTierStyle(section, level) {
+    const card = document.getElementById(`sector-${section}`);
+    if (!card || card.classList.contains('locked')) return;
+
+    // Apply tier color (border color that changes every 5 levels)
+    const tierColor = getTierColor(level);
+    card.style.setProperty('--tier-color', tierColor.css);
+
+    // Determine if we have a special effect
+    const effectType = getEffectType(level);
+
+    if (effectType) {
+        const effectColors = getEffectColors(level, effectType);
+        card.setAttribute('data-effect', effectType);
+
+        // Set effect colors as CSS variables
+        if (effectColors) {
+            card.style.setProperty('--effect-color-1', effectColors[0]);
+            card.style.setProperty('--effect-color-2', effectColors[1]);
+            card.style.setProperty('--effect-color-3', effectColors[2]);
+            card.style.setProperty('--effect-color-4', effectColors[3]);
+        }
+
+        // For glassy effect, set RGB values for rgba() usage
+        if (effectType === 'glassy') {
+            const tierWithinGlassy = Math.floor((level - 60) / 5);
+            const glassHue = (tierWithinGlassy * 45) % 360;
+            const rgb = hslToRgb(glassHue, 50, 70);
+            card.style.setProperty('--glass-r', rgb[0]);
+            card.style.setProperty('--glass-g', rgb[1]);
+            card.style.setProperty('--glass-b', rgb[2]);
+        }
+    } else {
+        card.removeAttribute('data-effect');
+    }
+}
+
+const sectorData = {};
+document.querySelectorAll('.sector-card').forEach(card => {
+    const section = card.dataset.section;
+    const level = parseInt(card.dataset.maxLevel);
+    sectorData[section] = {
+        maxLevel: level,
+        selectedLevel: level
+    };
+    applyTierStyle(section, level);
+});
+
+function changeLevel(section, delta) {
+    const data = sectorData[section];
+    const newLevel = data.selectedLevel + delta;
+
+    if (newLevel < 1 || newLevel > data.maxLevel) return;
+
+    data.selectedLevel = newLevel;
+
+    document.getElementById(`selected-level-${section}`).textContent = newLevel;
+    document.getElementById(`train-btn-${section}`).href = `/play/${section}/${newLevel}`;
+
+    const leftArrow = document.getElementById(`arrow-left-${section}`);
+    const rightArrow = document.getElementById(`arrow-right-${section}`);
+
+    leftArrow.style.visibility = newLevel <= 1 ? 'hidden' : 'visible';
+    rightArrow.style.visibility = newLevel >= data.maxLevel ? 'hidden' : 'visible';
+}
+
+function setButtonContent(btn, text, cost) {
+    btn.innerHTML = `${text}<span class="upgrade-cost" id="cost-${btn.id.replace('upgrade-btn-', '')}">${cost} XP</span>`;
+}
+
+async function upgradeSector(section) {
+    const btn = document.getElementById(`upgrade-btn-${section}`);
+    const currentCost = document.getElementById(`cost-${section}`).textContent;
+
+    btn.disabled = true;
+    btn.classList.add('upgrading');
+    setButtonContent(btn, 'UPGRADING...', currentCost.replace(' XP', ''));
+
+    try {
+        const res = await fetch(`/upgrade/${section}`, { method: 'POST' });
+        const data = await res.json();
+
+        if (data.success) {
+            playUpgradeSound();
+
+            document.getElementById('user-exp').textContent = data.remaining_exp;
+            document.getElementById(`selected-level-${section}`).textContent = data.new_level;
+            document.getElementById(`difficulty-${section}`).textContent = data.difficulty;
+            document.getElementById(`range-${section}`).textContent = data.range;
+            document.getElementById(`exp-${section}`).textContent = `+${data.exp_per_problem} XP`;
+
+            sectorData[section].maxLevel = data.new_level;
+            sectorData[section].selectedLevel = data.new_level;
+            document.getElementById(`train-btn-${section}`).href = `/play/${section}/${data.new_level}`;
+
+            const leftArrow = document.getElementById(`arrow-left-${section}`);
+            leftArrow.style.visibility = data.new_level > 1 ? 'visible' : 'hidden';
+            document.getElementById(`arrow-right-${section}`).style.visibility = 'hidden';
+
+            const card = document.getElementById(`sector-${section}`);
+            card.dataset.maxLevel = data.new_level;
+            card.classList.add('upgraded');
+            setTimeout(() => card.classList.remove('upgraded'), 500);
+
+            applyTierStyle(section, data.new_level);
+
+            btn.classList.remove('upgrading');
+            setButtonContent(btn, 'UPGRADE', data.next_upgrade_cost);
+
+            if (data.can_upgrade) {
+                btn.disabled = false;
+                btn.classList.add('can-upgrade');
+            } else {
+                btn.disabled = true;
+                btn.classList.remove('can-upgrade');
+            }
+
+            updateAllUpgradeButtons(data.remaining_exp);
+        } else {
+            btn.classList.remove('upgrading');
+            setButtonContent(btn, 'UPGRADE', currentCost.replace(' XP', ''));
+            btn.disabled = false;
+            alert(data.error || 'Upgrade failed');
+        }
+    } catch (err) {
+        btn.classList.remove('upgrading');
+        setButtonContent(btn, 'UPGRADE', currentCost.replace(' XP', ''));
+        btn.disabled = false;
+        console.error(err);
+    }
+}
+
+function updateAllUpgradeButtons(userExp) {
+    document.querySelectorAll('.sector-btn.upgrade').forEach(btn => {
+        const costEl = btn.querySelector('.upgrade-cost');
+        if (costEl) {
+            const cost = parseInt(costEl.textContent);
+            if (userExp >= cost) {
+                btn.disabled = false;
+                btn.classList.add('can-upgrade');
+            } else {
+                btn.disabled = true;
+                btn.classList.remove('can-upgrade');
+            }
+        }
+    });
+}
@@ -0,0 +1,119 @@
+let attempt = 0;
+let runActive = true;
+let shownAt = performance.now();
+
+const answerSlot = document.getElementById('answer-slot');
+const optionsGrid = document.getElementById('options');
+const submitBtn = document.getElementById('submit-btn');
+let selectedAnswer = null;
+let selectedCard = null;
+
+function bindOption(opt) {
+    opt.addEventListener('dragstart', e => {
+        e.target.classList.add('dragging');
+        e.dataTransfer.setData('text/plain', e.target.dataset.value);
+    });
+    opt.addEventListener('dragend', e => e.target.classList.remove('dragging'));
+    opt.addEventListener('click', () => selectAnswer(opt.dataset.value, opt));
+}
+
+document.querySelectorAll('.option-card').forEach(bindOption);
+
+function renderProblem(problem) {
+    document.querySelector('.question-text').textContent = problem.question;
+    optionsGrid.innerHTML = '';
+    problem.options.forEach((value, i) => {
+        const opt = document.createElement('div');
+        opt.className = 'option-card';
+        opt.draggable = true;
+        opt.dataset.value = value;
+        opt.innerHTML = `<span class="option-ref">${i + 1}</span>${value}`;
+        bindOption(opt);
+        optionsGrid.appendChild(opt);
+    });
+    selectedAnswer = null;
+    selectedCard = null;
+    answerSlot.textContent = '?';
+    answerSlot.classList.remove('active');
+    submitBtn.disabled = true;
+    submitBtn.textContent = 'EXECUTE';
+    shownAt = performance.now();
+}
+
+document.getElementById('next-btn').addEventListener('click', e => {
+    if (!runActive || attempt >= problems.length) return;
+    e.preventDefault();
+    document.getElementById('result-overlay').classList.remove('show');
+    renderProblem(problems[attempt]);
+});
+
+answerSlot.addEventListener('dragover', e => {
+    e.preventDefault();
+    answerSlot.classList.add('drag-over');
+});
+answerSlot.addEventListener('dragleave', () => answerSlot.classList.remove('drag-over'));
+answerSlot.addEventListener('drop', e => {
+    e.preventDefault();
+    answerSlot.classList.remove('drag-over');
+    const val = e.dataTransfer.getData('text/plain');
+    const card = document.querySelector(`.option-card[data-value="${val}"]`);
+    selectAnswer(val, card);
+});
+
+function selectAnswer(value, card) {
+    if (selectedCard) selectedCard.classList.remove('selected');
+    selectedAnswer = value;
+    selectedCard = card;
+    card.classList.add('selected');
+    answerSlot.textContent = value;
+    answerSlot.classList.add('active');
+    submitBtn.disabled = false;
+}
+
+async function submitAnswer() {
+    if (!selectedAnswer) return;
+    submitBtn.disabled = true;
+    submitBtn.textContent = 'PROCESSING...';
+
+    const res = await fetch('/check_answer', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            answer: selectedAnswer,
+            token: runToken,
+            latency_ms: Math.round(performance.now() - shownAt)
+        })
+    });
+    const data = await res.json();
+    attempt += 1;
+    runToken = data.token;
+    runActive = !!data.token;
+    showResult(data);
+}
+
+function showResult(data) {
+    const overlay = document.getElementById('result-overlay');
+    const card = document.getElementById('result-card');
+    const status = document.getElementById('result-status');
+    const exp = document.getElementById('result-exp');
+    const info = document.getElementById('result-info');
+
+    card.classList.remove('correct', 'wrong');
+
+    if (data.correct) {
+        card.classList.add('correct');
+        status.className = 'result-status correct';
+        status.textContent = 'CORRECT';
+        exp.textContent = `+${data.exp_gained} EXP`;
+        exp.style.display = 'block';
+        info.textContent = `Total solved in sector: ${data.total_solved}`;
+        document.getElementById('exp-display').textContent = data.total_exp;
+    } else {
+        card.classList.add('wrong');
+        status.className = 'result-status wrong';
+        status.textContent = 'INCORRECT';
+        exp.style.display = 'none';
+        info.textContent = `Expected: ${data.expected}`;
+    }
+    overlay.classList.add('show');
+}
@@ -0,0 +1,155 @@
+"""Synthetic production-scale dataset for local benchmarking.
+
+    flask --app app seed-users --users 1000000 --seed 0
+
+Appends users with sector progress shaped like a live player base: player
+activity is log-normal (most players dabble, a long tail grinds), the
+earlier sections are played by more people, and each played section's
+level comes from that activity. The counters are kept consistent with the
+game's economy: ``total_exp_earned`` covers the upgrades to reach the level,
+``total_problems_solved`` the problems needed to earn it, and whatever was
+not spent is the user's XP balance.
+
+Rows go in through Core ``executemany`` batches, one transaction each, with
+a single password hash computed up front and shared by every account. The
+same ``--seed`` always produces the same dataset, so measurements can be
+repeated against identical data.
+"""
+import random
+import time
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, insert, select
+
+from database import (
+    db, User, UserSectorProgress, SECTION_CONFIG, SESSION_PROBLEMS,
+    get_exp_reward, get_upgrade_cost
+)
+from password_hashing import password_hasher
+
+# Share of players who have played each section at all.
+SECTION_POPULARITY = {
+    'addition': 0.95,
+    'subtraction': 0.8,
+    'multiplication': 0.6,
+    'division': 0.45,
+    'fractions': 0.3,
+    'mixed': 0.2,
+    'decimals': 0.25,
+    'find_value': 0.15,
+}
+MAX_LEVEL = 200
+
+
+USER_COLUMNS = ('id', 'username', 'email', 'password_hash', 'exp', 'level', 'is_admin')
+PROGRESS_COLUMNS = ('user_id', 'section', 'level', 'total_exp_earned', 'total_problems_solved',
+                    'rating', 'rated_answers')
+
+
+def _level_tables(section):
+    """Per-level lookups for section: XP spent and problems solved to reach
+    each level, the upgrade cost and the XP per problem at each level."""
+    spent, solved, costs, rewards = [0, 0], [0, 0], [0], [0]
+    for level in range(1, MAX_LEVEL):
+        cost = get_upgrade_cost(level)
+        reward = get_exp_reward(section, level)
+        # XP is paid per completed run, so round up to whole runs.
+        runs = -(-cost // (SESSION_PROBLEMS * reward))
+        spent.append(spent[-1] + cost)
+        solved.append(solved[-1] + runs * SESSION_PROBLEMS)
+        costs.append(cost)
+        rewards.append(reward)
+    return spent, solved, costs, rewards
+
+
+def generate_batch(first_id, n, rng, password_hash, tables):
+    """(user rows, progress rows) as tuples in USER_COLUMNS/PROGRESS_COLUMNS
+    order, for users first_id .. first_id + n - 1."""
+    users, progress = [], []
+    lognormvariate, expovariate, random_ = rng.lognormvariate, rng.expovariate, rng.random
+    for user_id in range(first_id, first_id + n):
+        activity = lognormvariate(0.5, 1.0)
+        balance = 0
+        for section, (popularity, spent, solved, costs, rewards) in tables.items():
+            if random_() >= popularity:
+                continue
+            level = min(MAX_LEVEL - 1, 1 + int(activity * expovariate(1.0)))
+            # XP earned since the last upgrade, not yet spent.
+            extra = int(random_() * costs[level])
+            balance += extra
+            # No answer history, so no skill rating yet (see skill.py).
+            progress.append((user_id, section, level, spent[level] + extra,
+                             solved[level] + extra // rewards[level] + int(random_() * 4), None, 0))
+        users.append((user_id, f"player{user_id}", f"player{user_id}@example.invalid",
+                      password_hash, balance, 1, False))
+    return users, progress
+
+
+def _bulk_insert(conn, table, columns):
+    """executemany(rows) for table, sent straight to the DBAPI cursor."""
+    compiled = insert(table).values({c: None for c in columns}).compile(dialect=conn.dialect)
+    sql = str(compiled)
+    if compiled.positional:
+        order = [columns.index(name) for name in compiled.positiontup]
+        if order == list(range(len(columns))):
+            return lambda rows: conn.exec_driver_sql(sql, rows)
+        return lambda rows: conn.exec_driver_sql(sql, [tuple(row[i] for i in order) for row in rows])
+    return lambda rows: conn.exec_driver_sql(sql, [dict(zip(columns, row)) for row in rows])
+
+
+def seed_users(engine, n, seed=0, batch_size=10000, password='password', echo=print):
+    """Append n synthetic users with progress; returns (users, progress rows, seconds)."""
+    rng = random.Random(seed)
+    password_hash = password_hasher.hash(password)
+    tables = {section: (SECTION_POPULARITY.get(section, 0.2),) + _level_tables(section)
+              for section in SECTION_CONFIG}
+
+    with engine.connect() as conn:
+        first_id = (conn.execute(select(func.max(User.id))).scalar() or 0) + 1
+        synchronous = None
+        if engine.dialect.name == 'sqlite':
+            # Synthetic data: skip the per-commit fsync while seeding. The
+            # connection goes back to the pool, so the setting is restored.
+            synchronous = conn.exec_driver_sql('PRAGMA synchronous').scalar()
+            conn.exec_driver_sql('PRAGMA synchronous=OFF')
+        conn.commit()
+        insert_users = _bulk_insert(conn, User.__table__, USER_COLUMNS)
+        insert_progress = _bulk_insert(conn, UserSectorProgress.__table__, PROGRESS_COLUMNS)
+
+        start = time.perf_counter()
+        total_users = total_progress = 0
+        try:
+            while total_users < n:
+                count = min(batch_size, n - total_users)
+                users, progress = generate_batch(first_id + total_users, count, rng, password_hash, tables)
+                with conn.begin():
+                    insert_users(users)
+                    insert_progress(progress)
+                total_users += count
+                total_progress += len(progress)
+                elapsed = time.perf_counter() - start
+                echo(f"{total_users:>10} users {total_progress:>10} progress rows  "
+                     f"{(total_users + total_progress) / elapsed:>9,.0f} rows/s")
+        finally:
+            with conn.begin():
+                if engine.dialect.name == 'postgresql':
+                    # Users were inserted with explicit ids, past the serial sequence.
+                    conn.exec_driver_sql("SELECT setval(pg_get_serial_sequence('users', 'id'), "
+                                         "COALESCE((SELECT MAX(id) FROM users), 0) + 1, false)")
+                if synchronous is not None:
+                    conn.exec_driver_sql(f'PRAGMA synchronous={int(synchronous)}')
+    return total_users, total_progress, time.perf_counter() - start
+
+
+@click.command('seed-users')
+@click.option('--users', 'n', type=int, default=100000, show_default=True)
+@click.option('--seed', type=int, default=0, show_default=True, help='Same seed, same dataset.')
+@click.option('--batch-size', type=int, default=10000, show_default=True, help='Users per transaction.')
+@click.option('--password', default='password', show_default=True, help='Password of every synthetic account.')
+@with_appcontext
+def seed_users_command(n, seed, batch_size, password):
+    """Append N synthetic users with realistic sector progress."""
+    users, progress, elapsed = seed_users(db.engine, n, seed, batch_size, password, echo=click.echo)
+    click.echo(f"Inserted {users} users and {progress} progress rows in {elapsed:.1f}s "
+               f"({(users + progress) / elapsed:,.0f} rows/s)")